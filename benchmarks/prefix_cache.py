@@ -0,0 +1,134 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Times the prefill of prompts sharing a long preamble with and without the prefix cache of `TextBulk`.
+
+Every prompt generates a single token, so that the time is dominated by the forward pass over the prompt. Not run by
+the test suite, run it with `python benchmarks/prefix_cache.py`.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from typing import Callable, List
+
+import torch
+from geniusrise.core import BatchInput, BatchOutput, InMemoryState
+
+from geniusrise_text.base.bulk import TextBulk
+
+PREAMBLE = (
+    "You are a helpful assistant for an online bookstore. Answer questions about orders, shipping, returns and "
+    "recommendations politely and concisely. "
+)
+QUESTIONS = [
+    "Where is my order?",
+    "Can I return a book I did not like?",
+    "Recommend a mystery novel.",
+    "How long does shipping to Canada take?",
+]
+
+
+def load(model_name: str) -> TextBulk:
+    """
+    Loads a causal language model on the CPU into a `TextBulk`.
+
+    Args:
+        model_name (str): The model.
+
+    Returns:
+        TextBulk: The bulk job with the model and tokenizer loaded.
+    """
+    bulk = TextBulk(
+        input=BatchInput(tempfile.mkdtemp(), "geniusrise-benchmark", "input"),
+        output=BatchOutput(tempfile.mkdtemp(), "geniusrise-benchmark", "output"),
+        state=InMemoryState(),
+    )
+    bulk.model, bulk.tokenizer = bulk.load_models(
+        model_name=model_name,
+        tokenizer_name=model_name,
+        model_class="AutoModelForCausalLM",
+        tokenizer_class="AutoTokenizer",
+        use_cuda=False,
+        precision="float32",
+        quantization=0,
+        device_map=None,
+        max_memory=None,
+        torchscript=False,
+    )
+    return bulk
+
+
+def seconds_per_prompt(run: Callable[[str], None], prompts: List[str], repeats: int) -> float:
+    """
+    Returns the median time of a prompt over the repeats, after a warm-up pass.
+
+    Args:
+        run (Callable[[str], None]): Processes one prompt.
+        prompts (List[str]): The prompts.
+        repeats (int): Number of timed passes over the prompts.
+
+    Returns:
+        float: Seconds per prompt.
+    """
+    for prompt in prompts:
+        run(prompt)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for prompt in prompts:
+            run(prompt)
+        timings.append((time.perf_counter() - start) / len(prompts))
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="gpt2", help="Causal language model to benchmark.")
+    parser.add_argument("--preamble_repeats", type=int, default=12, help="Copies of the preamble in every prompt.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of timed passes over the prompts.")
+    parser.add_argument("--threads", type=int, default=None, help="Number of torch CPU threads.")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    bulk = load(args.model)
+    preamble = PREAMBLE * args.preamble_repeats
+    prompts = [preamble + question for question in QUESTIONS]
+
+    def run(prompt: str) -> None:
+        bulk.generate(prompt, max_new_tokens=1)
+
+    bulk.prefix_cache = None
+    uncached = seconds_per_prompt(run, prompts, args.repeats)
+
+    bulk.enable_prefix_cache(prefixes=[preamble])
+    cached = seconds_per_prompt(run, prompts, args.repeats)
+
+    stats = bulk.prefix_cache.stats()  # type: ignore
+    prompt_tokens = statistics.mean(len(bulk.tokenizer.encode(prompt)) for prompt in prompts)
+    print(f"Model:            {args.model} on CPU with {torch.get_num_threads()} threads")
+    print(f"Prompt tokens:    {prompt_tokens:.0f}, of which {stats['prefix_lengths'][0]} in the cached prefix")
+    print(f"Uncached prefill: {uncached * 1000:.1f} ms per prompt")
+    print(f"Cached prefill:   {cached * 1000:.1f} ms per prompt")
+    print(f"Speedup:          {uncached / cached:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+_EXCLUSIVE = object()
+
+
+class AdapterSwitch:
+    """
+    Groups concurrent work by the LoRA adapter it needs, so that one base model serves many adapters.
+
+    A base model with several adapters has a single active adapter, so only work for that adapter can run at a
+    time. Work for the active adapter runs concurrently, while work for other adapters waits. Once no work is running,
+    the adapter with the most waiting work is activated and all of that work is let in together, so requests for the
+    same adapter are grouped into as few switches as possible. New work for the active adapter waits behind other
+    adapters, so that no adapter starves.
+
+    Attributes:
+        active (Optional[str]): The active adapter, None for the base model.
+        switches (int): Number of adapter switches.
+    """
+
+    def __init__(self, activate: Callable[[Optional[str]], None], active: Optional[str] = None) -> None:
+        """
+        Initializes the AdapterSwitch.
+
+        Args:
+            activate (Callable[[Optional[str]], None]): Activates an adapter on the model, None for the base model.
+            active (Optional[str]): The adapter active on the model initially.
+        """
+        self.activate = activate
+        self.active = active
+        self.switches = 0
+
+        self._condition = threading.Condition()
+        self._running = 0
+        self._exclusive = False
+        self._admit = 0
+        self._waiting: Dict[Any, int] = {}
+        self._requests: Dict[Any, int] = defaultdict(int)
+
+    def acquire(self, adapter: Optional[str]) -> None:
+        """
+        Waits until an adapter is active and no work for other adapters runs.
+
+        Args:
+            adapter (Optional[str]): The adapter, None for the base model.
+        """
+        with self._condition:
+            self._waiting[adapter] = self._waiting.get(adapter, 0) + 1
+            try:
+                self._condition.wait_for(lambda: self._may_run(adapter))
+            finally:
+                self._waiting[adapter] -= 1
+                if not self._waiting[adapter]:
+                    del self._waiting[adapter]
+                self._condition.notify_all()
+
+            if adapter is _EXCLUSIVE:
+                self._exclusive = True
+            else:
+                if self._running == 0:
+                    # Let in the rest of the work that waited for this adapter as one group
+                    self._admit = self._waiting.get(adapter, 0)
+                    if adapter != self.active:
+                        self.activate(adapter)
+                        self.active = adapter
+                        self.switches += 1
+                elif self._admit:
+                    self._admit -= 1
+                self._requests[adapter] += 1
+            self._running += 1
+
+    def release(self) -> None:
+        """
+        Marks work started with `acquire` as finished.
+        """
+        with self._condition:
+            self._running -= 1
+            self._exclusive = False
+            self._condition.notify_all()
+
+    @contextmanager
+    def use(self, adapter: Optional[str]) -> Iterator[None]:
+        """
+        Runs a `with` block with an adapter active.
+
+        Args:
+            adapter (Optional[str]): The adapter, None for the base model.
+        """
+        self.acquire(adapter)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """
+        Runs a `with` block while no other work runs, e.g. to load or remove adapters.
+        """
+        with self.use(_EXCLUSIVE):  # type: ignore
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the active adapter, the number of switches and the requests served per adapter.
+
+        Returns:
+            Dict[str, Any]: The switch state and counters, the base model is counted as "base".
+        """
+        with self._condition:
+            return {
+                "active": self.active,
+                "running": self._running,
+                "waiting": sum(self._waiting.values()),
+                "switches": self.switches,
+                "requests": {"base" if k is None else k: v for k, v in self._requests.items()},
+            }
+
+    def _may_run(self, adapter: Any) -> bool:
+        """
+        Tells whether work for an adapter may start. Must hold the lock.
+        """
+        if self._exclusive:
+            return False
+        if adapter is _EXCLUSIVE:
+            return self._running == 0
+        if _EXCLUSIVE in self._waiting:
+            return False
+        if self._running == 0:
+            # The adapter with the most waiting work goes next, ties in order of arrival
+            return adapter == max(self._waiting, key=lambda k: self._waiting[k])
+        if adapter != self.active:
+            return False
+        # Work waiting when its adapter was activated joins its group, newer work queues behind other adapters
+        return self._admit > 0 or all(k == adapter for k in self._waiting)
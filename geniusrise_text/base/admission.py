@@ -0,0 +1,149 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted to an inference worker.
+
+    Attributes:
+        status (int): The HTTP status to answer with, 429 when the queue is full and 503 when the deadline expired.
+        retry_after (int): Seconds after which the client should retry.
+    """
+
+    def __init__(self, status: int, retry_after: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Admission control in front of a bounded pool of inference workers.
+
+    At most `num_workers` requests run inference at a time and at most `max_queue_size` more wait for a worker.
+    Requests arriving when the queue is full are rejected right away, and requests whose deadline expires while
+    waiting are dropped before they reach the model. Rejections carry a retry delay estimated from the average
+    service time and the queue depth.
+
+    Attributes:
+        num_workers (int): Maximum number of requests running inference concurrently.
+        max_queue_size (int): Maximum number of requests waiting for a worker.
+        timeout (Optional[float]): Default deadline of a request in seconds, None to wait forever.
+    """
+
+    def __init__(self, num_workers: int = 1, max_queue_size: int = 64, timeout: Optional[float] = 60.0) -> None:
+        """
+        Initializes the AdmissionController.
+
+        Args:
+            num_workers (int): Maximum number of requests running inference concurrently.
+            max_queue_size (int): Maximum number of requests waiting for a worker.
+            timeout (Optional[float]): Default deadline of a request in seconds, None to wait forever.
+        """
+        self.num_workers = max(1, num_workers)
+        self.max_queue_size = max(0, max_queue_size)
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.num_workers)
+        self._busy = 0
+        self._waiting = 0
+        self._service_time = 0.0
+        self._counters: Dict[str, int] = {"admitted": 0, "rejected": 0, "expired": 0}
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Waits for a free worker.
+
+        Args:
+            timeout (Optional[float]): Deadline of the request in seconds. Defaults to the controller timeout.
+
+        Returns:
+            float: The monotonic time at which the request was admitted, to be passed to `release`.
+
+        Raises:
+            AdmissionRejected: With status 429 if the queue is full, or 503 if the deadline expired while waiting.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self._waiting >= self.max_queue_size:
+                    self._counters["rejected"] += 1
+                    raise AdmissionRejected(429, self._retry_after(), "Too many requests, the queue is full")
+                self._waiting += 1
+
+            acquired = self._slots.acquire(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+            with self._lock:
+                self._waiting -= 1
+
+            if not acquired or (deadline and time.monotonic() > deadline):
+                if acquired:
+                    self._slots.release()
+                with self._lock:
+                    self._counters["expired"] += 1
+                    raise AdmissionRejected(503, self._retry_after(), "Request deadline expired while queued")
+
+        with self._lock:
+            self._busy += 1
+            self._counters["admitted"] += 1
+        return time.monotonic()
+
+    def release(self, admitted_at: float) -> None:
+        """
+        Frees the worker of a finished request.
+
+        Args:
+            admitted_at (float): The value returned by `acquire`.
+        """
+        with self._lock:
+            self._busy -= 1
+            elapsed = time.monotonic() - admitted_at
+            self._service_time = elapsed if not self._service_time else 0.9 * self._service_time + 0.1 * elapsed
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the occupancy and counters of the worker pool.
+
+        Returns:
+            Dict[str, Any]: Busy workers, queued requests, admitted, rejected and expired counts and the average
+                service time.
+        """
+        with self._lock:
+            return {
+                "num_workers": self.num_workers,
+                "max_queue_size": self.max_queue_size,
+                "busy": self._busy,
+                "queued": self._waiting,
+                **self._counters,
+                "avg_service_ms": self._service_time * 1000.0,
+            }
+
+    def _retry_after(self) -> int:
+        """
+        Estimates how long the current queue takes to drain. Must hold the lock.
+
+        Returns:
+            int: Seconds, at least 1.
+        """
+        return max(1, math.ceil(self._service_time * (self._waiting + 1) / self.num_workers))
@@ -14,18 +14,21 @@
 # limitations under the License.
 
 import json
+import os
 import threading
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import cherrypy
 import llama_cpp
+from cherrypy.lib import httputil
 from geniusrise import BatchInput, BatchOutput, State
 from geniusrise.logging import setup_logger
 
+from .admission import AdmissionController, AdmissionRejected
+from .batching import MicroBatcher
 from .bulk import TextBulk
-
-# Define a global lock for sequential access control
-sequential_lock = threading.Lock()
+from .registry import ModelRegistry, ServingAttribute
+from .response_cache import ResponseCache, cache_response
 
 
 class TextAPI(TextBulk):
@@ -57,8 +60,10 @@ class TextAPI(TextBulk):
             Starts a CherryPy server to listen for requests to generate text.
     """
 
-    model: Any
-    tokenizer: Any
+    # Resolve to the model a request is routed to, see `ModelRegistry`
+    model = ServingAttribute()
+    tokenizer = ServingAttribute()
+    prefix_cache: Any = ServingAttribute()
 
     def __init__(
         self,
@@ -76,6 +81,292 @@ class TextAPI(TextBulk):
         """
         super().__init__(input=input, output=output, state=state)
         self.log = setup_logger(self)
+        self.batcher: Optional[MicroBatcher] = None
+        self.response_cache: Optional[ResponseCache] = None
+        self.admission: Optional[AdmissionController] = None
+        self.models: Optional[ModelRegistry] = None
+        self._model_defaults: Dict[str, Any] = {}
+        self._serving = threading.local()
+
+    def batched(self, endpoint: str, item: Any, fn: Callable[[List[Any]], List[Any]]) -> Any:
+        """
+        Runs a single request through the micro-batching scheduler of an endpoint.
+        Falls back to a batch of one if micro-batching is disabled.
+
+        Args:
+            endpoint (str): Name of the endpoint, requests are only coalesced with requests to the same endpoint.
+            item (Any): The request payload.
+            fn (Callable[[List[Any]], List[Any]]): Function processing a padded batch of payloads, returning one result per payload.
+
+        Returns:
+            Any: The result for this request.
+        """
+        if self.batcher is None:
+            return fn([item])[0]
+
+        served = getattr(self._serving, "served", None)
+        if served is None:
+            return self.batcher.submit(endpoint, item, fn)
+
+        # Batches of a registry model run on their own queue, on a worker thread that has to be routed to the model
+        name: str = served.name
+
+        def serve(items: List[Any]) -> List[Any]:
+            # Unbatched requests run on the request thread, which is routed already
+            previous = getattr(self._serving, "served", None)
+            with self.models.use(name) as model:  # type: ignore
+                self._serving.served = model
+                try:
+                    return fn(items)
+                finally:
+                    self._serving.served = previous
+
+        return self.batcher.submit(f"{endpoint}@{name}", item, serve)
+
+    @staticmethod
+    def _bounded_int(data: Dict[str, Any], name: str, default: int, low: int, high: Optional[int] = None) -> int:
+        """
+        Reads an integer setting of a request, which has to lie within [low, high].
+
+        Args:
+            data (Dict[str, Any]): The request body.
+            name (str): The name of the setting.
+            default (int): The value of the setting when the request does not set it.
+            low (int): The smallest valid value.
+            high (Optional[int]): The largest valid value, None for no upper bound.
+
+        Returns:
+            int: The setting.
+
+        Raises:
+            cherrypy.HTTPError: 400 if the setting is not an integer or out of bounds.
+        """
+        value = data.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, int) or value < low or (high is not None and value > high):
+            bounds = f"between {low} and {high}" if high is not None else f"of at least {low}"
+            raise cherrypy.HTTPError(400, f"{name} must be an integer {bounds}")
+        return value
+
+    def window_stride(self, value: Any) -> int:
+        """
+        Validates the `window_stride` of a long document request, which has to leave room for new tokens in every
+        window of the model's maximum length.
+
+        Args:
+            value (Any): The requested number of tokens shared by consecutive windows.
+
+        Returns:
+            int: The stride.
+
+        Raises:
+            cherrypy.HTTPError: 400 if the stride is not an integer or does not fit in a window.
+        """
+        window = self.tokenizer.model_max_length - self.tokenizer.num_special_tokens_to_add()  # type: ignore
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < window:
+            raise cherrypy.HTTPError(400, f"window_stride must be an integer between 0 and {window - 1}")
+        return value
+
+    def _load_registered_model(self, spec: Dict[str, Any]) -> Any:
+        """
+        Loads a model of the registry with the settings of the model loaded at startup, overridden by its spec.
+
+        Args:
+            spec (Dict[str, Any]): The model name, optionally followed by `:revision`, and arguments of `load_models`.
+
+        Returns:
+            Tuple[Any, Any]: The model and tokenizer.
+        """
+        spec = dict(spec)
+        model_name = spec.pop("model_name")
+        revision = None
+        if ":" in model_name:
+            model_name, revision = model_name.split(":", 1)
+
+        return self.load_models(
+            model_name=model_name,
+            tokenizer_name=spec.pop("tokenizer_name", model_name),
+            model_revision=spec.pop("model_revision", revision),
+            tokenizer_revision=spec.pop("tokenizer_revision", revision),
+            **{**self._model_defaults, **spec},
+        )
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["GET"])
+    def batching_stats(self) -> Dict[str, Any]:
+        """
+        Returns the queue depth and batch size histogram of every micro-batched endpoint.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the micro-batching configuration and per-endpoint statistics.
+
+        Example CURL Request:
+        ```bash
+        curl localhost:3000/api/v1/batching_stats | jq
+        ```
+        """
+        if self.batcher is None:
+            return {"enabled": False, "endpoints": {}}
+        return {
+            "enabled": True,
+            "max_batch_size": self.batcher.max_batch_size,
+            "max_wait_ms": self.batcher.max_wait_ms,
+            "endpoints": self.batcher.stats(),
+        }
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["GET"])
+    def admission_stats(self) -> Dict[str, Any]:
+        """
+        Returns the occupancy of the inference workers and the admission counters.
+
+        Returns:
+            Dict[str, Any]: Busy workers, queued requests and the admitted, rejected and expired counts.
+
+        Example CURL Request:
+        ```bash
+        curl localhost:3000/api/v1/admission_stats | jq
+        ```
+        """
+        if self.admission is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.admission.stats()}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["GET"])
+    def response_cache_stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit rate and size of the response cache.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the response cache configuration and counters.
+
+        Example CURL Request:
+        ```bash
+        curl localhost:3000/api/v1/response_cache_stats | jq
+        ```
+        """
+        if self.response_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.response_cache.stats()}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["GET"])
+    def prefix_cache_stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit rate and occupancy of the prompt prefix cache.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing hits, misses and the cached prefixes.
+
+        Example CURL Request:
+        ```bash
+        curl localhost:3000/api/v1/prefix_cache_stats | jq
+        ```
+        """
+        if self.prefix_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.prefix_cache.stats()}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["GET"])
+    def model_registry_stats(self) -> Dict[str, Any]:
+        """
+        Returns the models requests can select with the `model` field and which of them are loaded.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the memory budget, the loaded and registered models and the load
+                and eviction counters.
+
+        Example CURL Request:
+        ```bash
+        curl localhost:3000/api/v1/model_registry_stats | jq
+        ```
+        """
+        if self.models is None:
+            return {"enabled": False, "default": self.model_name}
+        return {"enabled": True, "default": self.model_name, **self.models.stats()}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["GET"])
+    def adapter_stats(self) -> Dict[str, Any]:
+        """
+        Returns the LoRA adapters requests can select with the `adapter` field and how often they were switched.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the loaded adapters, the active one and the requests per adapter.
+
+        Example CURL Request:
+        ```bash
+        curl localhost:3000/api/v1/adapter_stats | jq
+        ```
+        """
+        if self.adapters is None:
+            return {"enabled": False}
+        return {"enabled": True, "adapters": sorted(self.model.peft_config), **self.adapters.stats()}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_in()
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["POST"])
+    # Loading waits for running generations, so these requests must not hold the adapter switch themselves
+    @cherrypy.config(**{"tools.response_cache.on": False, "tools.model_route.on": False})
+    def load_adapter(self) -> Dict[str, Any]:
+        """
+        Loads a LoRA adapter from disk on top of the model, replacing an adapter of the same name.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the name of the adapter and the loaded adapters.
+
+        Example CURL Request:
+        ```bash
+        curl -X POST localhost:3000/api/v1/load_adapter \
+            -H "Content-Type: application/json" \
+            -d '{"name": "customer-a", "path": "/models/adapters/customer-a"}' | jq
+        ```
+        """
+        data = cherrypy.request.json
+        if self.use_vllm or self.use_llama_cpp:
+            raise cherrypy.HTTPError(400, "Adapters are only supported by the Hugging Face backend")
+        if not data.get("name") or not data.get("path"):
+            raise cherrypy.HTTPError(400, "Both name and path are required")
+
+        if self.has_adapter(data["name"]):
+            self.remove_adapter(data["name"])
+        self.load_adapters({data["name"]: data["path"]})
+        return {"name": data["name"], "adapters": sorted(self.model.peft_config)}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_in()
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["POST"])
+    # Loading waits for running generations, so these requests must not hold the adapter switch themselves
+    @cherrypy.config(**{"tools.response_cache.on": False, "tools.model_route.on": False})
+    def unload_adapter(self) -> Dict[str, Any]:
+        """
+        Removes a LoRA adapter, freeing its weights.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the name of the adapter and the remaining adapters.
+
+        Example CURL Request:
+        ```bash
+        curl -X POST localhost:3000/api/v1/unload_adapter \
+            -H "Content-Type: application/json" \
+            -d '{"name": "customer-a"}' | jq
+        ```
+        """
+        name = cherrypy.request.json.get("name")
+        if not self.has_adapter(name):
+            raise cherrypy.HTTPError(404, f"Unknown adapter {name}")
+
+        self.remove_adapter(name)
+        return {"name": name, "adapters": sorted(self.model.peft_config)}
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
@@ -152,6 +443,20 @@ class TextAPI(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         concurrent_queries: bool = False,
+        num_workers: Optional[int] = None,
+        max_queue_size: int = 64,
+        request_timeout: Optional[float] = 60.0,
+        max_batch_size: int = 1,
+        max_wait_ms: float = 5.0,
+        response_cache_size: int = 1024,
+        response_cache_ttl: Optional[float] = 600.0,
+        prefix_cache_mb: int = 0,
+        prefix_cache_min_tokens: int = 32,
+        prefix_cache_prefixes: Optional[List[str]] = None,
+        models: Optional[Union[List[str], Dict[str, Any]]] = None,
+        models_max_memory_mb: int = 0,
+        max_loaded_models: int = 0,
+        adapters: Optional[Union[List[str], Dict[str, str]]] = None,
         use_vllm: bool = False,
         use_llama_cpp: bool = False,
         # VLLM params
@@ -239,7 +544,30 @@ class TextAPI(TextBulk):
             compile (bool): Enables model compilation for further optimization.
             awq_enabled (bool): Enables Adaptive Weight Quantization (AWQ) for model optimization.
             flash_attention (bool): Utilizes Flash Attention optimizations for faster processing.
-            concurrent_queries (bool): Allows the server to handle multiple requests concurrently if True.
+            concurrent_queries (bool): Deprecated, use `num_workers` instead.
+            num_workers (Optional[int]): Maximum number of requests running inference concurrently, raised to
+                `max_batch_size`. Defaults to `vllm_max_num_seqs` with vLLM, which batches the requests in flight,
+                and to the number of CPUs otherwise. Breaking change: requests used to run without any bound, now
+                requests beyond `num_workers` queue and, beyond `max_queue_size`, get a 429.
+            max_queue_size (int): Maximum number of requests waiting for a worker, further requests get a 429.
+            request_timeout (Optional[float]): Default deadline of a request in seconds, requests still queued after it
+                get a 503. Clients can set their own with the `X-Request-Timeout` header. None to wait forever.
+            max_batch_size (int): Maximum number of concurrent requests coalesced into one forward pass, 1 disables micro-batching.
+            max_wait_ms (float): Maximum time in milliseconds a request waits for its micro-batch to fill up.
+            response_cache_size (int): Maximum number of deterministic responses cached, 0 disables the response cache.
+            response_cache_ttl (Optional[float]): Seconds a cached response stays valid, None to never expire.
+            prefix_cache_mb (int): Memory budget in megabytes for reusing the keys and values of prompt prefixes, 0 disables it.
+            prefix_cache_min_tokens (int): Minimum number of leading tokens prompts must share to cache their prefix.
+            prefix_cache_prefixes (Optional[List[str]]): Prefixes, e.g. system prompts, cached as soon as the model is loaded.
+            models (Optional[Union[List[str], Dict[str, Any]]]): Further models requests can select with a `model`
+                field, loaded on first use. Either model names, or a mapping of names to a model name or to
+                `load_models` arguments overriding the ones of `model_name`. Only supported by the Hugging Face backend.
+            models_max_memory_mb (int): Memory budget of all loaded models in megabytes, the least recently used models
+                are unloaded beyond it. 0 for no limit.
+            max_loaded_models (int): Maximum number of models loaded at a time, including `model_name`. 0 for no limit.
+            adapters (Optional[Union[List[str], Dict[str, str]]]): Paths of LoRA adapters, by name, loaded on top of the
+                model so that they share its weights. Requests select one with an `adapter` or `model` field, requests
+                for the same adapter run together. Only supported by the Hugging Face backend.
             use_vllm (bool): Flag to use Very Large Language Models (VLLM) integration.
             use_llama_cpp (bool): Flag to use llama.cpp integration for language model inference.
             llama_cpp_filename (Optional[str]): The filename of the model file for llama.cpp.
@@ -293,7 +621,21 @@ class TextAPI(TextBulk):
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
         self.use_vllm = use_vllm
+        self.use_llama_cpp = use_llama_cpp
         self.concurrent_queries = concurrent_queries
+        if concurrent_queries:
+            self.log.warning("concurrent_queries is deprecated, set num_workers instead.")
+        if num_workers is None:
+            # concurrent_queries used to serialize requests
+            num_workers = 1 if concurrent_queries else vllm_max_num_seqs if use_vllm else os.cpu_count() or 1
+        if max_batch_size > 1:
+            self.batcher = MicroBatcher(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        # Micro-batches can only fill up with as many requests as there are workers
+        self.admission = AdmissionController(
+            num_workers=max(num_workers, max_batch_size), max_queue_size=max_queue_size, timeout=request_timeout
+        )
+        if response_cache_size > 0:
+            self.response_cache = ResponseCache(max_size=response_cache_size, ttl=response_cache_ttl)
 
         self.model_args = model_args
         self.username = username
@@ -413,14 +755,103 @@ class TextAPI(TextBulk):
                 compile=compile,
                 **self.model_args,
             )
-
-        def sequential_locker():
-            if self.concurrent_queries:
-                sequential_lock.acquire()
-
-        def sequential_unlocker():
-            if self.concurrent_queries:
-                sequential_lock.release()
+            if adapters:
+                self.load_adapters(adapters)
+            if prefix_cache_mb > 0:
+                self.enable_prefix_cache(
+                    max_memory_mb=prefix_cache_mb,
+                    min_prefix_tokens=prefix_cache_min_tokens,
+                    prefixes=prefix_cache_prefixes,
+                )
+
+        if models and (use_vllm or use_llama_cpp):
+            self.log.warning("Serving several models is only supported by the Hugging Face backend, ignoring models.")
+        elif models:
+            self._model_defaults = {
+                "model_class": self.model_class,
+                "tokenizer_class": self.tokenizer_class,
+                "use_cuda": self.use_cuda,
+                "precision": self.precision,
+                "quantization": self.quantization,
+                "device_map": self.device_map,
+                "max_memory": self.max_memory,
+                "torchscript": self.torchscript,
+                "awq_enabled": self.awq_enabled,
+                "flash_attention": self.flash_attention,
+                "compile": compile,
+                **self.model_args,
+            }
+            self.models = ModelRegistry(
+                loader=self._load_registered_model, max_memory_mb=models_max_memory_mb, max_models=max_loaded_models
+            )
+            for name, spec in models.items() if isinstance(models, dict) else zip(models, models):
+                self.models.register(name, spec)
+            self.models.add(self.model_name, self.model, self.tokenizer, pinned=True)
+
+        def model_route():
+            request = cherrypy.serving.request
+            data = getattr(request, "json", None)
+            if request.method != "POST" or request.handler is None or not isinstance(data, dict):
+                return
+
+            # Endpoints pass the rest of the body to the model, so the routing fields are consumed here
+            name = data.pop("model", None)
+            adapter = data.pop("adapter", None)
+            if name and self.has_adapter(name):
+                name, adapter = None, name
+
+            if name and name not in (self.model_name, f"{self.model_name}:{self.model_revision}"):
+                if self.models is None or name not in self.models:
+                    raise cherrypy.HTTPError(404, f"Unknown model {name}")
+                if adapter:
+                    raise cherrypy.HTTPError(400, f"Adapters are served on top of {self.model_name} only")
+                request.served_model = self.models.acquire(name)
+                self._serving.served = request.served_model
+                return
+
+            if adapter and not self.has_adapter(adapter):
+                raise cherrypy.HTTPError(404, f"Unknown adapter {adapter}")
+            if self.adapters is not None:
+                # Held until the response is sent, so that streamed and micro-batched generations use the adapter
+                self.adapters.acquire(adapter)
+                request.adapter_acquired = True
+
+        def model_release():
+            request = cherrypy.serving.request
+            if getattr(request, "served_model", None) is not None:
+                self._serving.served = None
+                self.models.release(request.served_model)  # type: ignore
+                request.served_model = None
+            if getattr(request, "adapter_acquired", False):
+                self.adapters.release()  # type: ignore
+                request.adapter_acquired = False
+
+        def admission_acquire():
+            request = cherrypy.serving.request
+            if request.method != "POST" or request.handler is None:
+                return
+
+            timeout = request.headers.get("X-Request-Timeout")
+            try:
+                seconds = float(timeout) if timeout else None
+                request.admitted_at = self.admission.acquire(timeout=seconds)  # type: ignore
+            except ValueError:
+                raise cherrypy.HTTPError(400, f"Invalid X-Request-Timeout {timeout}")
+            except AdmissionRejected as e:
+                # Answered here instead of raising an HTTPError, whose error response would drop the Retry-After header
+                response = cherrypy.serving.response
+                request.handler = None
+                code, reason, _ = httputil.valid_status(e.status)
+                response.status = f"{code} {reason}"
+                response.headers["Retry-After"] = str(e.retry_after)
+                response.headers["Content-Type"] = "application/json"
+                response.body = error_page(response.status, str(e), None, None).encode("utf-8")
+
+        def admission_release():
+            request = cherrypy.serving.request
+            if getattr(request, "admitted_at", None) is not None:
+                self.admission.release(request.admitted_at)  # type: ignore
+                request.admitted_at = None
 
         def CORS():
             cherrypy.response.headers["Access-Control-Allow-Origin"] = cors_domain
@@ -436,6 +867,8 @@ class TextAPI(TextBulk):
             {
                 "server.socket_host": "0.0.0.0",
                 "server.socket_port": port,
+                # Queued requests wait in server threads, so that admission control sees them
+                "server.thread_pool": self.admission.num_workers + self.admission.max_queue_size,
                 "log.screen": False,
                 "tools.CORS.on": True,
                 "error_page.400": error_page,
@@ -461,8 +894,10 @@ class TextAPI(TextBulk):
             # Configure basic authentication
             conf = {
                 "/": {
-                    "tools.sequential_locker.on": True,
-                    "tools.sequential_unlocker.on": True,
+                    "tools.admission_acquire.on": True,
+                    "tools.admission_release.on": True,
+                    "tools.model_route.on": True,
+                    "tools.model_release.on": True,
                     "tools.auth_basic.on": True,
                     "tools.auth_basic.realm": "geniusrise",
                     "tools.auth_basic.checkpassword": self.validate_password,
@@ -473,17 +908,37 @@ class TextAPI(TextBulk):
             # Configuration without authentication
             conf = {
                 "/": {
-                    "tools.sequential_locker.on": True,
-                    "tools.sequential_unlocker.on": True,
+                    "tools.admission_acquire.on": True,
+                    "tools.admission_release.on": True,
+                    "tools.model_route.on": True,
+                    "tools.model_release.on": True,
                     "tools.CORS.on": True,
                 }
             }
 
-        cherrypy.tools.sequential_locker = cherrypy.Tool("before_handler", sequential_locker)
+        if self.response_cache is not None:
+            conf["/"].update(
+                {
+                    "tools.response_cache.on": True,
+                    "tools.response_cache.cache": self.response_cache,
+                    "tools.response_cache.namespace": f"{self.model_name}@{self.model_revision or 'main'}",
+                    "tools.response_cache.default_do_sample": bool(
+                        getattr(getattr(self.model, "generation_config", None), "do_sample", False)
+                    ),
+                }
+            )
+
+        # Runs after the response cache so that cache hits do not wait for a worker
+        cherrypy.tools.admission_acquire = cherrypy.Tool("before_handler", admission_acquire, priority=90)
+        # Runs after admission so that loading a model counts against the workers
+        cherrypy.tools.model_route = cherrypy.Tool("before_handler", model_route, priority=95)
         cherrypy.tools.CORS = cherrypy.Tool("before_handler", CORS)
+        # Runs after json_out so that the serialized response is cached
+        cherrypy.tools.response_cache = cherrypy.Tool("before_handler", cache_response, priority=80)
         cherrypy.tree.mount(self, "/api/v1/", conf)
         cherrypy.tools.CORS = cherrypy.Tool("before_finalize", CORS)
-        cherrypy.tools.sequential_unlocker = cherrypy.Tool("before_finalize", sequential_unlocker)
+        cherrypy.tools.admission_release = cherrypy.Tool("on_end_request", admission_release)
+        cherrypy.tools.model_release = cherrypy.Tool("on_end_request", model_release)
         cherrypy.engine.start()
         cherrypy.engine.block()
 
@@ -0,0 +1,201 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__file__)
+
+BatchFunction = Callable[[List[Any]], List[Any]]
+
+
+class MicroBatcher:
+    """
+    A dynamic micro-batching scheduler for API endpoints.
+
+    Concurrent requests submitted to the same endpoint are queued and coalesced into a single batch of up to
+    `max_batch_size` items. A batch is dispatched as soon as it is full or `max_wait_ms` milliseconds after its
+    first item arrived, whichever comes first. Each endpoint gets its own queue and worker thread, the batch
+    function is called once per batch and its outputs are scattered back to the waiting callers in order.
+
+    Endpoints may be keyed by request settings, so workers exit after `idle_timeout` seconds without requests and at
+    most `max_endpoints` endpoints have a worker at a time. Requests to further endpoints run unbatched.
+
+    Attributes:
+        max_batch_size (int): Maximum number of requests coalesced into one batch.
+        max_wait_ms (float): Maximum time in milliseconds to wait for a batch to fill up.
+        idle_timeout (Optional[float]): Seconds after which the worker of an idle endpoint exits, None to never exit.
+        max_endpoints (int): Maximum number of endpoints with a worker.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        idle_timeout: Optional[float] = 60.0,
+        max_endpoints: int = 64,
+    ) -> None:
+        """
+        Initializes the MicroBatcher.
+
+        Args:
+            max_batch_size (int): Maximum number of requests coalesced into one batch.
+            max_wait_ms (float): Maximum time in milliseconds to wait for a batch to fill up.
+            idle_timeout (Optional[float]): Seconds after which the worker of an idle endpoint exits, None to keep it.
+            max_endpoints (int): Maximum number of endpoints with a worker.
+        """
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self.idle_timeout = idle_timeout
+        self.max_endpoints = max(1, max_endpoints)
+
+        self._lock = threading.Lock()
+        self._queues: Dict[str, queue.Queue] = {}
+        self._functions: Dict[str, BatchFunction] = {}
+        self._workers: Dict[str, threading.Thread] = {}
+        self._histograms: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def submit(self, endpoint: str, item: Any, fn: BatchFunction) -> Any:
+        """
+        Submits one request to an endpoint queue and blocks until its batch has been processed.
+
+        Args:
+            endpoint (str): Name of the endpoint, each endpoint is batched independently.
+            item (Any): The request payload, passed to `fn` as one element of the batch.
+            fn (Callable[[List[Any]], List[Any]]): Function processing a list of items and returning one result per item.
+
+        Returns:
+            Any: The result produced by `fn` for this item.
+
+        Raises:
+            Exception: Any exception raised by `fn` while processing the batch containing this item.
+        """
+        future: Future = Future()
+        # Enqueued under the lock, so that the worker of the endpoint cannot exit in between
+        with self._lock:
+            q = self._queue(endpoint, fn)
+            if q is not None:
+                q.put((item, future))
+        if q is None:
+            return fn([item])[0]
+        return future.result()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the current queue depth and the batch size histogram of every endpoint.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per-endpoint queue depth, number of batches and batch size histogram.
+        """
+        with self._lock:
+            return {
+                endpoint: {
+                    "queue_depth": q.qsize(),
+                    "batches": sum(self._histograms[endpoint].values()),
+                    "batch_size_histogram": dict(sorted(self._histograms[endpoint].items())),
+                }
+                for endpoint, q in self._queues.items()
+            }
+
+    def _queue(self, endpoint: str, fn: BatchFunction) -> Optional[queue.Queue]:
+        """
+        Returns the queue of an endpoint, creating it and its worker thread on first use. Must hold the lock.
+
+        Args:
+            endpoint (str): Name of the endpoint.
+            fn (Callable[[List[Any]], List[Any]]): The batch function of the endpoint.
+
+        Returns:
+            Optional[queue.Queue]: The queue of the endpoint, None if `max_endpoints` endpoints already have a worker.
+        """
+        if endpoint not in self._queues:
+            if len(self._queues) >= self.max_endpoints:
+                return None
+            self._queues[endpoint] = queue.Queue()
+            self._functions[endpoint] = fn
+            worker = threading.Thread(target=self._run, args=(endpoint,), name=f"micro-batcher-{endpoint}", daemon=True)
+            self._workers[endpoint] = worker
+            worker.start()
+        return self._queues[endpoint]
+
+    def _collect(self, q: queue.Queue) -> List[Tuple[Any, Future]]:
+        """
+        Blocks for the first request of a batch and then gathers more until the batch is full or the wait expires.
+
+        Args:
+            q (queue.Queue): The endpoint queue.
+
+        Returns:
+            List[Tuple[Any, Future]]: The collected requests and their futures, empty if no request arrived within
+                `idle_timeout` seconds.
+        """
+        try:
+            batch = [q.get(timeout=self.idle_timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, endpoint: str) -> None:
+        """
+        Worker loop of an endpoint: collects batches, runs them and scatters the results back.
+
+        Args:
+            endpoint (str): Name of the endpoint.
+        """
+        q = self._queues[endpoint]
+        fn = self._functions[endpoint]
+
+        while True:
+            batch = self._collect(q)
+            if not batch:
+                with self._lock:
+                    if q.empty():
+                        del self._queues[endpoint], self._functions[endpoint], self._workers[endpoint]
+                        self._histograms.pop(endpoint, None)
+                        return
+                continue
+
+            items = [item for item, _ in batch]
+            with self._lock:
+                self._histograms[endpoint][len(batch)] += 1
+
+            try:
+                results = fn(items)
+                if len(results) != len(items):
+                    raise ValueError(
+                        f"Batch function of {endpoint} returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                log.exception(f"Error processing batch of {len(items)} items for {endpoint}: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
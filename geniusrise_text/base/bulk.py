@@ -14,22 +14,28 @@
 # limitations under the License.
 
 import os
-from typing import Any, Dict, List, Optional, Tuple, Union
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import llama_cpp
+import numpy as np
 import torch
 import transformers
 from geniusrise import BatchInput, BatchOutput, Bolt, State
 from geniusrise.logging import setup_logger
 from llama_cpp import Llama as LlamaCPP
 from optimum.bettertransformer import BetterTransformer
+from peft import PeftModel
 from ray.util.placement_group import PlacementGroup
 from transformers import (
     AutoModelForCausalLM,
     AutoTokenizer,
+    BatchEncoding,
     BeamSearchScorer,
     LogitsProcessorList,
     MinLengthLogitsProcessor,
+    TextIteratorStreamer,
 )
 from transformers.tokenization_utils_base import PreTrainedTokenizerBase
 from vllm import LLM, AsyncLLMEngine
@@ -37,7 +43,10 @@ from vllm.config import CacheConfig, DeviceConfig, LoRAConfig
 from vllm.config import ModelConfig as VLLMModelConfig
 from vllm.config import ParallelConfig, SchedulerConfig
 
+from geniusrise_text.base.adapters import AdapterSwitch
 from geniusrise_text.base.communication import send_email
+from geniusrise_text.base.prefix_cache import PrefixCache, common_prefix_length
+from geniusrise_text.base.streaming import stream_records
 
 
 class TextBulk(Bolt):
@@ -65,6 +74,9 @@ class TextBulk(Bolt):
         generate(prompt: str, decoding_strategy: str = "generate", **generation_params: Any) -> dict:
             Generates text based on the provided prompt and parameters. Supports multiple decoding strategies for diverse applications.
 
+        generate_batch(prompts: List[str], decoding_strategy: str = "generate", **generation_params: Any) -> List[str]:
+            Generates text for a batch of left-padded prompts with a single decoding call per batch.
+
     The class serves as a versatile tool for text generation, supporting various models and configurations.
     It can be extended or used as is for efficient text generation tasks.
     """
@@ -90,6 +102,8 @@ class TextBulk(Bolt):
         """
         super().__init__(input=input, output=output, state=state)
         self.log = setup_logger(self)
+        self.prefix_cache: Optional[PrefixCache] = None
+        self.adapters: Optional[AdapterSwitch] = None
 
     def generate(
         self,
@@ -192,7 +206,451 @@ class TextBulk(Bolt):
             - constraints: List of constraints to apply during beam search
             - synced_gpus: Whether to continue running the while loop until max_length (needed for ZeRO stage 3)
         """
-        results: Dict[int, Dict[str, Union[str, List[str]]]] = {}
+        decoding_method, strategy_params = self._prepare_generation(
+            decoding_strategy=decoding_strategy, batch_size=1, **generation_params
+        )
+
+        try:
+            self.log.debug(f"Generating completion for prompt {prompt}")
+
+            cached = self._prefix_cached_inputs([prompt], decoding_strategy, strategy_params)
+            if cached is not None:
+                # Resume from the cached keys and values of the prompt prefix
+                input_ids = cached.pop("input_ids")
+                generated_ids = decoding_method(input_ids, **cached, **strategy_params)
+            else:
+                inputs = self.tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
+                input_ids = inputs["input_ids"]
+                input_ids = input_ids.to(self.model.device)
+
+                # Replicate input_ids for beam search
+                if decoding_strategy in ["beam_search", "beam_sample", "group_beam_search"]:
+                    num_beams = strategy_params.get("num_beams", 1)
+                    input_ids = input_ids.repeat(num_beams, 1)
+
+                # Use the specified decoding strategy
+                generated_ids = decoding_method(input_ids, **strategy_params)
+
+            generated_text = self.tokenizer.decode(generated_ids[0], skip_special_tokens=True)
+            self.log.debug(f"Generated text: {generated_text}")
+
+            return generated_text
+
+        except Exception as e:
+            self.log.exception(f"An error occurred: {e}")
+            raise
+
+    def generate_stream(
+        self,
+        prompt: str,
+        decoding_strategy: str = "generate",
+        **generation_params: Any,
+    ) -> Iterator[str]:
+        r"""
+        Generate text completion for the given prompt, yielding the text as it is decoded.
+
+        Generation runs in a background thread feeding a `TextIteratorStreamer`, so the first tokens are available
+        long before the whole completion is. Supports the same decoding strategies and generation parameters as
+        `generate`, except the beam strategies which only know the best sequence at the end.
+
+        Args:
+            prompt (str): The prompt to generate text completion for.
+            decoding_strategy (str, optional): The decoding strategy to use. Defaults to "generate".
+            **generation_params (Any): Additional parameters to pass to the decoding strategy.
+
+        Yields:
+            str: The next piece of the completion, without the prompt.
+
+        Raises:
+            ValueError: If the decoding strategy is a beam strategy.
+            Exception: If an error occurs during generation.
+        """
+        if decoding_strategy in ["beam_search", "beam_sample", "group_beam_search", "constrained_beam_search"]:
+            raise ValueError(f"Streaming is not supported with {decoding_strategy}")
+
+        decoding_method, strategy_params = self._prepare_generation(
+            decoding_strategy=decoding_strategy, batch_size=1, **generation_params
+        )
+
+        cached = self._prefix_cached_inputs([prompt], decoding_strategy, strategy_params) or {}
+        if cached:
+            input_ids = cached.pop("input_ids")
+        else:
+            inputs = self.tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
+            input_ids = inputs["input_ids"].to(self.model.device)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+        errors: List[Exception] = []
+
+        def run() -> None:
+            try:
+                decoding_method(input_ids, streamer=streamer, **cached, **strategy_params)
+            except Exception as e:
+                self.log.exception(f"An error occurred: {e}")
+                errors.append(e)
+                streamer.end()
+
+        thread = threading.Thread(target=run, name="text-streamer", daemon=True)
+        thread.start()
+        for text in streamer:
+            if text:
+                yield text
+        thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def generate_batch(
+        self,
+        prompts: List[str],
+        decoding_strategy: str = "generate",
+        **generation_params: Any,
+    ) -> List[str]:
+        r"""
+        Generate text completions for a batch of prompts with a single decoding call.
+
+        The prompts are left-padded (for decoder-only models) into one tensor and passed to the decoding strategy along
+        with their attention mask, so that the whole batch is generated together. Supports the same decoding strategies
+        and generation parameters as `generate`.
+
+        Args:
+            prompts (List[str]): The prompts to generate text completions for.
+            decoding_strategy (str, optional): The decoding strategy to use. Defaults to "generate".
+            **generation_params (Any): Additional parameters to pass to the decoding strategy.
+
+        Returns:
+            List[str]: The generated text completions, one per prompt and in the order of the prompts.
+
+        Raises:
+            Exception: If an error occurs during generation.
+        """
+        if not prompts:
+            return []
+
+        decoding_method, strategy_params = self._prepare_generation(
+            decoding_strategy=decoding_strategy, batch_size=len(prompts), **generation_params
+        )
+
+        try:
+            self.log.debug(f"Generating completions for {len(prompts)} prompts")
+
+            cached = self._prefix_cached_inputs(prompts, decoding_strategy, strategy_params)
+            if cached is not None:
+                # Resume every prompt from the cached keys and values of their shared prefix
+                input_ids = cached.pop("input_ids")
+                generated_ids = decoding_method(input_ids, **cached, **strategy_params)
+            else:
+                # Decoder-only models continue generating from the last position, so prompts are padded on the left
+                left = not getattr(self.model.config, "is_encoder_decoder", False)
+                token_ids = self.tokenizer(prompts, truncation=True)["input_ids"]
+                input_ids, attention_mask = self._pad_prompts(token_ids, left)
+
+                # Replicate every prompt num_beams times, keeping the beams of a prompt contiguous
+                if decoding_strategy in ["beam_search", "beam_sample", "group_beam_search"]:
+                    num_beams = strategy_params.get("num_beams", 1)
+                    input_ids = input_ids.repeat_interleave(num_beams, dim=0)
+                    attention_mask = attention_mask.repeat_interleave(num_beams, dim=0)
+
+                generated_ids = decoding_method(input_ids, attention_mask=attention_mask, **strategy_params)
+
+            # Keep the first returned sequence of every prompt
+            num_return_sequences = strategy_params.get("num_return_sequences") or 1
+            generated_ids = generated_ids[::num_return_sequences]
+
+            generated_texts = self.tokenizer.batch_decode(generated_ids, skip_special_tokens=True)
+            self.log.debug(f"Generated texts: {generated_texts}")
+
+            return generated_texts
+
+        except Exception as e:
+            self.log.exception(f"An error occurred: {e}")
+            raise
+
+    def _pad_prompts(self, token_ids: List[List[int]], left: bool) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Pads tokenized prompts into one batch without touching the tokenizer's `padding_side`, which is shared by
+        concurrent requests.
+
+        Args:
+            token_ids (List[List[int]]): The token ids of every prompt.
+            left (bool): Whether to pad on the left rather than on the right.
+
+        Returns:
+            Tuple[torch.Tensor, torch.Tensor]: The input ids and attention mask, on the model's device.
+        """
+        pad_token_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else 0
+        width = max(len(ids) for ids in token_ids)
+        input_ids, attention_mask = [], []
+        for ids in token_ids:
+            padding = width - len(ids)
+            input_ids.append([pad_token_id] * padding + ids if left else ids + [pad_token_id] * padding)
+            attention_mask.append([0] * padding + [1] * len(ids) if left else [1] * len(ids) + [0] * padding)
+        return (
+            torch.tensor(input_ids, device=self.model.device),
+            torch.tensor(attention_mask, device=self.model.device),
+        )
+
+    def enable_prefix_cache(
+        self,
+        max_memory_mb: int = 1024,
+        min_prefix_tokens: int = 32,
+        prefixes: Optional[List[str]] = None,
+    ) -> None:
+        """
+        Enables reuse of the attention keys and values of prompt prefixes across generations.
+
+        Prompts starting with a cached prefix only run the model over the rest of the prompt. Prefixes are either
+        registered upfront, e.g. a system prompt or few-shot preamble, or detected when prompts share at least
+        `min_prefix_tokens` leading tokens. Only used with the "generate" strategy without beams on decoder-only models.
+
+        Args:
+            max_memory_mb (int): Memory budget of the cached keys and values in megabytes.
+            min_prefix_tokens (int): Minimum length of an automatically detected prefix.
+            prefixes (Optional[List[str]]): Prefixes to cache right away.
+        """
+        self.prefix_cache = PrefixCache(max_bytes=max_memory_mb << 20, min_prefix_tokens=min_prefix_tokens)
+        for prefix in prefixes or []:
+            self.register_prefix(prefix)
+
+    def register_prefix(self, prefix: str) -> int:
+        """
+        Computes and caches the attention keys and values of a prompt prefix.
+
+        The last token of the prefix is left out, since it may merge with the text that follows it when a whole
+        prompt is tokenized.
+
+        Args:
+            prefix (str): The prefix, e.g. a system prompt.
+
+        Returns:
+            int: The number of tokens cached.
+        """
+        if self.prefix_cache is None:
+            self.enable_prefix_cache()
+
+        token_ids = self.tokenizer(prefix, truncation=True)["input_ids"][:-1]
+        if token_ids:
+            self.prefix_cache.put(token_ids, self._prefix_past_key_values(token_ids))  # type: ignore
+        return len(token_ids)
+
+    def _prefix_past_key_values(self, token_ids: List[int]) -> Any:
+        """
+        Runs the model over a prefix and returns its attention keys and values.
+
+        Args:
+            token_ids (List[int]): The token ids of the prefix.
+
+        Returns:
+            Any: The keys and values as a legacy tuple of per-layer tuples of tensors.
+        """
+        with torch.no_grad():
+            outputs = self.model(input_ids=torch.tensor([token_ids], device=self.model.device), use_cache=True)
+        past_key_values = outputs.past_key_values
+        if hasattr(past_key_values, "to_legacy_cache"):
+            past_key_values = past_key_values.to_legacy_cache()
+        return past_key_values
+
+    def load_adapters(self, adapters: Union[Dict[str, str], List[str]]) -> None:
+        """
+        Loads LoRA adapters on top of the model, so that they share its base weights.
+
+        The adapters are kept inactive until selected with `using_adapter`. Adapters can be loaded at any time, loading
+        waits for running generations to finish.
+
+        Args:
+            adapters (Union[Dict[str, str], List[str]]): Paths of adapters saved by `TextFineTuner` or
+                `PeftModel.save_pretrained`, by name. Adapters given as a list are named after their folder.
+        """
+        if isinstance(adapters, list):
+            adapters = {os.path.basename(os.path.normpath(path)): path for path in adapters}
+        if self.adapters is None:
+            self.adapters = AdapterSwitch(self._activate_adapter)
+
+        with self.adapters.exclusive():
+            for name, path in adapters.items():
+                self.log.info(f"Loading adapter {name} from {path}")
+                if isinstance(self.model, PeftModel):
+                    self.model.load_adapter(path, adapter_name=name, is_trainable=False)
+                else:
+                    self.model = PeftModel.from_pretrained(self.model, path, adapter_name=name, is_trainable=False)
+            self._activate_adapter(self.adapters.active)
+
+    def remove_adapter(self, name: str) -> None:
+        """
+        Removes a LoRA adapter, freeing its weights. Waits for running generations to finish.
+
+        Args:
+            name (str): The name of the adapter.
+
+        Raises:
+            ValueError: If no adapter is loaded under this name.
+        """
+        if not self.has_adapter(name):
+            raise ValueError(f"Unknown adapter {name}")
+
+        with self.adapters.exclusive():  # type: ignore
+            if self.adapters.active == name:  # type: ignore
+                self._activate_adapter(None)
+                self.adapters.active = None  # type: ignore
+            self.model.base_model.delete_adapter(name)
+        self.log.info(f"Removed adapter {name}")
+
+    def has_adapter(self, name: str) -> bool:
+        """
+        Tells whether a LoRA adapter is loaded under a name.
+
+        Args:
+            name (str): The name of the adapter.
+
+        Returns:
+            bool: True if the adapter can be selected with `using_adapter`.
+        """
+        return self.adapters is not None and name in getattr(self.model, "peft_config", {})
+
+    @contextmanager
+    def using_adapter(self, adapter: Optional[str]) -> Iterator[None]:
+        """
+        Runs a `with` block with a LoRA adapter active, waiting for generations using other adapters to finish.
+
+        Concurrent callers asking for the same adapter run together, see `AdapterSwitch`.
+
+        Args:
+            adapter (Optional[str]): The name of the adapter, None for the base model.
+
+        Raises:
+            ValueError: If no adapter is loaded under this name.
+        """
+        if adapter is not None and not self.has_adapter(adapter):
+            raise ValueError(f"Unknown adapter {adapter}")
+        if self.adapters is None:
+            yield
+            return
+
+        with self.adapters.use(adapter):
+            yield
+
+    def group_by_adapter(
+        self, adapters: List[Optional[str]], batch_size: int = 8
+    ) -> List[Tuple[Optional[str], List[int]]]:
+        """
+        Splits rows into batches of rows using the same LoRA adapter, so that every adapter is activated once.
+
+        Args:
+            adapters (List[Optional[str]]): The adapter of every row, None for the base model.
+            batch_size (int): Maximum number of rows per batch. Defaults to 8.
+
+        Returns:
+            List[Tuple[Optional[str], List[int]]]: The adapter and row indices of every batch, adapters in order of
+                first appearance and rows in their original order.
+        """
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, adapter in enumerate(adapters):
+            groups.setdefault(adapter, []).append(i)
+        return [
+            (adapter, indices[i : i + batch_size])
+            for adapter, indices in groups.items()
+            for i in range(0, len(indices), batch_size)
+        ]
+
+    def _activate_adapter(self, adapter: Optional[str]) -> None:
+        """
+        Activates a LoRA adapter on the model, or disables all of them.
+
+        Args:
+            adapter (Optional[str]): The name of the adapter, None for the base model.
+        """
+        if adapter is None:
+            self.model.base_model.disable_adapter_layers()
+        else:
+            self.model.base_model.enable_adapter_layers()
+            self.model.set_adapter(adapter)
+
+    def _prefix_cached_inputs(
+        self,
+        prompts: List[str],
+        decoding_strategy: str,
+        strategy_params: Dict[str, Any],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Prepares generation inputs resuming from the cached keys and values of the prefix shared by the prompts.
+
+        The shared prefix is followed by the left-padded rest of every prompt, with padding masked out so that each
+        prompt continues right after its own last token.
+
+        Args:
+            prompts (List[str]): The prompts.
+            decoding_strategy (str): The decoding strategy.
+            strategy_params (Dict[str, Any]): The parameters of the decoding strategy.
+
+        Returns:
+            Optional[Dict[str, Any]]: The input ids, attention mask and past key values, or None if the prefix cache
+                is disabled, does not apply to the decoding strategy or has no prefix for the prompts.
+        """
+        if (
+            self.prefix_cache is None
+            # Cached keys and values are computed by the base model
+            or (self.adapters is not None and self.adapters.active is not None)
+            or decoding_strategy != "generate"
+            or getattr(self.model.config, "is_encoder_decoder", False)
+            or (strategy_params.get("num_beams") or 1) > 1
+            or (strategy_params.get("num_return_sequences") or 1) > 1
+            or strategy_params.get("penalty_alpha")
+        ):
+            return None
+
+        token_ids = self.tokenizer(prompts, truncation=True)["input_ids"]
+
+        # Every prompt needs at least one token after the prefix to resume generation from
+        common = token_ids[0][: min(len(ids) for ids in token_ids) - 1]
+        for ids in token_ids[1:]:
+            common = common[: common_prefix_length(common, ids)]
+
+        length, past_key_values = self.prefix_cache.longest(common)
+        if past_key_values is None:
+            if len(prompts) > 1:
+                length = len(common) if len(common) >= self.prefix_cache.min_prefix_tokens else 0
+            else:
+                length = self.prefix_cache.observe(common)
+            if not length:
+                return None
+            past_key_values = self._prefix_past_key_values(common[:length])
+            self.prefix_cache.put(common[:length], past_key_values)
+            self.log.debug(f"Cached the keys and values of a {length} token prefix")
+
+        pad_token_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else 0
+        suffixes = [ids[length:] for ids in token_ids]
+        width = max(len(suffix) for suffix in suffixes)
+        input_ids = [common[:length] + [pad_token_id] * (width - len(suffix)) + suffix for suffix in suffixes]
+        attention_mask = [[1] * length + [0] * (width - len(suffix)) + [1] * len(suffix) for suffix in suffixes]
+
+        if len(prompts) > 1:
+            past_key_values = tuple(
+                tuple(t.repeat(len(prompts), *([1] * (t.dim() - 1))) for t in layer) for layer in past_key_values
+            )
+
+        return {
+            "input_ids": torch.tensor(input_ids, device=self.model.device),
+            "attention_mask": torch.tensor(attention_mask, device=self.model.device),
+            "past_key_values": past_key_values,
+        }
+
+    def _prepare_generation(
+        self,
+        decoding_strategy: str = "generate",
+        batch_size: int = 1,
+        **generation_params: Any,
+    ) -> Tuple[Callable, Dict[str, Any]]:
+        """
+        Resolves the decoding method and its parameters for a decoding strategy.
+
+        Args:
+            decoding_strategy (str, optional): The decoding strategy to use. Defaults to "generate".
+            batch_size (int, optional): Number of prompts decoded together, used to size beam scorers. Defaults to 1.
+            **generation_params (Any): User-provided parameters overriding the strategy defaults.
+
+        Returns:
+            Tuple[Callable, Dict[str, Any]]: The decoding method of the model and the parameters to call it with.
+        """
         eos_token_id = self.model.config.eos_token_id
         pad_token_id = self.model.config.pad_token_id
         if not pad_token_id:
@@ -344,7 +802,7 @@ class TextBulk(Bolt):
                 [MinLengthLogitsProcessor(min_length=strategy_params.get("min_length", 0), eos_token_id=eos_token_id)]
             )
             beam_scorer = BeamSearchScorer(
-                batch_size=1,
+                batch_size=batch_size,
                 max_length=strategy_params.get("max_length", 20),
                 num_beams=strategy_params.get("num_beams", 1),
                 device=self.model.device,
@@ -357,7 +815,7 @@ class TextBulk(Bolt):
                 strategy_params.update({"logits_warper": LogitsProcessorList()})
 
         # Map of decoding strategy to method
-        strategy_to_method = {
+        strategy_to_method: Dict[str, Callable] = {
             "generate": self.model.generate,
             "greedy_search": self.model.greedy_search,
             "contrastive_search": self.model.contrastive_search,
@@ -368,30 +826,198 @@ class TextBulk(Bolt):
             "constrained_beam_search": self.model.constrained_beam_search,
         }
 
-        try:
-            self.log.debug(f"Generating completion for prompt {prompt}")
+        decoding_method = strategy_to_method.get(decoding_strategy, self.model.generate)
+        return decoding_method, strategy_params
 
-            inputs = self.tokenizer(prompt, return_tensors="pt", padding=True, truncation=True)
-            input_ids = inputs["input_ids"]
-            input_ids = input_ids.to(self.model.device)
+    def stream_dataset(
+        self,
+        dataset_path: str,
+        columns: Optional[List[str]] = None,
+        chunk_size: int = 4096,
+    ) -> Iterator[Dict[str, List[Any]]]:
+        """
+        Lazily streams a dataset folder in chunks of rows, without materializing the whole dataset in memory.
+        This is the streaming counterpart of the tasks' `load_dataset`, supporting the same file formats.
 
-            # Replicate input_ids for beam search
-            if decoding_strategy in ["beam_search", "beam_sample", "group_beam_search"]:
-                num_beams = strategy_params.get("num_beams", 1)
-                input_ids = input_ids.repeat(num_beams, 1)
+        Args:
+            dataset_path (str): The path to the dataset directory.
+            columns (Optional[List[str]]): The columns to read, all columns if None.
+            chunk_size (int): Number of rows per chunk. Defaults to 4096.
 
-            # Use the specified decoding strategy
-            decoding_method = strategy_to_method.get(decoding_strategy, self.model.generate)
-            generated_ids = decoding_method(input_ids, **strategy_params)
+        Yields:
+            Dict[str, List[Any]]: A chunk of rows as a dictionary of column name to values.
+        """
+        self.log.info(f"Streaming dataset from {dataset_path}")
+        map_data = eval(self.map_data) if hasattr(self, "map_data") and self.map_data else None  # type: ignore
 
-            generated_text = self.tokenizer.decode(generated_ids[0], skip_special_tokens=True)
-            self.log.debug(f"Generated text: {generated_text}")
+        for chunk in stream_records(dataset_path, columns=None if map_data else columns, batch_size=chunk_size):
+            if map_data:
+                records = [map_data(dict(zip(chunk.keys(), values))) for values in zip(*chunk.values())]
+                chunk = {c: [r.get(c) for r in records] for c in (columns or records[0].keys())}
+            yield chunk
 
-            return generated_text
+    def batch_indices(
+        self,
+        texts: List[Any],
+        batch_size: int = 32,
+        sort_by_length: bool = False,
+        max_tokens_per_batch: Optional[int] = None,
+        text_pairs: Optional[List[Any]] = None,
+    ) -> List[List[int]]:
+        """
+        Splits a dataset into batches of row indices, optionally bucketing rows of similar token length together.
 
-        except Exception as e:
-            self.log.exception(f"An error occurred: {e}")
-            raise
+        Without bucketing the rows are sliced in input order, exactly like `dataset[i : i + batch_size]`. With
+        `sort_by_length` the rows are sorted by their token count first, so that every batch is padded to a length close
+        to that of its own rows. With `max_tokens_per_batch` a batch is closed as soon as its padded size
+        (rows x longest row) would exceed the budget, instead of after a fixed number of rows.
+
+        Args:
+            texts (List[Any]): The texts to batch.
+            batch_size (int): Number of rows per batch, ignored when `max_tokens_per_batch` is set. Defaults to 32.
+            sort_by_length (bool): Whether to sort rows by token length before batching. Defaults to False.
+            max_tokens_per_batch (Optional[int]): Budget of padded tokens per batch. Defaults to None.
+            text_pairs (Optional[List[Any]]): Second sequences of text pairs, counted into the token length of each row.
+
+        Returns:
+            List[List[int]]: The row indices of every batch.
+        """
+        if not sort_by_length and not max_tokens_per_batch:
+            return [list(range(i, min(i + batch_size, len(texts)))) for i in range(0, len(texts), batch_size)]
+
+        if text_pairs is not None:
+            encodings = self.tokenizer(list(texts), list(text_pairs), truncation=True)
+        else:
+            encodings = self.tokenizer(list(texts), truncation=True)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+
+        order = sorted(range(len(texts)), key=lambda i: lengths[i]) if sort_by_length else list(range(len(texts)))
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        longest = 0
+        for i in order:
+            padded_length = max(longest, lengths[i])
+            if max_tokens_per_batch:
+                full = padded_length * (len(current) + 1) > max_tokens_per_batch
+            else:
+                full = len(current) >= batch_size
+            if current and full:
+                batches.append(current)
+                current = []
+                padded_length = lengths[i]
+            current.append(i)
+            longest = padded_length
+        if current:
+            batches.append(current)
+
+        self.log.debug(f"Split {len(texts)} rows into {len(batches)} batches")
+        return batches
+
+    def ordered_results(
+        self,
+        batches: List[List[int]],
+        process: Callable[[List[int]], List[Any]],
+        chunk_size: int = 32,
+    ) -> Iterator[Tuple[int, List[Any]]]:
+        """
+        Processes batches of row indices in any order and yields the results back in the original row order.
+
+        Results are buffered until a contiguous chunk of `chunk_size` rows starting at the next unreturned row is complete,
+        so with in-order batches every chunk is yielded as soon as its batch has been processed.
+
+        Args:
+            batches (List[List[int]]): The row indices of every batch, as returned by `batch_indices`.
+            process (Callable[[List[int]], List[Any]]): Function returning one result per row index of a batch.
+            chunk_size (int): Number of rows per yielded chunk. Defaults to 32.
+
+        Yields:
+            Tuple[int, List[Any]]: The index of the first row of the chunk and the results of the rows of the chunk.
+        """
+        num_rows = sum(len(indices) for indices in batches)
+        results: Dict[int, Any] = {}
+        start = 0
+
+        for indices in batches:
+            for i, result in zip(indices, process(indices)):
+                results[i] = result
+
+            while start < num_rows:
+                end = min(start + chunk_size, num_rows)
+                if any(i not in results for i in range(start, end)):
+                    break
+                yield start, [results.pop(i) for i in range(start, end)]
+                start = end
+
+    def chunk_documents(
+        self,
+        texts: List[str],
+        max_length: Optional[int] = None,
+        stride: int = 64,
+        batch_size: int = 32,
+        **model_args: Any,
+    ) -> Tuple[np.ndarray, BatchEncoding]:
+        """
+        Runs the model over texts of any length, split into overlapping windows of tokens instead of truncated.
+
+        Every text is split into windows of at most `max_length` tokens, consecutive windows sharing `stride` tokens.
+        The windows of all texts are run `batch_size` at a time, whatever text they come from, every batch padded only
+        to its longest window. The logits of the windows of a text are merged by the caller, e.g. with `pool_windows`
+        or `stitch_windows`.
+
+        Args:
+            texts (List[str]): The texts.
+            max_length (Optional[int]): Maximum number of tokens of a window. Defaults to the model's maximum length.
+            stride (int): Number of tokens shared by consecutive windows of a text. Defaults to 64.
+            batch_size (int): Number of windows per forward pass. Defaults to 32.
+            **model_args (Any): Additional arguments passed to the model's forward pass.
+
+        Returns:
+            Tuple[np.ndarray, BatchEncoding]: The logits of every window, and the windows with the text of every window
+                in `overflow_to_sample_mapping` and the character offsets of their tokens in `offset_mapping`.
+
+        Raises:
+            ValueError: If the tokenizer is not a fast tokenizer.
+        """
+        if not getattr(self.tokenizer, "is_fast", False):
+            raise ValueError("Chunking long documents requires a fast tokenizer")
+
+        model_max_length = self.tokenizer.model_max_length
+        windows = self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=min(max_length or model_max_length, model_max_length),
+            stride=stride,
+            padding=True,
+            return_overflowing_tokens=True,
+            return_offsets_mapping=True,
+            return_tensors="np",
+        )
+        names = [name for name in self.tokenizer.model_input_names if name in windows]
+        lengths = windows["attention_mask"].sum(axis=1)
+        left = self.tokenizer.padding_side == "left"
+        num_tokens = windows["input_ids"].shape[1]
+        device = next(self.model.parameters()).device
+
+        logits = []
+        for i in range(0, len(lengths), batch_size):
+            width = int(lengths[i : i + batch_size].max())
+            columns = slice(num_tokens - width, None) if left else slice(0, width)
+            inputs = {
+                name: torch.as_tensor(windows[name][i : i + batch_size, columns], device=device) for name in names
+            }
+            with torch.no_grad():
+                outputs = self.model(**inputs, **model_args)
+            batch_logits = (outputs[0] if isinstance(outputs, tuple) else outputs.logits).float().cpu().numpy()
+
+            # Token logits are padded back to the width of the windows to stay aligned with their offsets
+            if batch_logits.ndim == 3:
+                padding = (num_tokens - width, 0) if left else (0, num_tokens - width)
+                batch_logits = np.pad(batch_logits, ((0, 0), padding, (0, 0)))
+            logits.append(batch_logits)
+
+        self.log.debug(f"Split {len(texts)} texts into {len(lengths)} windows")
+        return np.concatenate(logits), windows
 
     def _get_torch_dtype(self, precision: str) -> torch.dtype:
         """
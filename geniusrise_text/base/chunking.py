@@ -0,0 +1,104 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Tuple
+
+import numpy as np
+
+POOLING_STRATEGIES = ("mean", "max")
+
+
+def pool_windows(logits: np.ndarray, samples: np.ndarray, num_documents: int, pooling: str = "mean") -> np.ndarray:
+    """
+    Pools the sequence classification logits of the windows of every document into one row per document.
+
+    Args:
+        logits (np.ndarray): Logits of shape (windows, labels).
+        samples (np.ndarray): The document of every window.
+        num_documents (int): Number of documents.
+        pooling (str): "mean" to average the logits of the windows of a document, "max" to take their maximum.
+
+    Returns:
+        np.ndarray: Logits of shape (documents, labels).
+    """
+    if pooling not in POOLING_STRATEGIES:
+        raise ValueError(f"Unsupported pooling. Choose from {', '.join(POOLING_STRATEGIES)}.")
+
+    samples = np.asarray(samples, dtype=np.int64)
+    logits = logits.astype(np.float32)
+    if pooling == "max":
+        pooled = np.full((num_documents, logits.shape[1]), -np.inf, dtype=np.float32)
+        np.maximum.at(pooled, samples, logits)
+        return pooled
+
+    pooled = np.zeros((num_documents, logits.shape[1]), dtype=np.float32)
+    np.add.at(pooled, samples, logits)
+    return pooled / np.maximum(np.bincount(samples, minlength=num_documents), 1)[:, None]
+
+
+def stitch_windows(
+    logits: np.ndarray, offsets: np.ndarray, mask: np.ndarray, samples: np.ndarray, num_documents: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stitches the token logits of overlapping windows back into one sequence per document.
+
+    A token in the overlap of two windows is taken from the window where it has the most context, i.e. where it is
+    furthest from the window's edges, so that an entity cut by the edge of one window is read from the other one.
+    Special and padding tokens are dropped.
+
+    Args:
+        logits (np.ndarray): Token logits of shape (windows, tokens, labels).
+        offsets (np.ndarray): Character offsets of every token in its document, of shape (windows, tokens, 2).
+        mask (np.ndarray): Attention mask of shape (windows, tokens).
+        samples (np.ndarray): The document of every window.
+        num_documents (int): Number of documents.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The logits, offsets and mask of the documents, of shapes
+            (documents, tokens, labels), (documents, tokens, 2) and (documents, tokens), padded to the longest one.
+    """
+    samples = np.asarray(samples, dtype=np.int64)
+    offsets = offsets.astype(np.int64)
+    valid = mask.astype(bool) & (offsets[..., 1] > offsets[..., 0])
+
+    # Distance of every token to the nearest edge of the text of its window
+    positions = np.arange(valid.shape[1])
+    firsts = valid.argmax(axis=1)
+    lasts = valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+    context = np.minimum(positions[None, :] - firsts[:, None], lasts[:, None] - positions[None, :])
+
+    windows, tokens = np.nonzero(valid)
+    documents = samples[windows]
+    starts = offsets[windows, tokens, 0]
+
+    # Sort by document and offset, the copy of a token with the most context first, and keep that one
+    order = np.lexsort((-context[windows, tokens], starts, documents))
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = (documents[order][1:] != documents[order][:-1]) | (starts[order][1:] != starts[order][:-1])
+    selected = order[keep]
+
+    counts = np.bincount(documents[selected], minlength=num_documents)
+    columns = np.arange(len(selected)) - np.repeat(np.cumsum(counts) - counts, counts)
+    width = max(int(counts.max(initial=0)), 1)
+
+    stitched_logits = np.zeros((num_documents, width, logits.shape[-1]), dtype=np.float32)
+    stitched_offsets = np.zeros((num_documents, width, 2), dtype=np.int64)
+    stitched_mask = np.zeros((num_documents, width), dtype=np.int64)
+
+    rows = documents[selected]
+    stitched_logits[rows, columns] = logits[windows[selected], tokens[selected]]
+    stitched_offsets[rows, columns] = offsets[windows[selected], tokens[selected]]
+    stitched_mask[rows, columns] = 1
+    return stitched_logits, stitched_offsets, stitched_mask
@@ -0,0 +1,100 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Coroutine, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class EventLoopThread:
+    """
+    A long-lived asyncio event loop running in a daemon thread.
+
+    Async servers such as vLLM's OpenAI servers are created on the loop and keep their background tasks there.
+    Request threads submit coroutines to it, so concurrent requests are awaited together on one loop instead of
+    each creating and tearing down its own.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): The event loop.
+    """
+
+    def __init__(self, name: str = "event-loop") -> None:
+        """
+        Initializes the EventLoopThread and starts its loop.
+
+        Args:
+            name (str): Name of the thread.
+        """
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """
+        Runs a coroutine on the loop and blocks the calling thread until it completes.
+
+        Args:
+            coro (Coroutine[Any, Any, T]): The coroutine.
+            timeout (Optional[float]): Seconds to wait for the result, None to wait forever.
+
+        Returns:
+            T: The result of the coroutine.
+
+        Raises:
+            Exception: Any exception raised by the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """
+        Iterates an async generator running on the loop from the calling thread.
+
+        Args:
+            agen (AsyncIterator[T]): The async generator.
+
+        Yields:
+            T: The items of the async generator.
+        """
+
+        async def step(awaitable: Awaitable[T]) -> T:
+            return await awaitable
+
+        try:
+            while True:
+                try:
+                    yield self.run(step(agen.__anext__()))
+                except StopAsyncIteration:
+                    break
+        finally:
+            aclose = getattr(agen, "aclose", None)
+            if aclose is not None:
+                self.run(step(aclose()))
+
+    def stop(self) -> None:
+        """
+        Stops the loop and waits for its thread to exit.
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """
+        Runs the loop until `stop` is called.
+        """
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
@@ -0,0 +1,217 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+PastKeyValues = Any
+
+
+def common_prefix_length(a: Sequence[int], b: Sequence[int]) -> int:
+    """
+    Returns the length of the longest common prefix of two token id sequences.
+
+    Args:
+        a (Sequence[int]): The first sequence.
+        b (Sequence[int]): The second sequence.
+
+    Returns:
+        int: The number of leading tokens the sequences share.
+    """
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+def past_key_values_nbytes(past_key_values: PastKeyValues) -> int:
+    """
+    Returns the memory held by the tensors of a legacy `past_key_values` tuple.
+
+    Args:
+        past_key_values (Any): A tuple of per-layer tuples of tensors.
+
+    Returns:
+        int: The size in bytes.
+    """
+    return sum(t.numel() * t.element_size() for layer in past_key_values for t in layer)
+
+
+class _Node:
+    __slots__ = ("children", "past_key_values")
+
+    def __init__(self) -> None:
+        self.children: Dict[int, "_Node"] = {}
+        self.past_key_values: Optional[PastKeyValues] = None
+
+
+class PrefixCache:
+    """
+    A cache of attention keys and values of prompt prefixes, so that generation can resume after a shared prefix
+    instead of recomputing it.
+
+    Prefixes are stored in a trie keyed by token ids and looked up by the longest cached prefix of a prompt. Entries
+    are evicted least recently used first once their total size exceeds the memory budget. Besides explicitly
+    registered prefixes, prompts sharing at least `min_prefix_tokens` leading tokens with a recently seen prompt are
+    detected and their common prefix becomes a candidate for caching.
+
+    Attributes:
+        max_bytes (int): Memory budget of the cached keys and values.
+        min_prefix_tokens (int): Minimum length of an automatically detected prefix.
+        history_size (int): Number of recent prompts compared against to detect common prefixes.
+        hits (int): Number of lookups that found a cached prefix.
+        misses (int): Number of lookups that did not.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30, min_prefix_tokens: int = 32, history_size: int = 64) -> None:
+        """
+        Initializes the PrefixCache.
+
+        Args:
+            max_bytes (int): Memory budget of the cached keys and values.
+            min_prefix_tokens (int): Minimum length of an automatically detected prefix.
+            history_size (int): Number of recent prompts compared against to detect common prefixes.
+        """
+        self.max_bytes = max_bytes
+        self.min_prefix_tokens = min_prefix_tokens
+        self.history_size = history_size
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._root = _Node()
+        self._entries: "OrderedDict[Tuple[int, ...], int]" = OrderedDict()
+        self._bytes = 0
+        self._history: Deque[Tuple[int, ...]] = deque(maxlen=history_size)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the memory held by the cached keys and values in bytes.
+        """
+        return self._bytes
+
+    def put(self, token_ids: Sequence[int], past_key_values: PastKeyValues) -> None:
+        """
+        Caches the keys and values of a prefix, evicting the least recently used prefixes beyond the memory budget.
+
+        Args:
+            token_ids (Sequence[int]): The token ids of the prefix.
+            past_key_values (Any): Their keys and values, as a legacy tuple of per-layer tuples of tensors.
+        """
+        key = tuple(token_ids)
+        nbytes = past_key_values_nbytes(past_key_values)
+        if not key or nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            node = self._root
+            for token in key:
+                node = node.children.setdefault(token, _Node())
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)
+            node.past_key_values = past_key_values
+            self._entries[key] = nbytes
+            self._bytes += nbytes
+
+            while self._bytes > self.max_bytes:
+                evicted, size = self._entries.popitem(last=False)
+                self._remove(evicted)
+                self._bytes -= size
+
+    def longest(self, token_ids: Sequence[int]) -> Tuple[int, Optional[PastKeyValues]]:
+        """
+        Finds the longest cached prefix of a token id sequence.
+
+        Args:
+            token_ids (Sequence[int]): The token ids of a prompt.
+
+        Returns:
+            Tuple[int, Optional[Any]]: The length of the cached prefix and its keys and values, or (0, None).
+        """
+        with self._lock:
+            node = self._root
+            length, past_key_values = 0, None
+            for i, token in enumerate(token_ids):
+                node = node.children.get(token)  # type: ignore
+                if node is None:
+                    break
+                if node.past_key_values is not None:
+                    length, past_key_values = i + 1, node.past_key_values
+
+            if past_key_values is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(tuple(token_ids[:length]))
+            return length, past_key_values
+
+    def observe(self, token_ids: Sequence[int]) -> int:
+        """
+        Records a prompt and detects a prefix it shares with recently seen prompts.
+
+        Args:
+            token_ids (Sequence[int]): The token ids of a prompt.
+
+        Returns:
+            int: Length of the longest prefix shared with a recent prompt, or 0 if shorter than `min_prefix_tokens`.
+        """
+        key = tuple(token_ids)
+        with self._lock:
+            length = max((common_prefix_length(key, seen) for seen in self._history), default=0)
+            self._history.append(key)
+        return length if length >= self.min_prefix_tokens else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the counters and occupancy of the cache.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, the number of cached prefixes, their lengths and their size in bytes.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "prefixes": len(self._entries),
+                "prefix_lengths": sorted(len(key) for key in self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: Tuple[int, ...]) -> None:
+        """
+        Removes a prefix from the trie, pruning the branches left empty. Must hold the lock.
+
+        Args:
+            key (Tuple[int, ...]): The token ids of the prefix.
+        """
+        path: List[Tuple[_Node, int]] = []
+        node = self._root
+        for token in key:
+            path.append((node, token))
+            node = node.children[token]
+        node.past_key_values = None
+
+        for parent, token in reversed(path):
+            child = parent.children[token]
+            if child.children or child.past_key_values is not None:
+                break
+            del parent.children[token]
@@ -0,0 +1,297 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import torch
+
+log = logging.getLogger(__name__)
+
+ModelSpec = Dict[str, Any]
+ModelLoader = Callable[[ModelSpec], Tuple[Any, Any]]
+
+
+def model_nbytes(model: Any) -> int:
+    """
+    Returns the memory held by the parameters and buffers of a model.
+
+    Args:
+        model (Any): A Hugging Face or PyTorch model.
+
+    Returns:
+        int: The size in bytes, 0 if it cannot be determined.
+    """
+    if hasattr(model, "get_memory_footprint"):
+        return int(model.get_memory_footprint())
+    if isinstance(model, torch.nn.Module):
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    return 0
+
+
+class ServedModel:
+    """
+    A model held by a `ModelRegistry`.
+
+    Attributes:
+        name (str): The name requests select the model by.
+        model (Any): The loaded model.
+        tokenizer (Any): Its tokenizer.
+        prefix_cache (Any): Prompt prefix cache of the model, None as registered models do not cache prefixes.
+        nbytes (int): Memory held by the model.
+        pinned (bool): Whether the model is never evicted.
+    """
+
+    def __init__(self, name: str, model: Any, tokenizer: Any, pinned: bool = False) -> None:
+        self.name = name
+        self.model = model
+        self.tokenizer = tokenizer
+        self.prefix_cache = None
+        self.nbytes = model_nbytes(model)
+        self.pinned = pinned
+        self.in_use = 0
+        self.loaded_at = time.time()
+
+
+class ServingAttribute:
+    """
+    An attribute resolving to the model serving the current thread, if any, and to the instance's own value otherwise.
+
+    Lets endpoints keep using `self.model` and `self.tokenizer` while requests are routed to registry models. The
+    serving model of a thread is set in the `_serving` thread local of the instance. Per-model state, e.g. caches
+    derived from the tokenizer, is stored on the serving model too, and is None until first set.
+    """
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj: Any, objtype: Optional[type] = None) -> Any:
+        if obj is None:
+            return self
+        served = getattr(obj.__dict__.get("_serving"), "served", None)
+        if served is not None:
+            return getattr(served, self.name, None)
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, obj: Any, value: Any) -> None:
+        served = getattr(obj.__dict__.get("_serving"), "served", None)
+        if served is not None:
+            setattr(served, self.name, value)
+        else:
+            obj.__dict__[self.name] = value
+
+
+class ModelRegistry:
+    """
+    Serves several models from one process, loading them on first use and evicting the least recently used ones.
+
+    Models are registered by name with the arguments to load them. A model is loaded the first time a request selects
+    it and stays loaded until the total memory of the loaded models exceeds `max_memory_mb` or their number exceeds
+    `max_models`, in which case the least recently used models not serving a request are unloaded. An unloaded model
+    is loaded again, from the local Hugging Face cache, when it is selected next.
+
+    Attributes:
+        max_memory_mb (int): Memory budget of the loaded models in megabytes, 0 for no limit.
+        max_models (int): Maximum number of loaded models, 0 for no limit.
+    """
+
+    def __init__(self, loader: ModelLoader, max_memory_mb: int = 0, max_models: int = 0) -> None:
+        """
+        Initializes the ModelRegistry.
+
+        Args:
+            loader (Callable[[Dict[str, Any]], Tuple[Any, Any]]): Loads the model and tokenizer of a model spec.
+            max_memory_mb (int): Memory budget of the loaded models in megabytes, 0 for no limit.
+            max_models (int): Maximum number of loaded models, 0 for no limit.
+        """
+        self.loader = loader
+        self.max_memory_mb = max_memory_mb
+        self.max_models = max_models
+
+        self._lock = threading.Lock()
+        self._specs: Dict[str, ModelSpec] = {}
+        self._loaded: "OrderedDict[str, ServedModel]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._counters: Dict[str, int] = {"loads": 0, "evictions": 0}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def register(self, name: str, spec: Union[str, ModelSpec]) -> None:
+        """
+        Registers a model without loading it.
+
+        Args:
+            name (str): The name requests select the model by.
+            spec (Union[str, Dict[str, Any]]): The model name, optionally followed by `:revision`, or the arguments of
+                the loader with at least a `model_name`.
+        """
+        spec = {"model_name": spec} if isinstance(spec, str) else dict(spec)
+        spec.setdefault("model_name", name)
+        with self._lock:
+            self._specs[name] = spec
+
+    def add(self, name: str, model: Any, tokenizer: Any, pinned: bool = True) -> ServedModel:
+        """
+        Adds an already loaded model, e.g. the one loaded at startup.
+
+        Args:
+            name (str): The name requests select the model by.
+            model (Any): The model.
+            tokenizer (Any): Its tokenizer.
+            pinned (bool): Whether the model is never evicted.
+
+        Returns:
+            ServedModel: The registry entry of the model.
+        """
+        served = ServedModel(name, model, tokenizer, pinned=pinned)
+        with self._lock:
+            self._specs.setdefault(name, {"model_name": name})
+            self._loaded[name] = served
+            self._evict()
+        return served
+
+    def acquire(self, name: str) -> ServedModel:
+        """
+        Returns a model for serving a request, loading it if needed. It is not evicted until released.
+
+        Args:
+            name (str): The name of the model.
+
+        Returns:
+            ServedModel: The registry entry of the model.
+
+        Raises:
+            KeyError: If no model is registered under this name.
+        """
+        with self._lock:
+            if name not in self._specs:
+                raise KeyError(name)
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        # Concurrent first requests for a model wait for a single load, other models are served meanwhile
+        with loading:
+            with self._lock:
+                served = self._loaded.get(name)
+                if served is not None:
+                    served.in_use += 1
+                    self._loaded.move_to_end(name)
+                    return served
+                spec = self._specs[name]
+
+            log.info(f"Loading model {name}")
+            model, tokenizer = self.loader(spec)
+            served = ServedModel(name, model, tokenizer)
+            with self._lock:
+                served.in_use += 1
+                self._loaded[name] = served
+                self._counters["loads"] += 1
+                self._evict()
+            return served
+
+    def release(self, served: ServedModel) -> None:
+        """
+        Marks a request served by a model as finished, evicting models left over the budget.
+
+        Args:
+            served (ServedModel): The value returned by `acquire`.
+        """
+        with self._lock:
+            served.in_use -= 1
+            self._evict()
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[ServedModel]:
+        """
+        Acquires a model for the duration of a `with` block.
+
+        Args:
+            name (str): The name of the model.
+
+        Yields:
+            ServedModel: The registry entry of the model.
+        """
+        served = self.acquire(name)
+        try:
+            yield served
+        finally:
+            self.release(served)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the registered and loaded models and the load and eviction counters.
+
+        Returns:
+            Dict[str, Any]: The budget, the memory held, the loaded models from least to most recently used and the
+                names of all registered models.
+        """
+        with self._lock:
+            return {
+                "max_memory_mb": self.max_memory_mb,
+                "max_models": self.max_models,
+                "memory_mb": self._nbytes() / (1 << 20),
+                **self._counters,
+                "loaded": [
+                    {
+                        "name": served.name,
+                        "memory_mb": served.nbytes / (1 << 20),
+                        "in_use": served.in_use,
+                        "pinned": served.pinned,
+                    }
+                    for served in self._loaded.values()
+                ],
+                "registered": sorted(self._specs),
+            }
+
+    def _nbytes(self) -> int:
+        return sum(served.nbytes for served in self._loaded.values())
+
+    def _over_budget(self) -> bool:
+        """
+        Tells whether the loaded models exceed the memory or count budget. Must hold the lock.
+        """
+        if self.max_models and len(self._loaded) > self.max_models:
+            return True
+        return bool(self.max_memory_mb) and self._nbytes() > self.max_memory_mb * (1 << 20)
+
+    def _evict(self) -> None:
+        """
+        Unloads the least recently used models not serving a request until the budget is met. Must hold the lock.
+        """
+        evicted: List[str] = []
+        while self._over_budget():
+            victim: Optional[str] = next(
+                (name for name, served in self._loaded.items() if not served.pinned and served.in_use == 0), None
+            )
+            if victim is None:
+                break
+            del self._loaded[victim]
+            evicted.append(victim)
+            self._counters["evictions"] += 1
+
+        if evicted:
+            log.info(f"Unloaded models {evicted}")
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
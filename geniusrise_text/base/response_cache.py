@@ -0,0 +1,223 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import cherrypy
+
+SAMPLING_STRATEGIES = {"sample", "beam_sample"}
+
+CachedResponse = Tuple[bytes, str]
+
+
+def is_deterministic(payload: Any, default_temperature: float = 0.0, default_do_sample: bool = False) -> bool:
+    """
+    Tells whether a request payload asks for a deterministic response, i.e. does not sample.
+
+    Args:
+        payload (Any): The JSON body of the request.
+        default_temperature (float): Temperature used by the endpoint when the payload does not set one.
+        default_do_sample (bool): Whether the endpoint samples when the payload does not set `do_sample`.
+
+    Returns:
+        bool: False if the payload samples, through `do_sample`, a sampling decoding strategy or a positive temperature.
+    """
+    if not isinstance(payload, dict):
+        return True
+    if payload.get("do_sample", default_do_sample) or payload.get("decoding_strategy") in SAMPLING_STRATEGIES:
+        return False
+    temperature = payload.get("temperature", default_temperature)
+    try:
+        return temperature is None or float(temperature) <= 0
+    except (TypeError, ValueError):
+        return False
+
+
+def cache_key(namespace: str, endpoint: str, payload: Any) -> str:
+    """
+    Computes the cache key of a request from its canonicalized JSON body.
+
+    Args:
+        namespace (str): Identifies the model serving the request, e.g. its name and revision.
+        endpoint (str): The path of the endpoint.
+        payload (Any): The JSON body of the request.
+
+    Returns:
+        str: The hex SHA-256 of the namespace, the endpoint and the body with sorted keys.
+    """
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{namespace}\0{endpoint}\0{body}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    A size-bounded LRU cache of serialized API responses with a time to live.
+
+    Attributes:
+        max_size (int): Maximum number of responses kept.
+        ttl (Optional[float]): Seconds a response stays valid, None or 0 to never expire.
+        hits (int): Number of requests served from the cache.
+        misses (int): Number of cacheable requests that had to be computed.
+        skips (int): Number of requests not cached because they sample.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 600.0) -> None:
+        """
+        Initializes the ResponseCache.
+
+        Args:
+            max_size (int): Maximum number of responses kept.
+            ttl (Optional[float]): Seconds a response stays valid, None or 0 to never expire.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        Returns a cached response, dropping it if it has expired.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[Tuple[bytes, str]]: The response body and content type, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, response: CachedResponse) -> None:
+        """
+        Stores a response, evicting the least recently used ones beyond `max_size`.
+
+        Args:
+            key (str): The cache key.
+            response (Tuple[bytes, str]): The response body and content type.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._entries[key] = (expires, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Drops all cached responses, e.g. when the data the responses depend on changes.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def skip(self) -> None:
+        """
+        Counts a request that was not cached because it samples.
+        """
+        with self._lock:
+            self.skips += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit, miss and skip counters of the cache.
+
+        Returns:
+            Dict[str, Any]: The counters, the hit rate and the number of cached responses.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "skips": self.skips,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+            }
+
+
+def cache_response(
+    cache: ResponseCache,
+    namespace: str,
+    default_temperature: float = 0.0,
+    default_do_sample: bool = False,
+) -> None:
+    """
+    CherryPy tool serving repeated deterministic POST requests from a `ResponseCache`.
+
+    Runs as a `before_handler` hook after `json_in` has parsed the body and `json_out` has wrapped the handler. On a
+    hit the handler is skipped and the cached body is returned, on a miss the handler is wrapped to store its
+    serialized output. Requests that sample and server-sent event streams are passed through. Endpoints that sample by
+    default declare it with `@cherrypy.config(**{"tools.response_cache.default_temperature": ...})`.
+
+    Args:
+        cache (ResponseCache): The cache.
+        namespace (str): Identifies the model serving the request, e.g. its name and revision.
+        default_temperature (float): Temperature used by the endpoint when the payload does not set one.
+        default_do_sample (bool): Whether the endpoint samples when the payload does not set `do_sample`.
+    """
+    request = cherrypy.serving.request
+    response = cherrypy.serving.response
+    if request.method != "POST" or request.handler is None or not hasattr(request, "json"):
+        return
+
+    if not is_deterministic(request.json, default_temperature, default_do_sample):
+        cache.skip()
+        return
+
+    key = cache_key(namespace, request.path_info, request.json)
+    cached = cache.get(key)
+    if cached is not None:
+        body, content_type = cached
+        request.handler = None
+        response.body = body
+        response.headers["Content-Type"] = content_type
+        response.headers["X-Cache"] = "HIT"
+        return
+
+    handler = request.handler
+
+    def caching_handler(*args: Any, **kwargs: Any) -> Any:
+        body = handler(*args, **kwargs)
+        response.headers["X-Cache"] = "MISS"
+        content_type = response.headers.get("Content-Type", "application/json")
+        if content_type.startswith("text/event-stream"):
+            return body
+
+        # json_out encodes lazily into chunks, which are joined once to be stored and sent
+        if not isinstance(body, bytes):
+            body = b"".join(body)
+        cache.put(key, (body, content_type))
+        return body
+
+    request.handler = caching_handler
@@ -0,0 +1,81 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import types
+from typing import Any, Iterable, Iterator
+
+import cherrypy
+
+log = logging.getLogger(__name__)
+
+
+def json_or_sse_handler(*args, **kwargs):
+    """
+    A `json_out` handler passing server-sent event streams through and serializing everything else as JSON.
+    """
+    value = cherrypy.serving.request._json_inner_handler(*args, **kwargs)
+    if isinstance(value, types.GeneratorType):
+        return value
+    return cherrypy._json.encode(value)
+
+
+def sse_event(event: Any) -> bytes:
+    """
+    Formats one server-sent event.
+
+    Args:
+        event (Any): A JSON serializable payload, or a string that already is a complete `data: ...` frame.
+
+    Returns:
+        bytes: The encoded event.
+    """
+    if isinstance(event, str) and event.startswith("data:"):
+        return event.encode("utf-8")
+    return f"data: {json.dumps(event)}\n\n".encode("utf-8")
+
+
+def sse_response(events: Iterable[Any], done: bool = True) -> Iterator[bytes]:
+    """
+    Streams events to the client as server-sent events, flushing each one as soon as it is produced.
+
+    Must be returned from an endpoint using `json_out(handler=json_or_sse_handler)`. Errors raised while producing
+    events are sent as a final `{"error": ...}` event since the response status has already been sent.
+
+    Args:
+        events (Iterable[Any]): The events, see `sse_event`.
+        done (bool): Whether to end the stream with a `data: [DONE]` event.
+
+    Returns:
+        Iterator[bytes]: The response body.
+    """
+    response = cherrypy.serving.response
+    response.headers["Content-Type"] = "text/event-stream"
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    response.stream = True
+
+    def stream() -> Iterator[bytes]:
+        try:
+            for event in events:
+                yield sse_event(event)
+        except Exception as e:
+            log.exception(f"Error while streaming: {e}")
+            yield sse_event({"error": str(e)})
+        if done:
+            yield b"data: [DONE]\n\n"
+
+    return stream()
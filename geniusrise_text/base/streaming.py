@@ -0,0 +1,204 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import glob
+import json
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import yaml  # type: ignore
+from datasets import load_from_disk
+from pyarrow import csv as pa_csv
+from pyarrow import ipc
+from pyarrow import parquet as pq
+
+Columns = Dict[str, List[Any]]
+
+SUPPORTED_EXTENSIONS = (
+    ".jsonl",
+    ".csv",
+    ".tsv",
+    ".parquet",
+    ".feather",
+    ".arrow",
+    ".json",
+    ".xml",
+    ".yaml",
+    ".yml",
+    ".xls",
+    ".xlsx",
+    ".db",
+)
+
+
+def stream_records(
+    dataset_path: str,
+    columns: Optional[List[str]] = None,
+    batch_size: int = 4096,
+    table: str = "dataset_table",
+) -> Iterator[Columns]:
+    """
+    Lazily stream a dataset folder as columnar record batches with bounded memory.
+
+    Parquet, feather, arrow and CSV/TSV files are read through pyarrow batch iterators, JSONL files line by line, XML files
+    with an incremental parser and SQLite databases with a cursor, so only one batch of rows is materialized at a time.
+    JSON, YAML and Excel files have no streaming reader and are loaded one file at a time. Folders saved by the Hugging
+    Face datasets library are iterated batch by batch.
+
+    Args:
+        dataset_path (str): Path to the dataset folder, searched recursively.
+        columns (Optional[List[str]]): Columns to read, all columns of the first record if None.
+        batch_size (int): Number of rows per yielded batch.
+        table (str): Name of the table to read from SQLite databases.
+
+    Returns:
+        Iterator[Dict[str, List[Any]]]: Batches, each a dictionary of column name to list of values.
+    """
+    if os.path.isfile(os.path.join(dataset_path, "dataset_info.json")):
+        dataset = load_from_disk(dataset_path)
+        for batch in dataset.iter(batch_size=batch_size):
+            yield {c: batch[c] for c in columns} if columns else batch
+        return
+
+    buffer: Columns = {}
+    for filename in sorted(glob.glob(f"{dataset_path}/**/*", recursive=True)):
+        if not filename.endswith(SUPPORTED_EXTENSIONS):
+            continue
+
+        for chunk in _stream_file(filename, columns=columns, batch_size=batch_size, table=table):
+            if not buffer:
+                buffer = {c: [] for c in (columns or chunk.keys())}
+            for c in buffer:
+                buffer[c].extend(chunk.get(c, [None] * _num_rows(chunk)))
+
+            while _num_rows(buffer) >= batch_size:
+                yield {c: v[:batch_size] for c, v in buffer.items()}
+                buffer = {c: v[batch_size:] for c, v in buffer.items()}
+
+    if buffer and _num_rows(buffer) > 0:
+        yield buffer
+
+
+def _num_rows(columns: Columns) -> int:
+    return len(next(iter(columns.values()))) if columns else 0
+
+
+def _from_records(records: List[Dict[str, Any]], columns: Optional[List[str]]) -> Columns:
+    keys = columns or (list(records[0].keys()) if records else [])
+    return {c: [r.get(c) for r in records] for c in keys}
+
+
+def _stream_file(filename: str, columns: Optional[List[str]], batch_size: int, table: str) -> Iterator[Columns]:
+    """
+    Stream one file as columnar batches.
+
+    Args:
+        filename (str): Path to the file.
+        columns (Optional[List[str]]): Columns to read, all columns if None.
+        batch_size (int): Number of rows per batch.
+        table (str): Name of the table to read from SQLite databases.
+
+    Returns:
+        Iterator[Dict[str, List[Any]]]: Batches, each a dictionary of column name to list of values.
+    """
+    if filename.endswith(".jsonl"):
+        records = []
+        with open(filename, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                records.append(json.loads(line))
+                if len(records) >= batch_size:
+                    yield _from_records(records, columns)
+                    records = []
+        if records:
+            yield _from_records(records, columns)
+
+    elif filename.endswith((".csv", ".tsv")):
+        reader = pa_csv.open_csv(
+            filename,
+            read_options=pa_csv.ReadOptions(block_size=1 << 22),
+            parse_options=pa_csv.ParseOptions(delimiter="\t" if filename.endswith(".tsv") else ","),
+            convert_options=pa_csv.ConvertOptions(include_columns=columns) if columns else None,
+        )
+        for batch in reader:
+            yield batch.to_pydict()
+
+    elif filename.endswith(".parquet"):
+        parquet_file = pq.ParquetFile(filename)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pydict()
+
+    elif filename.endswith((".feather", ".arrow")):
+        source = pa.memory_map(filename, "r")
+        try:
+            file_reader = ipc.open_file(source)
+            batches = (file_reader.get_batch(i) for i in range(file_reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            batches = iter(ipc.open_stream(source))
+        for batch in batches:
+            if columns:
+                batch = batch.select(columns)
+            yield batch.to_pydict()
+
+    elif filename.endswith(".xml"):
+        records = []
+        root = None
+        for event, element in ET.iterparse(filename, events=("start", "end")):
+            if root is None:
+                root = element
+            if event != "end" or element.tag != "record":
+                continue
+            record = {child.tag: child.text for child in element}
+            records.append({c: record.get(c) for c in columns} if columns else record)
+            # Parsed records stay attached to the root unless it is cleared
+            root.clear()
+            if len(records) >= batch_size:
+                yield _from_records(records, columns)
+                records = []
+        if records:
+            yield _from_records(records, columns)
+
+    elif filename.endswith(".db"):
+        conn = sqlite3.connect(filename)
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(columns) if columns else '*'} FROM {table};")
+            names = [d[0] for d in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield {name: [row[i] for row in rows] for i, name in enumerate(names)}
+        finally:
+            conn.close()
+
+    else:
+        # JSON, YAML and Excel have no incremental readers, these are loaded one file at a time
+        if filename.endswith(".json"):
+            with open(filename, "r") as f:
+                records = json.load(f)
+        elif filename.endswith((".yaml", ".yml")):
+            with open(filename, "r") as f:
+                records = yaml.safe_load(f)
+        else:
+            records = pd.read_excel(filename).to_dict("records")
+
+        for i in range(0, len(records), batch_size):
+            yield _from_records(records[i : i + batch_size], columns)
@@ -0,0 +1,189 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+import time
+
+import pytest
+from geniusrise.core import BatchInput, BatchOutput, InMemoryState
+from peft import LoraConfig, get_peft_model
+from transformers import AutoModelForCausalLM
+
+from geniusrise_text.base.adapters import AdapterSwitch
+from geniusrise_text.base.bulk import TextBulk
+
+
+def run_concurrently(switch, adapters, duration=0.02):
+    log = []
+    lock = threading.Lock()
+
+    def work(adapter):
+        with switch.use(adapter):
+            with lock:
+                log.append(("start", adapter, switch.active))
+            time.sleep(duration)
+            with lock:
+                log.append(("end", adapter, switch.active))
+
+    threads = [threading.Thread(target=work, args=(adapter,)) for adapter in adapters]
+    for t in threads:
+        t.start()
+        time.sleep(0.001)
+    for t in threads:
+        t.join()
+    return log
+
+
+def test_work_runs_with_its_adapter_active():
+    activated = []
+    switch = AdapterSwitch(activated.append)
+
+    log = run_concurrently(switch, ["a", "b", None, "a", "b", None])
+
+    assert all(adapter == active for _, adapter, active in log)
+    assert switch.stats()["requests"] == {"a": 2, "b": 2, "base": 2}
+    assert switch.switches == len(activated)
+
+
+def test_work_for_different_adapters_never_overlaps():
+    switch = AdapterSwitch(lambda adapter: None)
+    running = set()
+    overlaps = []
+    lock = threading.Lock()
+
+    def work(adapter):
+        with switch.use(adapter):
+            with lock:
+                running.add(adapter)
+                overlaps.append(len(running))
+            time.sleep(0.005)
+            with lock:
+                running.discard(adapter)
+
+    threads = [threading.Thread(target=work, args=(adapter,)) for adapter in ["a", "b", "c"] * 5]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(overlaps) == 1
+
+
+def test_waiting_work_is_grouped_by_adapter():
+    switch = AdapterSwitch(lambda adapter: None)
+
+    # The first request holds the base model while the others queue up
+    log = run_concurrently(switch, [None, "a", "b", "a", "b", "a"], duration=0.05)
+
+    starts = [adapter for event, adapter, _ in log if event == "start"]
+    assert starts == [None, "a", "a", "a", "b", "b"]
+    assert switch.switches == 2
+
+
+def test_exclusive_waits_for_running_work():
+    switch = AdapterSwitch(lambda adapter: None)
+    events = []
+
+    def work():
+        with switch.use("a"):
+            time.sleep(0.05)
+            events.append("work")
+
+    t = threading.Thread(target=work)
+    t.start()
+    time.sleep(0.01)
+    with switch.exclusive():
+        events.append("exclusive")
+    t.join()
+
+    assert events == ["work", "exclusive"]
+
+
+def test_group_by_adapter():
+    assert TextBulk.group_by_adapter(None, ["a", None, "a", "b", "a"], batch_size=2) == [  # type: ignore
+        ("a", [0, 2]),
+        ("a", [4]),
+        (None, [1]),
+        ("b", [3]),
+    ]
+
+
+@pytest.fixture(scope="module")
+def adapter_paths(tmp_path_factory):
+    paths = {}
+    for name in ["first", "second"]:
+        model = AutoModelForCausalLM.from_pretrained("gpt2")
+        config = LoraConfig(r=4, target_modules=["c_attn"], fan_in_fan_out=True, init_lora_weights=False)
+        path = str(tmp_path_factory.mktemp(name))
+        get_peft_model(model, config).save_pretrained(path)
+        paths[name] = path
+    return paths
+
+
+@pytest.fixture
+def hfa():
+    input_dir = "./input_dir"
+    output_dir = "./output_dir"
+
+    hfa = TextBulk(
+        input=BatchInput(input_dir, "geniusrise-test", "api_input"),
+        output=BatchOutput(output_dir, "geniusrise-test", "api_output"),
+        state=InMemoryState(),
+    )
+    hfa.model, hfa.tokenizer = hfa.load_models(
+        model_name="gpt2",
+        tokenizer_name="gpt2",
+        model_class="AutoModelForCausalLM",
+        tokenizer_class="AutoTokenizer",
+        use_cuda=False,
+        precision="float32",
+        quantization=0,
+        device_map=None,
+        max_memory=None,
+        torchscript=False,
+    )
+    yield hfa
+
+    if os.path.exists(input_dir):
+        os.rmdir(input_dir)
+    if os.path.exists(output_dir):
+        os.rmdir(output_dir)
+
+
+def test_adapters_share_the_base_model(hfa, adapter_paths):
+    prompt = "The weather today is"
+    base = hfa.generate(prompt, max_new_tokens=8)
+
+    hfa.load_adapters(adapter_paths)
+    with hfa.using_adapter(None):
+        assert hfa.generate(prompt, max_new_tokens=8) == base
+    with hfa.using_adapter("first"):
+        first = hfa.generate(prompt, max_new_tokens=8)
+    with hfa.using_adapter("second"):
+        second = hfa.generate(prompt, max_new_tokens=8)
+    with hfa.using_adapter("first"):
+        assert hfa.generate(prompt, max_new_tokens=8) == first
+
+    assert first != base and second != first
+
+    with pytest.raises(ValueError):
+        with hfa.using_adapter("unknown"):
+            pass
+
+    hfa.remove_adapter("second")
+    assert not hfa.has_adapter("second")
+    with hfa.using_adapter("first"):
+        assert hfa.generate(prompt, max_new_tokens=8) == first
@@ -0,0 +1,127 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import cherrypy
+import pytest
+from geniusrise.core import BatchInput, BatchOutput, InMemoryState
+
+from geniusrise_text.base.admission import AdmissionController, AdmissionRejected
+from geniusrise_text.base.api import TextAPI
+
+
+def test_admission_bounds_concurrency():
+    admission = AdmissionController(num_workers=2, max_queue_size=8, timeout=5)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        admitted_at = admission.acquire()
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        admission.release(admitted_at)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert max(peak) == 2
+    stats = admission.stats()
+    assert stats["admitted"] == 8
+    assert stats["busy"] == 0
+    assert stats["queued"] == 0
+
+
+def test_admission_rejects_when_queue_is_full():
+    admission = AdmissionController(num_workers=1, max_queue_size=0, timeout=5)
+    admitted_at = admission.acquire()
+
+    with pytest.raises(AdmissionRejected) as e:
+        admission.acquire()
+    assert e.value.status == 429
+    assert e.value.retry_after >= 1
+
+    admission.release(admitted_at)
+    admission.release(admission.acquire())
+    assert admission.stats()["rejected"] == 1
+
+
+def test_admission_drops_expired_requests():
+    admission = AdmissionController(num_workers=1, max_queue_size=4, timeout=5)
+    admitted_at = admission.acquire()
+
+    with pytest.raises(AdmissionRejected) as e:
+        admission.acquire(timeout=0.05)
+    assert e.value.status == 503
+
+    admission.release(admitted_at)
+    stats = admission.stats()
+    assert stats["expired"] == 1
+    assert stats["queued"] == 0
+
+
+def test_listen_rejects_with_retry_after():
+    input = BatchInput(tempfile.mkdtemp(), "geniusrise-test", "api_input")
+    output = BatchOutput(tempfile.mkdtemp(), "geniusrise-test", "api_output")
+    api = TextAPI(input=input, output=output, state=InMemoryState())
+
+    server = threading.Thread(
+        target=api.listen,
+        kwargs={
+            "model_name": "gpt2",
+            "use_cuda": False,
+            "precision": "float32",
+            "device_map": None,
+            "num_workers": 1,
+            "max_queue_size": 0,
+            "response_cache_size": 0,
+            "port": 3099,
+        },
+        daemon=True,
+    )
+    server.start()
+    cherrypy.engine.wait(cherrypy.engine.states.STARTED)
+
+    # Occupy the only worker so that the request is rejected right away
+    admitted_at = api.admission.acquire()  # type: ignore
+    try:
+        request = urllib.request.Request(
+            "http://localhost:3099/api/v1/text",
+            data=json.dumps({"prompt": "Hello"}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(request)
+
+        assert e.value.code == 429
+        assert int(e.value.headers["Retry-After"]) >= 1
+        assert json.loads(e.value.read())["message"] == "Too many requests, the queue is full"
+    finally:
+        api.admission.release(admitted_at)  # type: ignore
+        cherrypy.engine.exit()
+        server.join()
@@ -16,11 +16,13 @@
 import itertools
 import os
 
+import cherrypy
 import pytest
 import torch
 
 # import transformers
 from geniusrise.core import BatchInput, BatchOutput, InMemoryState
+from transformers import AutoTokenizer
 
 from geniusrise_text.base.api import TextAPI
 
@@ -209,3 +211,25 @@ def test_generate_strategies(hfa, model_config, strategy):
     del model
     del tokenizer
     torch.cuda.empty_cache()
+
+
+def test_window_stride_must_fit_in_a_window(hfa):
+    hfa.tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
+
+    assert hfa.window_stride(64) == 64
+    assert hfa.window_stride(509) == 509
+    for stride in (510, -1, "64", 1.5, True):
+        with pytest.raises(cherrypy.HTTPError) as e:
+            hfa.window_stride(stride)
+        assert e.value.status == 400
+
+
+def test_bounded_int_rejects_invalid_settings():
+    assert TextAPI._bounded_int({}, "top_k", 2, 1) == 2
+    assert TextAPI._bounded_int({"top_k": 7}, "top_k", 2, 1) == 7
+    for value in (0, -3, "2", 2.5, None, True):
+        with pytest.raises(cherrypy.HTTPError) as e:
+            TextAPI._bounded_int({"top_k": value}, "top_k", 2, 1)
+        assert e.value.status == 400
+    with pytest.raises(cherrypy.HTTPError):
+        TextAPI._bounded_int({"n_best": 21}, "n_best", 1, 1, 20)
@@ -0,0 +1,79 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import pytest
+
+from geniusrise_text.base.batching import MicroBatcher
+
+
+def test_micro_batcher_coalesces_and_scatters():
+    batcher = MicroBatcher(max_batch_size=4, max_wait_ms=200)
+    seen_batches = []
+
+    def double(items):
+        seen_batches.append(list(items))
+        return [x * 2 for x in items]
+
+    results = {}
+
+    def call(x):
+        results[x] = batcher.submit("double", x, double)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: i * 2 for i in range(8)}
+    assert all(len(b) <= 4 for b in seen_batches)
+    assert len(seen_batches) < 8
+
+    stats = batcher.stats()["double"]
+    assert stats["queue_depth"] == 0
+    assert sum(size * count for size, count in stats["batch_size_histogram"].items()) == 8
+
+
+def test_micro_batcher_propagates_errors():
+    batcher = MicroBatcher(max_batch_size=2, max_wait_ms=1)
+
+    def fail(items):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        batcher.submit("fail", 1, fail)
+
+
+def test_micro_batcher_idle_workers_exit():
+    batcher = MicroBatcher(max_batch_size=2, max_wait_ms=1, idle_timeout=0.05)
+
+    assert batcher.submit("a", 1, lambda items: items) == 1
+    assert "a" in batcher.stats()
+
+    time.sleep(0.3)
+    assert batcher.stats() == {}
+    assert batcher.submit("a", 2, lambda items: items) == 2
+
+
+def test_micro_batcher_runs_unbatched_beyond_max_endpoints():
+    batcher = MicroBatcher(max_batch_size=2, max_wait_ms=1, max_endpoints=2)
+
+    results = [batcher.submit(f"settings-{i}", i, lambda items: [x * 2 for x in items]) for i in range(5)]
+
+    assert results == [0, 2, 4, 6, 8]
+    assert len(batcher.stats()) == 2
@@ -209,3 +209,36 @@ def test_generate_strategies(hfa, model_config, strategy):
     del model
     del tokenizer
     torch.cuda.empty_cache()
+
+
+@pytest.mark.parametrize("strategy", list(strategies.keys()))
+def test_generate_batch_strategies(hfa, strategy):
+    model, tokenizer = hfa.load_models(
+        model_name="gpt2",
+        tokenizer_name="gpt2",
+        model_class="AutoModelForCausalLM",
+        tokenizer_class="AutoTokenizer",
+        use_cuda=False,
+        precision="float32",
+        quantization=0,
+        device_map=None,
+        max_memory=None,
+        torchscript=False,
+    )
+    hfa.model = model
+    hfa.tokenizer = tokenizer
+
+    prompts = ["Once upon a time", "The quick brown fox jumps over", "Hello"]
+    generated_texts = hfa.generate_batch(
+        prompts=prompts, decoding_strategy=strategy, max_length=30, **strategies[strategy]
+    )
+
+    assert isinstance(generated_texts, list)
+    assert len(generated_texts) == len(prompts)
+    assert all(isinstance(t, str) for t in generated_texts)
+    assert tokenizer.padding_side == "right"
+
+    # Cleanup
+    del model
+    del tokenizer
+    torch.cuda.empty_cache()
@@ -0,0 +1,76 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+
+import numpy as np
+import pytest
+from geniusrise.core import BatchInput, BatchOutput, InMemoryState
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from geniusrise_text.base.bulk import TextBulk
+from geniusrise_text.base.chunking import pool_windows, stitch_windows
+
+
+def test_pool_windows():
+    logits = np.array([[1.0, 0.0], [3.0, 2.0], [5.0, 5.0]])
+    samples = np.array([0, 0, 1])
+
+    assert np.allclose(pool_windows(logits, samples, 2), [[2.0, 1.0], [5.0, 5.0]])
+    assert np.allclose(pool_windows(logits, samples, 2, pooling="max"), [[3.0, 2.0], [5.0, 5.0]])
+    with pytest.raises(ValueError):
+        pool_windows(logits, samples, 2, pooling="median")
+
+
+def test_stitch_windows_takes_overlapping_tokens_from_the_window_with_most_context():
+    # Ten tokens of 2 characters, split into [CLS] t0..t5 [SEP] and [CLS] t4..t9 [SEP], padding the last window
+    def window(tokens, width=8):
+        offsets = [(0, 0)] + [(3 * i, 3 * i + 2) for i in tokens] + [(0, 0)]
+        mask = [1] * len(offsets)
+        return offsets + [(0, 0)] * (width - len(offsets)), mask + [0] * (width - len(mask))
+
+    windows = [window(range(0, 6)), window(range(4, 10)), window(range(0, 2))]
+    offsets = np.array([offsets for offsets, _ in windows])
+    mask = np.array([mask for _, mask in windows])
+    logits = np.zeros((3, 8, 2))
+    logits[0, 5, 0] = 1.0  # t4 is 1 token from an edge of the first window, 0 from an edge of the second
+    logits[1, 2, 1] = 1.0  # t5 is 0 tokens from an edge of the first window, 1 from an edge of the second
+
+    stitched_logits, stitched_offsets, stitched_mask = stitch_windows(logits, offsets, mask, np.array([0, 0, 1]), 2)
+
+    assert stitched_offsets[0, :, 0].tolist() == [3 * i for i in range(10)]
+    assert stitched_mask.tolist() == [[1] * 10, [1, 1] + [0] * 8]
+    assert stitched_logits[0, 4].tolist() == [1.0, 0.0]
+    assert stitched_logits[0, 5].tolist() == [0.0, 1.0]
+
+
+def test_chunk_documents_reads_past_the_maximum_length():
+    bulk = TextBulk(
+        input=BatchInput(tempfile.mkdtemp(), "geniusrise-test", "test-🤗-input"),
+        output=BatchOutput(tempfile.mkdtemp(), "geniusrise-test", "test-🤗-output"),
+        state=InMemoryState(),
+    )
+    model_name = "distilbert-base-uncased-finetuned-sst-2-english"
+    bulk.tokenizer = AutoTokenizer.from_pretrained(model_name)
+    bulk.model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+
+    texts = ["great movie " * 300, "short and bad"]
+    logits, windows = bulk.chunk_documents(texts, max_length=128, stride=32, batch_size=4)
+
+    samples = windows["overflow_to_sample_mapping"]
+    assert logits.shape == (len(samples), 2)
+    assert (samples == 0).sum() > 1 and (samples == 1).sum() == 1
+    assert windows["offset_mapping"][samples == 0].max() > 3000
+    assert pool_windows(logits, samples, len(texts)).argmax(axis=-1).tolist() == [1, 0]
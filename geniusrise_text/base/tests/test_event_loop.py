@@ -0,0 +1,81 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from geniusrise_text.base.event_loop import EventLoopThread
+
+
+@pytest.fixture
+def event_loop_thread():
+    loop = EventLoopThread()
+    yield loop
+    loop.stop()
+
+
+def test_concurrent_requests_share_the_loop(event_loop_thread):
+    loops = set()
+
+    async def work(x):
+        loops.add(id(asyncio.get_running_loop()))
+        await asyncio.sleep(0.2)
+        return x * 2
+
+    results = {}
+
+    def call(x):
+        results[x] = event_loop_thread.run(work(x))
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: i * 2 for i in range(8)}
+    assert loops == {id(event_loop_thread.loop)}
+    assert time.monotonic() - start < 1.0
+
+
+def test_run_propagates_errors(event_loop_thread):
+    async def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        event_loop_thread.run(fail())
+
+
+def test_iterate_async_generator(event_loop_thread):
+    closed = []
+
+    async def numbers():
+        try:
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield i
+        finally:
+            closed.append(True)
+
+    assert list(event_loop_thread.iterate(numbers())) == [0, 1, 2]
+
+    items = event_loop_thread.iterate(numbers())
+    assert next(items) == 0
+    items.close()
+    assert closed == [True, True]
@@ -0,0 +1,155 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+import torch
+from geniusrise.core import BatchInput, BatchOutput, InMemoryState
+
+from geniusrise_text.base.bulk import TextBulk
+from geniusrise_text.base.prefix_cache import PrefixCache
+
+PREAMBLE = (
+    "You are a helpful assistant for an online bookstore. Answer questions about orders, shipping, returns and "
+    "recommendations politely and concisely. " * 12
+)
+QUESTIONS = [
+    "Where is my order?",
+    "Can I return a book I did not like?",
+    "Recommend a mystery novel.",
+    "How long does shipping to Canada take?",
+]
+
+
+def kv(length, layers=2):
+    return tuple((torch.zeros(1, 2, length, 4), torch.zeros(1, 2, length, 4)) for _ in range(layers))
+
+
+def test_longest_cached_prefix():
+    cache = PrefixCache()
+    cache.put([1, 2], kv(2))
+    cache.put([1, 2, 3, 4], kv(4))
+
+    assert cache.longest([1, 2, 3, 4, 5])[0] == 4
+    assert cache.longest([1, 2, 3, 9])[0] == 2
+    assert cache.longest([7, 1, 2]) == (0, None)
+    assert cache.stats()["hits"] == 2
+
+
+def test_evicts_least_recently_used_within_memory_budget():
+    nbytes = 2 * 2 * (2 * 3 * 4) * 4
+    cache = PrefixCache(max_bytes=2 * nbytes)
+    cache.put([1, 2, 3], kv(3))
+    cache.put([4, 5, 6], kv(3))
+    cache.longest([1, 2, 3, 0])
+    cache.put([7, 8, 9], kv(3))
+
+    assert cache.longest([1, 2, 3, 0])[0] == 3
+    assert cache.longest([4, 5, 6, 0])[0] == 0
+    assert cache.nbytes == 2 * nbytes
+    assert len(cache) == 2
+
+
+def test_observe_detects_common_prefixes():
+    cache = PrefixCache(min_prefix_tokens=3)
+
+    assert cache.observe([1, 2, 3, 4, 5]) == 0
+    assert cache.observe([1, 2, 3, 4, 9]) == 4
+    assert cache.observe([1, 2, 8]) == 0
+
+
+@pytest.fixture(scope="module")
+def hfa():
+    input_dir = "./input_dir"
+    output_dir = "./output_dir"
+
+    hfa = TextBulk(
+        input=BatchInput(input_dir, "geniusrise-test", "api_input"),
+        output=BatchOutput(output_dir, "geniusrise-test", "api_output"),
+        state=InMemoryState(),
+    )
+    hfa.model, hfa.tokenizer = hfa.load_models(
+        model_name="gpt2",
+        tokenizer_name="gpt2",
+        model_class="AutoModelForCausalLM",
+        tokenizer_class="AutoTokenizer",
+        use_cuda=False,
+        precision="float32",
+        quantization=0,
+        device_map=None,
+        max_memory=None,
+        torchscript=False,
+    )
+    yield hfa
+
+    if os.path.exists(input_dir):
+        os.rmdir(input_dir)
+    if os.path.exists(output_dir):
+        os.rmdir(output_dir)
+
+
+def test_generation_resumes_from_cached_prefix(hfa):
+    prompts = [PREAMBLE + question for question in QUESTIONS]
+
+    hfa.prefix_cache = None
+    expected = [hfa.generate(prompt, max_new_tokens=8) for prompt in prompts]
+    expected_batch = hfa.generate_batch(prompts, max_new_tokens=8)
+
+    hfa.enable_prefix_cache(prefixes=[PREAMBLE])
+    assert [hfa.generate(prompt, max_new_tokens=8) for prompt in prompts] == expected
+    assert hfa.generate_batch(prompts, max_new_tokens=8) == expected_batch
+    assert hfa.prefix_cache.stats()["hits"] == len(prompts) + 1
+
+
+def test_prefix_is_detected_automatically(hfa):
+    hfa.enable_prefix_cache(min_prefix_tokens=32)
+
+    hfa.generate(PREAMBLE + QUESTIONS[0], max_new_tokens=1)
+    hfa.generate(PREAMBLE + QUESTIONS[1], max_new_tokens=1)
+    hfa.generate(PREAMBLE + QUESTIONS[2], max_new_tokens=1)
+
+    stats = hfa.prefix_cache.stats()
+    assert stats["prefixes"] == 1
+    assert stats["hits"] == 1
+
+
+def test_prefix_cache_skips_prefill_of_prefix(hfa):
+    prompts = [PREAMBLE + question for question in QUESTIONS]
+    tokens = []
+
+    def count_tokens(module, args, kwargs):
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        tokens.append(input_ids.numel())
+
+    def prefill_tokens():
+        tokens.clear()
+        for prompt in prompts:
+            hfa.generate(prompt, max_new_tokens=1)
+        return sum(tokens)
+
+    hook = hfa.model.register_forward_pre_hook(count_tokens, with_kwargs=True)
+    try:
+        hfa.prefix_cache = None
+        uncached = prefill_tokens()
+
+        hfa.enable_prefix_cache(prefixes=[PREAMBLE])
+        cached = prefill_tokens()
+    finally:
+        hook.remove()
+
+    stats = hfa.prefix_cache.stats()
+    assert stats["hits"] == len(prompts)
+    assert cached == uncached - len(prompts) * stats["prefix_lengths"][0]
@@ -0,0 +1,156 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import pytest
+import torch
+
+from geniusrise_text.base.registry import ModelRegistry, ServingAttribute, model_nbytes
+
+MB = 1 << 20
+
+
+class Loader:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, spec):
+        self.calls.append(spec["model_name"])
+        time.sleep(self.delay)
+        # One megabyte of float32 weights per model
+        return torch.nn.Linear(512, 512, bias=False), spec["model_name"]
+
+
+def test_model_nbytes():
+    assert model_nbytes(torch.nn.Linear(512, 512, bias=False)) == MB
+
+
+def test_models_are_loaded_lazily():
+    loader = Loader()
+    registry = ModelRegistry(loader)
+    registry.register("a", "org/model-a")
+
+    assert loader.calls == []
+    with registry.use("a") as served:
+        assert served.tokenizer == "org/model-a"
+    with registry.use("a"):
+        pass
+    assert loader.calls == ["org/model-a"]
+
+    with pytest.raises(KeyError):
+        registry.acquire("unknown")
+
+
+def test_concurrent_requests_load_once():
+    loader = Loader(delay=0.05)
+    registry = ModelRegistry(loader)
+    registry.register("a", "a")
+
+    threads = [threading.Thread(target=lambda: registry.release(registry.acquire("a"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loader.calls == ["a"]
+    assert registry.stats()["loaded"][0]["in_use"] == 0
+
+
+def test_least_recently_used_models_are_evicted():
+    loader = Loader()
+    registry = ModelRegistry(loader, max_memory_mb=2)
+    for name in ["a", "b", "c"]:
+        registry.register(name, name)
+
+    for name in ["a", "b", "a", "c"]:
+        with registry.use(name):
+            pass
+
+    stats = registry.stats()
+    assert [served["name"] for served in stats["loaded"]] == ["a", "c"]
+    assert stats["evictions"] == 1
+
+    with registry.use("b"):
+        pass
+    assert loader.calls == ["a", "b", "c", "b"]
+
+
+def test_models_serving_requests_and_pinned_models_are_not_evicted():
+    registry = ModelRegistry(Loader(), max_models=2)
+    registry.add("default", torch.nn.Linear(512, 512, bias=False), None, pinned=True)
+    registry.register("a", "a")
+    registry.register("b", "b")
+
+    served = registry.acquire("a")
+    with registry.use("b"):
+        assert len(registry.stats()["loaded"]) == 3
+    registry.release(served)
+
+    assert [served["name"] for served in registry.stats()["loaded"]] == ["default", "a"]
+
+
+def test_serving_attribute_routes_per_thread():
+    class Server:
+        model = ServingAttribute()
+
+        def __init__(self):
+            self.model = "default"
+            self._serving = threading.local()
+
+    registry = ModelRegistry(Loader())
+    registry.register("a", "a")
+    server = Server()
+    seen = []
+
+    def routed():
+        with registry.use("a") as served:
+            server._serving.served = served
+            seen.append(server.model)
+            server._serving.served = None
+
+    t = threading.Thread(target=routed)
+    t.start()
+    t.join()
+
+    assert isinstance(seen[0], torch.nn.Linear)
+    assert server.model == "default"
+
+
+def test_serving_attribute_keeps_state_per_model():
+    class Server:
+        cache = ServingAttribute()
+
+        def __init__(self):
+            self.cache = "default"
+            self._serving = threading.local()
+
+    registry = ModelRegistry(Loader())
+    registry.register("a", "a")
+    server = Server()
+
+    with registry.use("a") as served:
+        server._serving.served = served
+        assert server.cache is None
+        server.cache = "a"
+        server._serving.served = None
+
+    assert server.cache == "default"
+    with registry.use("a") as served:
+        server._serving.served = served
+        assert server.cache == "a"
+        server._serving.served = None
@@ -0,0 +1,124 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+import urllib.request
+
+import cherrypy
+import pytest
+
+from geniusrise_text.base.response_cache import ResponseCache, cache_key, cache_response, is_deterministic
+
+
+@pytest.mark.parametrize(
+    "payload, deterministic",
+    [
+        ({"text": "hello"}, True),
+        ({"prompt": "hello", "decoding_strategy": "beam_search", "num_beams": 4}, True),
+        ({"prompt": "hello", "temperature": 0}, True),
+        ({"prompt": "hello", "do_sample": True}, False),
+        ({"prompt": "hello", "temperature": 0.7}, False),
+        ({"prompt": "hello", "decoding_strategy": "sample"}, False),
+    ],
+)
+def test_is_deterministic(payload, deterministic):
+    assert is_deterministic(payload) == deterministic
+
+
+def test_is_deterministic_uses_endpoint_defaults():
+    assert not is_deterministic({"prompt": "hello"}, default_temperature=0.7)
+    assert is_deterministic({"prompt": "hello", "temperature": 0}, default_temperature=0.7)
+    assert not is_deterministic({"prompt": "hello"}, default_do_sample=True)
+
+
+def test_cache_key_is_canonical():
+    key = cache_key("bert@main", "/classify", {"text": "hello", "options": {"a": 1, "b": 2}})
+
+    assert key == cache_key("bert@main", "/classify", {"options": {"b": 2, "a": 1}, "text": "hello"})
+    assert key != cache_key("bert@v2", "/classify", {"text": "hello", "options": {"a": 1, "b": 2}})
+    assert key != cache_key("bert@main", "/ner", {"text": "hello", "options": {"a": 1, "b": 2}})
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_size=2, ttl=None)
+    cache.put("a", (b"1", "application/json"))
+    cache.put("b", (b"2", "application/json"))
+    cache.get("a")
+    cache.put("c", (b"3", "application/json"))
+
+    assert cache.get("a") == (b"1", "application/json")
+    assert cache.get("b") is None
+    assert cache.stats()["size"] == 2
+
+
+def test_response_cache_expires_entries():
+    cache = ResponseCache(max_size=10, ttl=0.05)
+    cache.put("a", (b"1", "application/json"))
+    assert cache.get("a") is not None
+
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 0
+
+
+def test_cache_response_serves_repeated_json_requests():
+    calls = []
+
+    class Root:
+        @cherrypy.expose
+        @cherrypy.tools.json_in()
+        @cherrypy.tools.json_out()
+        def classify(self):
+            calls.append(cherrypy.request.json)
+            return {"label": "positive", "calls": len(calls)}
+
+    cache = ResponseCache(max_size=8, ttl=None)
+    cherrypy.tools.response_cache = cherrypy.Tool("before_handler", cache_response, priority=80)
+    cherrypy.config.update({"server.socket_port": 3098, "log.screen": False})
+    cherrypy.tree.mount(
+        Root(),
+        "/",
+        {
+            "/": {
+                "tools.response_cache.on": True,
+                "tools.response_cache.cache": cache,
+                "tools.response_cache.namespace": "m",
+            }
+        },
+    )
+    cherrypy.engine.start()
+    try:
+        responses = []
+        for _ in range(2):
+            request = urllib.request.Request(
+                "http://localhost:3098/classify",
+                data=json.dumps({"text": "hello"}).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request) as response:
+                responses.append((response.headers["X-Cache"], response.headers["Content-Type"], response.read()))
+    finally:
+        cherrypy.engine.exit()
+        cherrypy.tree.apps.clear()
+
+    assert [r[0] for r in responses] == ["MISS", "HIT"]
+    assert responses[0][1:] == responses[1][1:]
+    assert json.loads(responses[1][2]) == {"label": "positive", "calls": 1}
+    assert len(calls) == 1
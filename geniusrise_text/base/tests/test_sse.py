@@ -0,0 +1,40 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cherrypy
+
+from geniusrise_text.base.sse import sse_event, sse_response
+
+
+def test_sse_event_formats_payloads_and_passes_frames_through():
+    assert sse_event({"completion": "Hello"}) == b'data: {"completion": "Hello"}\n\n'
+    assert sse_event('data: {"id": 1}\n\n') == b'data: {"id": 1}\n\n'
+
+
+def test_sse_response_streams_events_and_done():
+    body = sse_response({"completion": x} for x in ["a", "b"])
+
+    assert cherrypy.serving.response.headers["Content-Type"] == "text/event-stream"
+    assert cherrypy.serving.response.stream
+    assert list(body) == [b'data: {"completion": "a"}\n\n', b'data: {"completion": "b"}\n\n', b"data: [DONE]\n\n"]
+
+
+def test_sse_response_reports_errors_as_events():
+    def events():
+        yield {"completion": "a"}
+        raise RuntimeError("boom")
+
+    body = list(sse_response(events(), done=False))
+    assert body == [b'data: {"completion": "a"}\n\n', b'data: {"error": "boom"}\n\n']
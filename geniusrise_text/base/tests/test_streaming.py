@@ -0,0 +1,50 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import pandas as pd
+
+from geniusrise_text.base.streaming import stream_records
+
+
+def test_stream_records_rechunks_across_files(tmpdir):
+    with open(os.path.join(tmpdir, "a.jsonl"), "w") as f:
+        for i in range(7):
+            f.write(json.dumps({"text": f"row {i}", "label": i}) + "\n")
+    pd.DataFrame({"text": [f"row {i}" for i in range(7, 12)], "label": list(range(7, 12))}).to_csv(
+        os.path.join(tmpdir, "b.csv"), index=False
+    )
+
+    chunks = list(stream_records(str(tmpdir), columns=["text"], batch_size=5))
+
+    assert [len(c["text"]) for c in chunks] == [5, 5, 2]
+    assert list(chunks[0].keys()) == ["text"]
+    assert [t for c in chunks for t in c["text"]] == [f"row {i}" for i in range(12)]
+
+
+def test_stream_records_reads_xml_records_incrementally(tmpdir):
+    with open(os.path.join(tmpdir, "a.xml"), "w") as f:
+        f.write("<dataset>")
+        for i in range(7):
+            f.write(f"<record><text>row {i}</text><label>{i}</label></record>")
+        f.write("</dataset>")
+
+    chunks = list(stream_records(str(tmpdir), batch_size=3))
+
+    assert [len(c["text"]) for c in chunks] == [3, 3, 1]
+    assert [t for c in chunks for t in c["text"]] == [f"row {i}" for i in range(7)]
+    assert chunks[-1]["label"] == ["6"]
@@ -14,7 +14,8 @@
 # limitations under the License.
 
 import logging
-from typing import Any, Dict
+from functools import partial
+from typing import Any, Dict, List
 
 import cherrypy
 import numpy as np
@@ -23,6 +24,7 @@ from geniusrise import BatchInput, BatchOutput, State
 from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
 
 from geniusrise_text.base import TextAPI
+from geniusrise_text.base.chunking import POOLING_STRATEGIES, pool_windows
 
 log = logging.getLogger(__file__)
 
@@ -102,6 +104,10 @@ class TextClassificationAPI(TextAPI):
         Returns:
             Dict[str, Any]: A dictionary containing the original input text and the classification scores for each label.
 
+        Texts longer than the model's maximum length are truncated unless `long_document` is true, in which case they
+        are classified as overlapping windows sharing `window_stride` tokens (default 64), whose logits are merged with
+        `pooling`, "mean" (default) or "max".
+
         Example CURL Request for text classification:
         ```bash
         /usr/bin/curl -X POST localhost:3000/api/v1/classify \
@@ -111,10 +117,32 @@ class TextClassificationAPI(TextAPI):
             }' | jq
         ```
         """
-        data: Dict[str, str] = cherrypy.request.json
+        data: Dict[str, Any] = cherrypy.request.json
         text = data.get("text", "")
 
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True)
+        if data.get("long_document"):
+            pooling = data.get("pooling", "mean")
+            stride = self.window_stride(data.get("window_stride", 64))
+            if pooling not in POOLING_STRATEGIES:
+                raise cherrypy.HTTPError(400, f"pooling must be one of {', '.join(POOLING_STRATEGIES)}")
+            classify = partial(self._classify_long_batch, pooling=pooling, stride=stride)
+            label_scores = self.batched(f"classify:long:{pooling}:{stride}", text, classify)
+        else:
+            label_scores = self.batched("classify", text, self._classify_batch)
+
+        return {"input": text, "label_scores": label_scores}
+
+    def _classify_batch(self, texts: List[str]) -> List[Any]:
+        """
+        Classifies a batch of texts in a single padded forward pass.
+
+        Args:
+            texts (List[str]): The texts to classify.
+
+        Returns:
+            List[Any]: For each text, a dictionary of label scores, or a list of sigmoid scores for single-output models.
+        """
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
 
         if next(self.model.parameters()).is_cuda:
             inputs = {k: v.cuda() for k, v in inputs.items()}
@@ -122,22 +150,42 @@ class TextClassificationAPI(TextAPI):
         with torch.no_grad():
             outputs = self.model(**inputs)
             logits = outputs.logits if hasattr(outputs, "logits") else outputs[0]
-            if next(self.model.parameters()).is_cuda:
-                logits = logits.cpu()
-
-            # Handling a single number output
-            if logits.numel() == 1:
-                logits = outputs.logits.cpu().detach().numpy()
-                scores = 1 / (1 + np.exp(-logits)).flatten()
-                return {"input": text, "label_scores": scores.tolist()}
-            else:
-                softmax = torch.nn.functional.softmax(logits, dim=-1)
-                scores = softmax.numpy().tolist()
+        return self._label_scores(logits.float().cpu())
 
-        id_to_label = dict(enumerate(self.model.config.id2label.values()))  # type: ignore
-        label_scores = {id_to_label[label_id]: score for label_id, score in enumerate(scores[0])}
+    def _classify_long_batch(self, texts: List[str], pooling: str = "mean", stride: int = 64) -> List[Any]:
+        """
+        Classifies a batch of texts of any length, see `TextBulk.chunk_documents`.
 
-        return {"input": text, "label_scores": label_scores}
+        Args:
+            texts (List[str]): The texts to classify.
+            pooling (str): How the logits of the windows of a text are merged, "mean" or "max".
+            stride (int): Number of tokens shared by consecutive windows of a text.
+
+        Returns:
+            List[Any]: For each text, a dictionary of label scores, or a list of sigmoid scores for single-output models.
+        """
+        logits, windows = self.chunk_documents(texts, stride=stride)
+        pooled = pool_windows(logits, windows["overflow_to_sample_mapping"], len(texts), pooling)
+        return self._label_scores(torch.from_numpy(pooled))
+
+    def _label_scores(self, logits: torch.Tensor) -> List[Any]:
+        """
+        Converts the logits of a batch of texts into label scores.
+
+        Args:
+            logits (torch.Tensor): Logits of shape (texts, labels), on the CPU.
+
+        Returns:
+            List[Any]: For each text, a dictionary of label scores, or a list of sigmoid scores for single-output models.
+        """
+        # Handling a single number output
+        if logits.shape[-1] == 1:
+            scores = 1 / (1 + np.exp(-logits.detach().numpy()))
+            return [row.flatten().tolist() for row in scores]
+
+        scores = torch.nn.functional.softmax(logits, dim=-1).numpy().tolist()
+        id_to_label = dict(enumerate(self.model.config.id2label.values()))  # type: ignore
+        return [{id_to_label[label_id]: score for label_id, score in enumerate(row)} for row in scores]
 
     def initialize_pipeline(self):
         """
@@ -19,7 +19,7 @@ import os
 import sqlite3
 import uuid
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 import pandas as pd
 import torch
@@ -30,6 +30,7 @@ from pyarrow import feather
 from pyarrow import parquet as pq
 
 from geniusrise_text.base import TextBulk
+from geniusrise_text.base.chunking import POOLING_STRATEGIES, pool_windows
 
 
 class TextClassificationBulk(TextBulk):
@@ -231,6 +232,13 @@ class TextClassificationBulk(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         batch_size: int = 32,
+        sort_by_length: bool = False,
+        max_tokens_per_batch: Optional[int] = None,
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
+        long_documents: bool = False,
+        window_stride: int = 64,
+        window_pooling: str = "mean",
         notification_email: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
@@ -252,6 +260,14 @@ class TextClassificationBulk(TextBulk):
             awq_enabled (bool): Whether to enable AWQ optimization (default False).
             flash_attention (bool): Whether to use flash attention optimization (default False).
             batch_size (int): Number of classifications to process simultaneously (default 32).
+            sort_by_length (bool): Whether to batch rows of similar token length together to minimize padding (default False).
+            max_tokens_per_batch (Optional[int]): Budget of padded tokens per batch, used instead of batch_size if set (default None).
+            streaming (bool): Whether to stream the dataset in chunks instead of loading it into memory (default False).
+            streaming_chunk_size (int): Number of rows per streamed chunk (default 4096).
+            long_documents (bool): Whether to classify texts longer than the model's maximum length as overlapping
+                windows instead of truncating them, windows of many texts being batched together (default False).
+            window_stride (int): Number of tokens shared by consecutive windows of a text (default 64).
+            window_pooling (str): How the logits of the windows of a text are merged, "mean" or "max" (default "mean").
             **kwargs: Arbitrary keyword arguments for model and generation configurations.
         """
         if ":" in model_name:
@@ -279,9 +295,19 @@ class TextClassificationBulk(TextBulk):
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
         self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
+        self.long_documents = long_documents
+        self.window_stride = window_stride
+        self.window_pooling = window_pooling
         self.notification_email = notification_email
         self.compile = compile
 
+        if window_pooling not in POOLING_STRATEGIES:
+            raise ValueError(f"Unsupported window pooling. Choose from {', '.join(POOLING_STRATEGIES)}.")
+
         model_args = {k.replace("model_", ""): v for k, v in kwargs.items() if "model_" in k}
         self.model_args = model_args
 
@@ -310,16 +336,43 @@ class TextClassificationBulk(TextBulk):
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        _dataset = self.load_dataset(dataset_path)
-        if _dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
-        dataset = _dataset["text"]
+        # Load dataset, either fully or lazily in chunks of rows
+        chunks: Iterator[List[Any]]
+        if streaming:
+            chunks = (
+                chunk["text"]
+                for chunk in self.stream_dataset(dataset_path, columns=["text"], chunk_size=streaming_chunk_size)
+            )
+        else:
+            _dataset = self.load_dataset(dataset_path)
+            if _dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([_dataset["text"]])
+
+        offset = 0
+        for dataset in chunks:
+            self._classify_chunk(dataset, output_path, offset)
+            offset += len(dataset)
+        self.done()
+
+    def _classify_chunk(self, dataset: List[str], output_path: str, offset: int = 0) -> None:
+        """
+        Classifies a chunk of the dataset in batches and saves the predictions in the original order.
+
+        Args:
+            dataset (List[str]): The texts of the chunk.
+            output_path (str): Path to save the classification results.
+            offset (int): Index of the first row of the chunk in the whole dataset (for naming files).
+        """
+
+        def predict(indices: List[int]) -> List[int]:
+            batch = [dataset[j] for j in indices]
+            if self.long_documents:
+                logits, windows = self.chunk_documents(batch, stride=self.window_stride, batch_size=self.batch_size)
+                samples = windows["overflow_to_sample_mapping"]
+                return pool_windows(logits, samples, len(batch), self.window_pooling).argmax(axis=-1).tolist()
 
-        # Process data in batches
-        for i in range(0, len(dataset), batch_size):
-            batch = dataset[i : i + batch_size]
             inputs = self.tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
 
             if next(self.model.parameters()).is_cuda:
@@ -327,14 +380,21 @@ class TextClassificationBulk(TextBulk):
 
             predictions = self.model(**inputs)
             predictions = predictions[0] if isinstance(predictions, tuple) else predictions.logits
-            predictions = torch.argmax(predictions, dim=-1).cpu().numpy()
-
-            self._save_predictions(predictions, batch, output_path, i)
-        self.done()
+            return torch.argmax(predictions, dim=-1).cpu().numpy().tolist()
+
+        # Process data in batches, optionally bucketed by length, and save them in the original order
+        batches = self.batch_indices(
+            dataset,
+            batch_size=self.batch_size,
+            sort_by_length=self.sort_by_length,
+            max_tokens_per_batch=self.max_tokens_per_batch,
+        )
+        for i, predictions in self.ordered_results(batches, predict, chunk_size=self.batch_size):
+            self._save_predictions(predictions, dataset[i : i + len(predictions)], output_path, offset + i)
 
     def _save_predictions(
         self,
-        predictions: torch.Tensor,
+        predictions: List[int],
         input_batch: List[str],
         output_path: str,
         batch_idx: int,
@@ -344,13 +404,13 @@ class TextClassificationBulk(TextBulk):
         to persist the classification results.
 
         Args:
-            predictions (torch.Tensor): Tensor of label indices predicted by the model.
+            predictions (List[int]): Label indices predicted by the model.
             input_batch (List[str]): List of original texts that were classified.
             output_path (str): Path to save the classification results.
             batch_idx (int): Index of the current batch (for naming files).
         """
         id_to_label = dict(enumerate(self.model.config.id2label.values()))  # type: ignore
-        label_predictions = [id_to_label[label_id] for label_id in predictions.tolist()]
+        label_predictions = [id_to_label[label_id] for label_id in predictions]
 
         # Prepare data for saving
         data_to_save = [
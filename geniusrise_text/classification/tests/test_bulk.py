@@ -184,3 +184,28 @@ def test_classify(classification_bolt, dataset_file, model):
         assert "input" in result
         assert "prediction" in result
         assert result["prediction"] in MODELS_TO_TEST[model_name]
+
+
+@pytest.mark.parametrize("max_tokens_per_batch", [None, 256])
+def test_classify_sort_by_length(classification_bolt, dataset_file, model, max_tokens_per_batch):
+    tmpdir, ext = dataset_file
+    classification_bolt.input.input_folder = tmpdir
+
+    model_name, labels = model
+
+    classification_bolt.classify(
+        model_name=model_name,
+        model_class="AutoModelForSequenceClassification",
+        tokenizer_class="AutoTokenizer",
+        device_map="cuda:0",
+        precision="float16",
+        batch_size=4,
+        sort_by_length=True,
+        max_tokens_per_batch=max_tokens_per_batch,
+    )
+
+    # Results are written back in the original order, in chunks of batch_size
+    files = glob.glob(f"{classification_bolt.output.output_folder}/predictions-*.json")
+    assert len(files) > 0
+    offsets = sorted(int(os.path.basename(f).split("-")[1]) for f in files)
+    assert offsets == list(range(0, 4 * len(offsets), 4))
@@ -13,19 +13,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, Dict, Optional
+import base64
+from typing import Any, Callable, Dict, List, Optional
 
 import cherrypy
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
 from geniusrise_text.base import TextAPI
 from geniusrise_text.embeddings.embeddings import (
     generate_combination_embeddings,
     generate_contiguous_embeddings,
-    generate_embeddings,
+    generate_embeddings_batch,
     generate_permutation_embeddings,
     generate_sentence_transformer_embeddings,
 )
+from geniusrise_text.embeddings.cache import EmbeddingCache, cache_namespace
+from geniusrise_text.embeddings.index import VectorIndex
+
+
+def json_or_binary_handler(*args, **kwargs):
+    """
+    A `json_out` handler that passes raw bytes through as `application/octet-stream` and encodes anything else as JSON.
+    """
+    value = cherrypy.serving.request._json_inner_handler(*args, **kwargs)
+    if isinstance(value, bytes):
+        cherrypy.serving.response.headers["Content-Type"] = "application/octet-stream"
+        return value
+    return cherrypy._json.encode(value)
+
+
+def _to_numpy(embeddings: Any) -> np.ndarray:
+    """
+    Converts embeddings returned as an array, a tensor or a list of tensors to a NumPy array.
+    """
+    if isinstance(embeddings, torch.Tensor):
+        return embeddings.detach().cpu().numpy()
+    if isinstance(embeddings, list):
+        return np.stack([e.detach().cpu().numpy() if isinstance(e, torch.Tensor) else e for e in embeddings])
+    return np.asarray(embeddings)
 
 
 class EmbeddingsAPI(TextAPI):
@@ -87,11 +114,17 @@ class EmbeddingsAPI(TextAPI):
     - POST /embeddings_contiguous: Generate embeddings for contiguous subsets of words.
     - POST /embeddings_combinations: Generate embeddings for combinations of words.
     - POST /embeddings_permutations: Generate embeddings for permutations of words.
+    - POST /search: Find the nearest neighbours of queries in the vector index.
+    - POST /upsert: Insert or replace vectors in the vector index.
+    - GET /cache_stats: Hit rate of the embedding cache.
     """
 
+    index: Optional[VectorIndex] = None
+    embedding_cache: Optional[EmbeddingCache] = None
+
     @cherrypy.expose
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_binary_handler)
     @cherrypy.tools.allow(methods=["POST"])
     def sbert(self, **kwargs: Any) -> Dict[str, Any]:
         """
@@ -104,24 +137,39 @@ class EmbeddingsAPI(TextAPI):
         Dict[str, Any]: A dictionary containing the generated embeddings.
 
         Usage:
-        POST request with JSON payload containing 'sentences' and optional 'batch_size'.
+        POST request with JSON payload containing 'sentences' and optional 'batch_size'. An optional 'format' of
+        "base64" or "binary" returns the embeddings as packed little-endian floats of the given 'dtype' (float16 by
+        default), base64 encoded in JSON or as an application/octet-stream body with the shape in the
+        X-Embeddings-Shape header.
         """
         data = cherrypy.request.json
         sentences = data.get("sentences")
         batch_size = data.get("batch_size", 32)
 
-        embeddings = generate_sentence_transformer_embeddings(
-            sentences=sentences, model=self.sentence_transformer_model, use_cuda=self.use_cuda, batch_size=batch_size
-        )
-        return {"embeddings": embeddings.tolist()}
+        def embed(batch: List[str]) -> np.ndarray:
+            return _to_numpy(
+                generate_sentence_transformer_embeddings(
+                    sentences=batch,
+                    model=self.sentence_transformer_model,
+                    use_cuda=self.use_cuda,
+                    batch_size=batch_size,
+                )
+            )
+
+        namespace = cache_namespace(self.model_name, self.model_revision, "sentence-transformers")
+        if isinstance(sentences, str):
+            embeddings = self._cached_embeddings(namespace, [sentences], embed)[0]
+        else:
+            embeddings = self._cached_embeddings(namespace, sentences, embed)
+        return self._embeddings_response(embeddings, data)
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_binary_handler)
     @cherrypy.tools.allow(methods=["POST"])
     def sentence(self, **kwargs: Any) -> Dict[str, Any]:
         """
-        Generate embeddings for a given term using Hugging Face model.
+        Generate embeddings for one or more sentences using Hugging Face model.
 
         Parameters:
         - **kwargs (Any): Additional keyword arguments.
@@ -130,19 +178,32 @@ class EmbeddingsAPI(TextAPI):
         Dict[str, Any]: A dictionary containing the generated embeddings.
 
         Usage:
-        POST request with JSON payload containing 'term'.
+        POST request with JSON payload containing 'sentence', a string or a list of strings, and optional 'pooling'
+        ("mean", "cls", "max" or "last_token"), 'normalize', 'batch_size', and 'format' and 'dtype' as for /sbert.
         """
         data = cherrypy.request.json
-        sentence = data.get("sentence")
-
-        embeddings = generate_embeddings(
-            sentence=sentence,
-            model=self.model,
-            tokenizer=self.tokenizer,
-            output_key="last_hidden_state",
-            use_cuda=self.use_cuda,
-        )
-        return {"embeddings": embeddings.tolist()}
+        sentences = data.get("sentences", data.get("sentence"))
+
+        pooling = data.get("pooling", "mean")
+        normalize = data.get("normalize", False)
+
+        def embed(batch: List[str]) -> np.ndarray:
+            return _to_numpy(
+                generate_embeddings_batch(
+                    sentences=batch,
+                    model=self.model,
+                    tokenizer=self.tokenizer,
+                    output_key="last_hidden_state",
+                    use_cuda=self.use_cuda,
+                    pooling=pooling,
+                    normalize=normalize,
+                    batch_size=data.get("batch_size", 32),
+                )
+            )
+
+        namespace = cache_namespace(self.model_name, self.model_revision, pooling, normalize)
+        embeddings = self._cached_embeddings(namespace, [sentences] if isinstance(sentences, str) else sentences, embed)
+        return self._embeddings_response(embeddings, data)
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
@@ -159,7 +220,9 @@ class EmbeddingsAPI(TextAPI):
         Dict[str, Any]: A dictionary containing the generated embeddings.
 
         Usage:
-        POST request with JSON payload containing 'sentence'.
+        POST request with JSON payload containing 'sentence', and optional 'batch_size', 'max_phrases' to cap the number
+        of sub-phrases and 'sample' to draw them at random instead of taking the first ones. With 'single_pass' set,
+        the sentence is encoded once and every window is pooled from its token embeddings.
         """
         data = cherrypy.request.json
         sentence = data.get("sentence")
@@ -170,8 +233,12 @@ class EmbeddingsAPI(TextAPI):
             tokenizer=self.tokenizer,
             output_key="last_hidden_state",
             use_cuda=self.use_cuda,
+            batch_size=data.get("batch_size", 32),
+            max_phrases=data.get("max_phrases"),
+            sample=data.get("sample", False),
+            single_pass=data.get("single_pass", False),
         )
-        return {"embeddings": embeddings}
+        return {"embeddings": [(embedding.tolist(), term) for embedding, term in embeddings]}
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
@@ -188,7 +255,8 @@ class EmbeddingsAPI(TextAPI):
         Dict[str, Any]: A dictionary containing the generated embeddings.
 
         Usage:
-        POST request with JSON payload containing 'sentence'.
+        POST request with JSON payload containing 'sentence', and optional 'batch_size', 'max_phrases' to cap the number
+        of sub-phrases and 'sample' to draw them at random instead of taking the first ones.
         """
         data = cherrypy.request.json
         sentence = data.get("sentence")
@@ -199,8 +267,11 @@ class EmbeddingsAPI(TextAPI):
             tokenizer=self.tokenizer,
             output_key="last_hidden_state",
             use_cuda=self.use_cuda,
+            batch_size=data.get("batch_size", 32),
+            max_phrases=data.get("max_phrases"),
+            sample=data.get("sample", False),
         )
-        return {"embeddings": embeddings}
+        return {"embeddings": [(embedding.tolist(), term) for embedding, term in embeddings]}
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
@@ -217,7 +288,8 @@ class EmbeddingsAPI(TextAPI):
         Dict[str, Any]: A dictionary containing the generated embeddings.
 
         Usage:
-        POST request with JSON payload containing 'sentence'.
+        POST request with JSON payload containing 'sentence', and optional 'batch_size', 'max_phrases' to cap the number
+        of sub-phrases and 'sample' to draw them at random instead of taking the first ones.
         """
         data = cherrypy.request.json
         sentence = data.get("sentence")
@@ -228,8 +300,140 @@ class EmbeddingsAPI(TextAPI):
             tokenizer=self.tokenizer,
             output_key="last_hidden_state",
             use_cuda=self.use_cuda,
+            batch_size=data.get("batch_size", 32),
+            max_phrases=data.get("max_phrases"),
+            sample=data.get("sample", False),
         )
-        return {"embeddings": embeddings}
+        return {"embeddings": [(embedding.tolist(), term) for embedding, term in embeddings]}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_in()
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["POST"])
+    def search(self, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Find the nearest neighbours of one or more queries in the vector index.
+
+        Parameters:
+        - **kwargs (Any): Additional keyword arguments.
+
+        Returns:
+        Dict[str, Any]: A dictionary containing, for each query, the ids and scores of its neighbours.
+
+        Usage:
+        POST request with JSON payload containing 'queries' (texts) or 'embeddings' (vectors), and optional 'k'.
+        """
+        data = cherrypy.request.json
+        k = int(data.get("k", 10))
+
+        if "embeddings" in data:
+            queries = np.asarray(data["embeddings"], dtype=np.float32)
+        else:
+            texts = data.get("queries", data.get("query", []))
+            queries = self._encode(texts if isinstance(texts, list) else [texts])
+
+        results = self.index.search(queries, k=k)  # type: ignore
+        return {"results": [[{"id": id_, "score": score} for id_, score in neighbours] for neighbours in results]}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_in()
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["POST"])
+    def upsert(self, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Insert new vectors into the vector index, or replace the vectors of existing ids.
+
+        Parameters:
+        - **kwargs (Any): Additional keyword arguments.
+
+        Returns:
+        Dict[str, Any]: A dictionary containing the number of upserted vectors and the size of the index.
+
+        Usage:
+        POST request with JSON payload containing 'ids' and either 'sentences' or 'embeddings'.
+        """
+        data = cherrypy.request.json
+        ids = data.get("ids", [])
+
+        if "embeddings" in data:
+            vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        else:
+            vectors = self._encode(data.get("sentences", []))
+
+        self.index.upsert(ids, vectors)  # type: ignore
+        return {"upserted": len(ids), "size": len(self.index)}  # type: ignore
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["GET"])
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit rate and size of the embedding cache.
+
+        Returns:
+        Dict[str, Any]: Memory and disk hits, misses, the hit rate and the number of embeddings held in memory.
+        """
+        return self.embedding_cache.stats() if self.embedding_cache else {}
+
+    def _cached_embeddings(self, namespace: str, sentences: List[str], embed: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embeds sentences through the embedding cache, computing only the ones not cached yet.
+
+        Parameters:
+        - namespace (str): Identifies the model and settings that produce the embeddings.
+        - sentences (List[str]): The sentences to embed.
+        - embed (Callable[[List[str]], Any]): Embeds a list of sentences, returning one row per sentence.
+
+        Returns:
+        np.ndarray: The embeddings, one row per sentence.
+        """
+        if self.embedding_cache is None:
+            return embed(sentences)
+        return self.embedding_cache.compute(namespace, sentences, embed)
+
+    def _embeddings_response(self, embeddings: Any, data: Dict[str, Any]) -> Any:
+        """
+        Serializes embeddings in the response format requested by the client.
+
+        Parameters:
+        - embeddings (Any): The embeddings, as an array, a tensor or a list of tensors.
+        - data (Dict[str, Any]): The request payload, with optional 'format' ("json", "base64" or "binary") and 'dtype'.
+
+        Returns:
+        Any: A JSON serializable dictionary, or the raw bytes of the embeddings for the binary format.
+        """
+        response_format = data.get("format", "json")
+        if response_format == "json":
+            return {"embeddings": embeddings.tolist()}
+        if response_format not in ("base64", "binary"):
+            raise cherrypy.HTTPError(400, f"Unsupported format {response_format}")
+
+        embeddings = _to_numpy(embeddings)
+
+        dtype = data.get("dtype", "float16")
+        if dtype not in ("float16", "float32"):
+            raise cherrypy.HTTPError(400, f"Unsupported dtype {dtype}")
+        vectors = np.ascontiguousarray(embeddings, dtype="<f2" if dtype == "float16" else "<f4")
+        shape = list(vectors.shape)
+
+        if response_format == "base64":
+            return {"embeddings": base64.b64encode(vectors.tobytes()).decode("ascii"), "dtype": dtype, "shape": shape}
+
+        cherrypy.response.headers["X-Embeddings-Shape"] = ",".join(str(x) for x in shape)
+        cherrypy.response.headers["X-Embeddings-Dtype"] = dtype
+        return vectors.tobytes()
+
+    def _encode(self, sentences: List[str]) -> np.ndarray:
+        """
+        Encodes sentences with the Sentence Transformer model for indexing and search.
+
+        Parameters:
+        - sentences (List[str]): The sentences to encode.
+
+        Returns:
+        np.ndarray: The embeddings, one row per sentence.
+        """
+        return self.sentence_transformer_model.encode(sentences, convert_to_numpy=True)
 
     def listen(  # type: ignore
         self,
@@ -243,6 +447,13 @@ class EmbeddingsAPI(TextAPI):
         max_memory={0: "24GB"},
         torchscript: bool = False,
         compile: bool = False,
+        index_path: Optional[str] = None,
+        index_metric: str = "cosine",
+        index_type: str = "auto",
+        index_nlist: Optional[int] = None,
+        index_nprobe: int = 8,
+        embedding_cache_size: int = 10000,
+        embedding_cache_path: Optional[str] = None,
         endpoint: str = "*",
         port: int = 3000,
         cors_domain: str = "http://localhost:3000",
@@ -263,6 +474,13 @@ class EmbeddingsAPI(TextAPI):
         - device_map (str | Dict | None, optional): The device map for distributed training. Defaults to "auto".
         - max_memory (Dict, optional): The maximum memory to allocate for each device. Defaults to {0: "24GB"}.
         - torchscript (bool, optional): Whether to use TorchScript. Defaults to True.
+        - index_path (str, optional): Folder of embeddings saved by EmbeddingsBulk to serve for search. Defaults to None.
+        - index_metric (str, optional): Similarity metric of the vector index, "cosine" or "dot". Defaults to "cosine".
+        - index_type (str, optional): Vector index type, "flat", "ivf" or "auto". Defaults to "auto".
+        - index_nlist (int, optional): Number of IVF clusters. Defaults to the square root of the number of vectors.
+        - index_nprobe (int, optional): Number of IVF clusters searched per query. Defaults to 8.
+        - embedding_cache_size (int, optional): Embeddings cached in memory, 0 disables the cache. Defaults to 10000.
+        - embedding_cache_path (str, optional): SQLite file persisting the embedding cache on disk. Defaults to None.
         - endpoint (str, optional): The API endpoint. Defaults to "*".
         - port (int, optional): The port to listen on. Defaults to 3000.
         - cors_domain (str, optional): The CORS domain. Defaults to "http://localhost:3000".
@@ -315,6 +533,14 @@ class EmbeddingsAPI(TextAPI):
         )
         self.sentence_transformer_model = SentenceTransformer(model_name, device="cuda" if use_cuda else "cpu")
 
+        index_args: Dict[str, Any] = dict(
+            metric=index_metric, index_type=index_type, nlist=index_nlist, nprobe=index_nprobe
+        )
+        self.index = VectorIndex.load(index_path, **index_args) if index_path else VectorIndex(**index_args)
+
+        if embedding_cache_size > 0 or embedding_cache_path:
+            self.embedding_cache = EmbeddingCache(max_size=embedding_cache_size, path=embedding_cache_path)
+
         def CORS():
             cherrypy.response.headers["Access-Control-Allow-Origin"] = "http://localhost:3000"
             cherrypy.response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
@@ -19,8 +19,9 @@ import pickle
 import sqlite3
 import uuid
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import pyarrow.feather as feather
 import pyarrow.parquet as pq
@@ -33,12 +34,16 @@ from geniusrise.logging import setup_logger
 from sentence_transformers import SentenceTransformer
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+from geniusrise_text.base.streaming import stream_records
+from geniusrise_text.embeddings.cache import EmbeddingCache, cache_namespace
 from geniusrise_text.embeddings.embeddings import (
     generate_combination_embeddings,
     generate_contiguous_embeddings,
+    generate_embeddings_batch,
     generate_permutation_embeddings,
     generate_sentence_transformer_embeddings,
 )
+from geniusrise_text.embeddings.index import MANIFEST, save_embeddings
 
 
 class EmbeddingsBulk(Bolt):
@@ -211,12 +216,38 @@ class EmbeddingsBulk(Bolt):
         torchscript: bool = False,
         compile: bool = False,
         batch_size: int = 32,
+        output_format: str = "pickle",
+        shard_size: int = 100000,
+        max_phrases: Optional[int] = None,
+        sample_phrases: bool = False,
+        pooling: Optional[str] = None,
+        normalize: bool = False,
+        cache_path: Optional[str] = None,
+        id_column: str = "id",
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
         **model_args: Any,
     ) -> None:
         """
         Generate embeddings in bulk for various types of text data.
 
         Args:
+            output_format (str): "pickle", or one of "npy", "f16", "f32" and "parquet" to write contiguous array shards
+                with a manifest of ids and dims that `EmbeddingsAPI` can serve for search. Default is "pickle".
+            shard_size (int): Maximum number of embeddings per shard for the array output formats. Default is 100000.
+            max_phrases (Optional[int]): Maximum number of sub-phrases embedded per sentence. Default is None, meaning all.
+            sample_phrases (bool): Whether to sample `max_phrases` random sub-phrases instead of the first ones. Default is False.
+            pooling (Optional[str]): For kind "sentence", embed with the Hugging Face model instead of Sentence Transformers,
+                pooling tokens with "mean", "cls", "max" or "last_token". Default is None.
+            normalize (bool): Whether to L2-normalize the Hugging Face sentence embeddings. Default is False.
+            cache_path (Optional[str]): SQLite file of an embedding cache shared across runs, so that for kind "sentence"
+                only texts not embedded before are computed. Default is None.
+            id_column (str): Column of the dataset holding the id of every text, used as the id of its embeddings in
+                the manifest of the array output formats. Without it, rows are numbered after the rows already saved
+                in the output folder. Default is "id".
+            streaming (bool): Whether to stream the dataset in chunks instead of loading it into memory, saving the
+                embeddings of every chunk as it is done. Default is False.
+            streaming_chunk_size (int): Number of rows per streamed chunk. Default is 4096.
             **kwargs: Additional keyword arguments.
 
         This method reads text data from the specified input path, generates embeddings, and saves them to the specified output path.
@@ -230,6 +261,11 @@ class EmbeddingsBulk(Bolt):
         self.device_map = device_map
         self.max_memory = max_memory
         self.torchscript = torchscript
+        self.output_format = output_format
+        self.shard_size = shard_size
+        self.id_column = id_column
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
         self.model_args = model_args
 
         if ":" in model_name:
@@ -249,7 +285,7 @@ class EmbeddingsBulk(Bolt):
         if self.use_cuda and self.device_map is None:
             self.device_map = "cuda:0"
 
-        if kind == "sentence":
+        if kind == "sentence" and not pooling:
             self.sentence_transformer_model = SentenceTransformer(model_name, device="cuda" if use_cuda else "cpu")
         else:
             self.model, self.tokenizer = self.load_models(
@@ -271,59 +307,136 @@ class EmbeddingsBulk(Bolt):
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        _dataset = self._load_dataset(dataset_path)
-        if _dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
-        dataset = _dataset["text"]
-
-        # Generate embeddings
-        embeddings: Any
-        if kind == "sentence":
-            embeddings = generate_sentence_transformer_embeddings(
-                sentences=dataset,
-                model=self.sentence_transformer_model,
-                use_cuda=self.use_cuda,
+        # Load dataset, either fully or lazily in chunks of rows
+        chunks: Iterator[Dict[str, List[Any]]]
+        if streaming:
+            chunks = stream_records(dataset_path, batch_size=streaming_chunk_size)
+        else:
+            _dataset = self._load_dataset(dataset_path)
+            if _dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([{c: _dataset[c] for c in _dataset.column_names if c in ("text", id_column)}])
+
+        cache = EmbeddingCache(max_size=0, path=cache_path) if cache_path and kind == "sentence" else None
+        for chunk in chunks:
+            row_ids = list(chunk[id_column]) if id_column in chunk else None
+            embeddings = self._embed_chunk(
+                list(chunk["text"]),
+                kind,
                 batch_size=batch_size,
+                max_phrases=max_phrases,
+                sample_phrases=sample_phrases,
+                pooling=pooling,
+                normalize=normalize,
+                cache=cache,
             )
-            return self._save_embeddings(embeddings, output_path)
+            self._save_embeddings(embeddings, output_path, kind=kind, row_ids=row_ids)
+        if cache is not None:
+            self.log.info(f"Embedding cache: {cache.stats()}")
+
+    def _embed_chunk(
+        self,
+        dataset: List[str],
+        kind: str,
+        batch_size: int = 32,
+        max_phrases: Optional[int] = None,
+        sample_phrases: bool = False,
+        pooling: Optional[str] = None,
+        normalize: bool = False,
+        cache: Optional[EmbeddingCache] = None,
+    ) -> Any:
+        """
+        Generates the embeddings of a chunk of the dataset.
+
+        Args:
+            dataset (List[str]): The texts of the chunk.
+            kind (str): The kind of embeddings to generate.
+            batch_size (int): Number of texts or sub-phrases per forward pass.
+            max_phrases (Optional[int]): Maximum number of sub-phrases embedded per sentence.
+            sample_phrases (bool): Whether to sample `max_phrases` random sub-phrases instead of the first ones.
+            pooling (Optional[str]): Pooling of the Hugging Face sentence embeddings, None for Sentence Transformers.
+            normalize (bool): Whether to L2-normalize the Hugging Face sentence embeddings.
+            cache (Optional[EmbeddingCache]): Cache of sentence embeddings shared across runs.
+
+        Returns:
+            Any: A matrix for sentences, or a list of (embedding, term) pairs per sentence for the other kinds.
+        """
+        if kind == "sentence":
+
+            def embed(batch: List[str]) -> Any:
+                if pooling:
+                    return generate_embeddings_batch(
+                        sentences=batch,
+                        model=self.model,
+                        tokenizer=self.tokenizer,
+                        output_key="last_hidden_state",
+                        use_cuda=self.use_cuda,
+                        pooling=pooling,
+                        normalize=normalize,
+                        batch_size=batch_size,
+                    )
+                return generate_sentence_transformer_embeddings(
+                    sentences=batch,
+                    model=self.sentence_transformer_model,
+                    use_cuda=self.use_cuda,
+                    batch_size=batch_size,
+                )
+
+            if cache is not None:
+                namespace = cache_namespace(
+                    self.model_name,
+                    self.model_revision,
+                    pooling or "sentence-transformers",
+                    bool(pooling and normalize),
+                )
+                return cache.compute(
+                    namespace, dataset, lambda batch: [torch.as_tensor(e).cpu().numpy() for e in embed(batch)]
+                )
+            return embed(dataset)
         elif kind == "sentence_windows":
-            embeddings = [
+            return [
                 generate_contiguous_embeddings(
                     sentence=sentence,
                     model=self.model,
                     tokenizer=self.tokenizer,
                     output_key="last_hidden_state",
                     use_cuda=self.use_cuda,
+                    batch_size=batch_size,
+                    max_phrases=max_phrases,
+                    sample=sample_phrases,
                 )
                 for sentence in dataset
             ]
-            return self._save_embeddings(embeddings, output_path)
         elif kind == "sentence_combinations":
-            embeddings = [
+            return [
                 generate_combination_embeddings(
                     sentence=sentence,
                     model=self.model,
                     tokenizer=self.tokenizer,
                     output_key="last_hidden_state",
                     use_cuda=self.use_cuda,
+                    batch_size=batch_size,
+                    max_phrases=max_phrases,
+                    sample=sample_phrases,
                 )
                 for sentence in dataset
             ]
-            return self._save_embeddings(embeddings, output_path)
         elif kind == "sentence_permutations":
-            embeddings = [
+            return [
                 generate_permutation_embeddings(
                     sentence=sentence,
                     model=self.model,
                     tokenizer=self.tokenizer,
                     output_key="last_hidden_state",
                     use_cuda=self.use_cuda,
+                    batch_size=batch_size,
+                    max_phrases=max_phrases,
+                    sample=sample_phrases,
                 )
                 for sentence in dataset
             ]
-            return self._save_embeddings(embeddings, output_path)
+        raise ValueError(f"Unsupported kind {kind}")
 
     def _load_dataset(self, dataset_path: str) -> Optional[Dataset]:
         """
@@ -401,13 +514,79 @@ class EmbeddingsBulk(Bolt):
 
         return Dataset.from_pandas(pd.DataFrame(data))
 
-    def _save_embeddings(self, embeddings: Dict[str, Any], output_path: str) -> None:
+    def _save_embeddings(
+        self, embeddings: Any, output_path: str, kind: str = "sentence", row_ids: Optional[List[Any]] = None
+    ) -> None:
         """
         Save the generated embeddings to the specified output path.
 
         Args:
-            embeddings (Dict[str, Any]): A dictionary containing the generated embeddings.
+            embeddings (Any): The generated embeddings, a matrix for sentences or a list of (embedding, term) pairs per
+                sentence for the other kinds.
             output_path (str): The path to save the embeddings.
+            kind (str): The kind of embeddings that were generated.
+            row_ids (Optional[List[Any]]): The id of every row of the dataset, by default numbered after the rows
+                already saved to the output path.
+        """
+        if self.output_format == "pickle":
+            with open(os.path.join(output_path, f"embeddings-{str(uuid.uuid4())}.json"), "wb") as f:
+                pickle.dump(embeddings, f)
+            return
+
+        if row_ids is None:
+            # Number the rows after those of earlier runs saved to the same folder
+            offset = self._saved_rows(output_path)
+            row_ids = list(range(offset, offset + len(embeddings)))
+
+        ids, vectors = self._flatten_embeddings(embeddings, kind, row_ids)
+        files = save_embeddings(
+            output_path,
+            ids,
+            vectors,
+            output_format=self.output_format,
+            shard_size=self.shard_size,
+            prefix=f"embeddings-{str(uuid.uuid4())}",
+        )
+        self.log.info(f"Saved {len(ids)} embeddings in {len(files)} shards to {output_path}")
+
+    def _saved_rows(self, output_path: str) -> int:
+        """
+        Counts the rows whose embeddings are already listed in the manifest of the output folder.
+
+        Args:
+            output_path (str): The output folder.
+
+        Returns:
+            int: The number of distinct rows, 0 without a manifest.
         """
-        with open(os.path.join(output_path, f"embeddings-{str(uuid.uuid4())}.json"), "wb") as f:
-            pickle.dump(embeddings, f)
+        manifest_path = os.path.join(output_path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return 0
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        return len({str(id_).split(":", 1)[0] for shard in manifest["shards"] for id_ in shard["ids"]})
+
+    def _flatten_embeddings(self, embeddings: Any, kind: str, row_ids: List[Any]) -> Tuple[List[Any], np.ndarray]:
+        """
+        Flattens generated embeddings into ids and a contiguous matrix.
+
+        Args:
+            embeddings (Any): The generated embeddings.
+            kind (str): The kind of embeddings that were generated.
+            row_ids (List[Any]): The id of every row of the dataset.
+
+        Returns:
+            Tuple[List[Any], np.ndarray]: The row id of each sentence, or "row:term" for sub-phrase kinds, and the
+                embedding matrix.
+        """
+
+        def to_numpy(x: Any) -> np.ndarray:
+            return x.detach().cpu().numpy() if isinstance(x, torch.Tensor) else np.asarray(x)
+
+        if kind == "sentence":
+            vectors = np.stack([to_numpy(e) for e in embeddings])
+            return list(row_ids), vectors.reshape(len(vectors), -1)
+
+        ids = [f"{row_id}:{term}" for row_id, terms in zip(row_ids, embeddings) for _, term in terms]
+        rows = [to_numpy(e).reshape(-1) for terms in embeddings for e, _ in terms]
+        return ids, np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
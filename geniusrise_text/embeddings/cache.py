@@ -0,0 +1,218 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+def cache_namespace(model_name: str, revision: Optional[str], pooling: str, normalize: bool = False) -> str:
+    """
+    Builds the namespace of embeddings produced by a model with given settings.
+
+    Parameters:
+    - model_name (str): The name of the model.
+    - revision (Optional[str]): The revision of the model.
+    - pooling (str): The pooling strategy, or the library that pools, e.g. "sentence-transformers".
+    - normalize (bool, optional): Whether the embeddings are normalized. Defaults to False.
+
+    Returns:
+    str: The namespace.
+    """
+    return f"{model_name}@{revision or 'main'}:{pooling}{':normalized' if normalize else ''}"
+
+
+class EmbeddingCache:
+    """
+    A content-addressed cache of embeddings with an in-memory LRU tier and an optional SQLite tier on disk.
+
+    Entries are keyed by the SHA-256 of a namespace and the text. The namespace identifies everything that changes the
+    embedding of a text, e.g. the model name, revision and pooling, so several models can share one cache file.
+
+    Attributes:
+    - max_size (int): Maximum number of embeddings kept in memory.
+    - path (Optional[str]): Path of the SQLite database of the disk tier, or None for a memory-only cache.
+    """
+
+    def __init__(self, max_size: int = 10000, path: Optional[str] = None) -> None:
+        """
+        Initializes the EmbeddingCache.
+
+        Parameters:
+        - max_size (int, optional): Maximum number of embeddings kept in memory. Defaults to 10000.
+        - path (Optional[str], optional): Path of the SQLite database of the disk tier. Defaults to None.
+        """
+        self.max_size = max_size
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._counters: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dtype TEXT, shape TEXT, vector BLOB)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def key(namespace: str, text: str) -> str:
+        """
+        Computes the cache key of a text.
+
+        Parameters:
+        - namespace (str): Identifies the model and settings that produced the embedding.
+        - text (str): The embedded text.
+
+        Returns:
+        str: The hex SHA-256 of the namespace and the text.
+        """
+        return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, namespace: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Looks up the embeddings of texts, first in memory and then on disk.
+
+        Parameters:
+        - namespace (str): Identifies the model and settings that produced the embeddings.
+        - texts (List[str]): The texts.
+
+        Returns:
+        List[Optional[np.ndarray]]: The embedding of each text, or None if it is not cached.
+        """
+        keys = [self.key(namespace, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+
+        with self._lock:
+            on_disk = []
+            for i, key in enumerate(keys):
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    results[i] = self._memory[key]
+                    self._counters["memory_hits"] += 1
+                else:
+                    on_disk.append(i)
+
+            if self._db is not None and on_disk:
+                found = {}
+                unique = list(dict.fromkeys(keys[i] for i in on_disk))
+                for j in range(0, len(unique), 500):
+                    chunk = unique[j : j + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, dtype, shape, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, dtype, shape, vector in rows:
+                        found[key] = np.frombuffer(vector, dtype=dtype).reshape([int(x) for x in shape.split(",") if x])
+
+                for i in on_disk:
+                    vector = found.get(keys[i])
+                    if vector is not None:
+                        results[i] = vector
+                        self._remember(keys[i], vector)
+                        self._counters["disk_hits"] += 1
+
+            self._counters["misses"] += sum(1 for r in results if r is None)
+        return results
+
+    def put_many(self, namespace: str, texts: List[str], vectors: List[np.ndarray]) -> None:
+        """
+        Stores the embeddings of texts in memory and, if enabled, on disk.
+
+        Parameters:
+        - namespace (str): Identifies the model and settings that produced the embeddings.
+        - texts (List[str]): The texts.
+        - vectors (List[np.ndarray]): The embedding of each text.
+        """
+        entries = [(self.key(namespace, text), np.asarray(vector)) for text, vector in zip(texts, vectors)]
+        with self._lock:
+            for key, vector in entries:
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, dtype, shape, vector) VALUES (?, ?, ?, ?)",
+                    [
+                        (key, str(v.dtype), ",".join(str(x) for x in v.shape), np.ascontiguousarray(v).tobytes())
+                        for key, v in entries
+                    ],
+                )
+                self._db.commit()
+
+    def compute(self, namespace: str, texts: List[str], fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Returns the embeddings of texts, computing only the cache misses with a single call.
+
+        Parameters:
+        - namespace (str): Identifies the model and settings that produce the embeddings.
+        - texts (List[str]): The texts.
+        - fn (Callable[[List[str]], Any]): Embeds a list of texts, returning one row per text.
+
+        Returns:
+        np.ndarray: The embeddings, one row per text.
+        """
+        results = self.get_many(namespace, texts)
+        misses = list(dict.fromkeys(text for text, result in zip(texts, results) if result is None))
+
+        if misses:
+            computed = [np.asarray(vector) for vector in fn(misses)]
+            self.put_many(namespace, misses, computed)
+            by_text = dict(zip(misses, computed))
+            results = [by_text[text] if result is None else result for text, result in zip(texts, results)]
+
+        return np.stack(results) if results else np.zeros((0, 0), dtype=np.float32)  # type: ignore
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit and miss counters of the cache.
+
+        Returns:
+        Dict[str, Any]: Memory and disk hits, misses, the hit rate and the number of embeddings held in memory.
+        """
+        with self._lock:
+            lookups = sum(self._counters.values())
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_size": len(self._memory),
+                "disk": self.path,
+            }
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """
+        Stores an embedding in the memory tier, evicting the least recently used ones. Must hold the lock.
+
+        Parameters:
+        - key (str): The cache key.
+        - vector (np.ndarray): The embedding.
+        """
+        if self.max_size <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
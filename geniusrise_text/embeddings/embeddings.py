@@ -14,8 +14,11 @@
 # limitations under the License.
 
 import logging
+import math
+import random
+import re
 from itertools import combinations, permutations
-from typing import Any, List, Tuple, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 import torch
@@ -23,6 +26,9 @@ from transformers import PreTrainedModel, PreTrainedTokenizer
 
 log = logging.getLogger(__name__)
 
+# Embeddings stay on the GPU as tensors with `use_cuda`, and are NumPy arrays otherwise
+Embedding = Union[np.ndarray, torch.Tensor]
+
 
 def generate_sentence_transformer_embeddings(
     sentences: Union[str, List[str]], model: Any, use_cuda: bool = False, batch_size: int = 32
@@ -66,7 +72,9 @@ def generate_embeddings(
     tokenizer: PreTrainedTokenizer,
     output_key: str = "last_hidden_state",
     use_cuda: bool = False,
-) -> np.ndarray:
+    pooling: str = "mean",
+    normalize: bool = False,
+) -> Embedding:
     """
     Generates embeddings for a given sentence using a Hugging Face model.
 
@@ -76,33 +84,56 @@ def generate_embeddings(
     - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
     - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
     - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - pooling (str, optional): One of "mean", "cls", "max" or "last_token". Defaults to "mean".
+    - normalize (bool, optional): Whether to L2-normalize the embeddings. Defaults to False.
 
     Returns:
-    np.ndarray: The generated embeddings, averaged along the sequence length dimension.
+    Union[np.ndarray, torch.Tensor]: The generated embeddings, pooled along the sequence length dimension, of shape
+    (1, hidden).
     """
-    # Generate inputs
-    inputs = tokenizer(sentence, return_tensors="pt")
-
-    # Move inputs to the same device as the model
-    inputs = {k: v.to(model.device) for k, v in inputs.items()}
-
-    # Generate outputs
-    with torch.no_grad():  # Deactivate autograd to reduce memory usage
-        outputs = model(**inputs)
+    return generate_embeddings_batch(
+        sentences=[sentence],
+        model=model,
+        tokenizer=tokenizer,
+        output_key=output_key,
+        use_cuda=use_cuda,
+        pooling=pooling,
+        normalize=normalize,
+    )
+
+
+def generate_embeddings_batch(
+    sentences: List[str],
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    output_key: str = "last_hidden_state",
+    use_cuda: bool = False,
+    pooling: str = "mean",
+    normalize: bool = False,
+    batch_size: int = 32,
+) -> Embedding:
+    """
+    Generates embeddings for a list of sentences using a Hugging Face model, in padded batches.
 
-    # Extract embeddings
-    if isinstance(outputs, dict):
-        embeddings = outputs.get(output_key, None)
-    elif isinstance(outputs, tuple):
-        embeddings = outputs[0]
-    else:
-        raise ValueError("Unsupported model output type")
+    Parameters:
+    - sentences (List[str]): The sentences for which to generate the embeddings.
+    - model (PreTrainedModel): The Hugging Face model to use.
+    - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
+    - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
+    - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - pooling (str, optional): One of "mean", "cls", "max" or "last_token", padding is ignored. Defaults to "mean".
+    - normalize (bool, optional): Whether to L2-normalize the embeddings. Defaults to False.
+    - batch_size (int, optional): Number of sentences per forward pass. Defaults to 32.
 
-    if embeddings is None:
-        raise ValueError(f"Could not find key '{output_key}' in model outputs")
+    Returns:
+    Union[np.ndarray, torch.Tensor]: The generated embeddings, one row per sentence.
+    """
+    embeddings = _pooled_embeddings(
+        sentences, model, tokenizer, output_key=output_key, batch_size=batch_size, pooling=pooling
+    )
 
-    # Average along the sequence length dimension
-    embeddings = embeddings.mean(dim=1)
+    if normalize:
+        embeddings = torch.nn.functional.normalize(embeddings.float(), p=2, dim=-1)
 
     # Move to CPU and convert to NumPy
     if not use_cuda:
@@ -110,103 +141,173 @@ def generate_embeddings(
     return embeddings
 
 
-def generate_contiguous_embeddings(
+def iter_subphrases(
     sentence: str,
-    model: PreTrainedModel,
-    tokenizer: PreTrainedTokenizer,
-    output_key: str = "last_hidden_state",
-    use_cuda: bool = False,
-) -> List[Tuple[np.ndarray, str]]:
+    mode: str = "contiguous",
+    max_phrases: Optional[int] = None,
+    sample: bool = False,
+    seed: Optional[int] = None,
+) -> Iterator[str]:
     """
-    Generates embeddings for all contiguous subsets of words in a given sentence using a Hugging Face model.
+    Lazily enumerates the unique sub-phrases of a sentence.
 
     Parameters:
-    - sentence (str): The sentence for which to generate the embeddings. Can contain multiple words separated by space.
-    - model (PreTrainedModel): The Hugging Face model to use.
-    - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
-    - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
-    - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - sentence (str): The sentence, words are separated by spaces.
+    - mode (str, optional): "contiguous" for all contiguous spans, "combinations" for all ordered subsets of words or
+      "permutations" for all arrangements of subsets of words. Defaults to "contiguous".
+    - max_phrases (Optional[int], optional): Maximum number of sub-phrases to yield. Defaults to None, meaning all.
+    - sample (bool, optional): Whether to draw `max_phrases` random sub-phrases instead of the first ones when there
+      are more. Defaults to False.
+    - seed (Optional[int], optional): Seed for sampling. Defaults to None.
 
     Returns:
-    List[Tuple[np.ndarray, str]]: A list of tuples, each containing the generated embeddings and the term.
+    Iterator[str]: The unique sub-phrases, in enumeration order unless sampled.
     """
     words = sentence.split()
-    embeddings_list = []
+    n = len(words)
+
+    if mode == "contiguous":
+        total = n * (n + 1) // 2
+        phrases: Iterator[Tuple[str, ...]] = (
+            tuple(words[start_idx:end_idx]) for end_idx in range(1, n + 1) for start_idx in range(0, end_idx)
+        )
+    elif mode == "combinations":
+        total = 2**n - 1
+        phrases = (subset for r in range(1, n + 1) for subset in combinations(words, r))
+    elif mode == "permutations":
+        total = sum(math.perm(n, r) for r in range(1, n + 1))
+        phrases = (subset for r in range(1, n + 1) for subset in permutations(words, r))
+    else:
+        raise ValueError("Unsupported mode. Choose from 'contiguous', 'combinations', 'permutations'.")
 
-    for end_idx in range(1, len(words) + 1):
-        for start_idx in range(0, end_idx):
-            sub_sentence = " ".join(words[start_idx:end_idx])
+    if sample and max_phrases is not None and total > max_phrases:
+        phrases = _sample_subphrases(words, mode, max_phrases, random.Random(seed))
 
-            # Generate inputs
-            inputs = tokenizer(sub_sentence, return_tensors="pt")
+    seen = set()
+    for phrase in phrases:
+        term = " ".join(phrase)
+        if term in seen:
+            continue
+        seen.add(term)
+        yield term
+        if max_phrases is not None and len(seen) >= max_phrases:
+            return
 
-            # Move inputs to the same device as the model
-            inputs = {k: v.to(model.device) for k, v in inputs.items()}
 
-            # Generate outputs
-            with torch.no_grad():  # Deactivate autograd to reduce memory usage
-                outputs = model(**inputs)
+def _sample_subphrases(words: List[str], mode: str, max_phrases: int, rng: random.Random) -> Iterator[Tuple[str, ...]]:
+    """
+    Draws random sub-phrases of a sentence without enumerating all of them.
 
-            # Extract embeddings
-            if isinstance(outputs, dict):
-                embeddings = outputs.get(output_key, None)
-            elif isinstance(outputs, tuple):
-                embeddings = outputs[0]
-            else:
-                raise ValueError("Unsupported model output type")
+    Parameters:
+    - words (List[str]): The words of the sentence.
+    - mode (str): "contiguous", "combinations" or "permutations".
+    - max_phrases (int): Number of distinct sub-phrases wanted, used to bound the number of draws.
+    - rng (random.Random): The random number generator.
 
-            if embeddings is None:
-                raise ValueError(f"Could not find key '{output_key}' in model outputs")
+    Returns:
+    Iterator[Tuple[str, ...]]: Random sub-phrases, possibly repeated.
+    """
+    n = len(words)
+    for _ in range(max_phrases * 10):
+        if mode == "contiguous":
+            start_idx, end_idx = sorted(rng.sample(range(n + 1), 2))
+            yield tuple(words[start_idx:end_idx])
+        else:
+            indices = rng.sample(range(n), rng.randint(1, n))
+            yield tuple(words[i] for i in (sorted(indices) if mode == "combinations" else indices))
 
-            # Average along the sequence length dimension
-            embeddings = embeddings.mean(dim=1)
 
-            # Move to CPU and convert to NumPy
-            if not use_cuda:
-                embeddings = embeddings.cpu().numpy()
+POOLING_STRATEGIES = ("mean", "cls", "max", "last_token")
 
-            # Append embeddings and term length to the list
-            embeddings_list.append((embeddings, sub_sentence))
 
-    return embeddings_list
+def pool_embeddings(embeddings: torch.Tensor, attention_mask: torch.Tensor, pooling: str = "mean") -> torch.Tensor:
+    """
+    Pools token embeddings into one embedding per sequence, ignoring padding tokens.
 
+    Parameters:
+    - embeddings (torch.Tensor): The token embeddings, of shape (batch, sequence, hidden).
+    - attention_mask (torch.Tensor): The attention mask, of shape (batch, sequence).
+    - pooling (str, optional): "mean" of the tokens, "cls" for the first token, "max" over the tokens or "last_token"
+      for the last token. Works with both left and right padding. Defaults to "mean".
 
-def generate_combination_embeddings(
-    sentence: str,
+    Returns:
+    torch.Tensor: The pooled embeddings, of shape (batch, hidden).
+    """
+    mask = attention_mask.bool()
+    rows = torch.arange(embeddings.shape[0], device=embeddings.device)
+
+    if pooling == "mean":
+        weights = mask.unsqueeze(-1).to(embeddings.dtype)
+        return (embeddings * weights).sum(dim=1) / weights.sum(dim=1).clamp(min=1)
+    elif pooling == "max":
+        return embeddings.masked_fill(~mask.unsqueeze(-1), torch.finfo(embeddings.dtype).min).max(dim=1).values
+    elif pooling == "cls":
+        return embeddings[rows, mask.int().argmax(dim=1)]
+    elif pooling == "last_token":
+        return embeddings[rows, mask.shape[1] - 1 - mask.int().flip(dims=[1]).argmax(dim=1)]
+    else:
+        raise ValueError(f"Unsupported pooling. Choose from {', '.join(POOLING_STRATEGIES)}.")
+
+
+def _pad_batch(
+    token_ids: List[List[int]], pad_token_id: int, left: bool, device: torch.device
+) -> Dict[str, torch.Tensor]:
+    """
+    Pads tokenized texts into one batch.
+
+    Parameters:
+    - token_ids (List[List[int]]): The token ids of every text.
+    - pad_token_id (int): The id padding is filled with, masked out.
+    - left (bool): Whether to pad on the left rather than on the right.
+    - device (torch.device): The device of the batch.
+
+    Returns:
+    Dict[str, torch.Tensor]: The input ids and attention mask.
+    """
+    width = max(len(ids) for ids in token_ids)
+    input_ids, attention_mask = [], []
+    for ids in token_ids:
+        padding = [pad_token_id] * (width - len(ids))
+        mask = [1] * len(ids)
+        input_ids.append(padding + ids if left else ids + padding)
+        attention_mask.append([0] * len(padding) + mask if left else mask + [0] * len(padding))
+    return {
+        "input_ids": torch.tensor(input_ids, device=device),
+        "attention_mask": torch.tensor(attention_mask, device=device),
+    }
+
+
+def _pooled_embeddings(
+    texts: List[str],
     model: PreTrainedModel,
     tokenizer: PreTrainedTokenizer,
     output_key: str = "last_hidden_state",
-    use_cuda: bool = False,
-) -> List[Tuple[np.ndarray, str]]:
+    batch_size: int = 32,
+    pooling: str = "mean",
+) -> torch.Tensor:
     """
-    Generates embeddings for all combinations of words in a given sentence using a Hugging Face model.
+    Embeds texts in padded batches, pooling the token embeddings of each text under its attention mask.
 
     Parameters:
-    - sentence (str): The sentence for which to generate the embeddings. Can contain multiple words separated by space.
+    - texts (List[str]): The texts to embed.
     - model (PreTrainedModel): The Hugging Face model to use.
     - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
     - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
-    - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - batch_size (int, optional): Number of texts per forward pass. Defaults to 32.
+    - pooling (str, optional): One of "mean", "cls", "max" or "last_token". Defaults to "mean".
 
     Returns:
-    List[Tuple[np.ndarray, str]]: A list of tuples, each containing the generated embeddings and the term.
+    torch.Tensor: The embeddings, one row per text, on the device of the model.
     """
-    words = sentence.split()
-    all_combinations = []
-    for r in range(1, len(words) + 1):
-        for subset in combinations(words, r):
-            all_combinations.append(" ".join(subset))
-
-    embeddings_list = []
+    # Padded by hand, the shared tokenizer may have no pad token and must not be given one
+    pad_token_id = next((i for i in (tokenizer.pad_token_id, tokenizer.eos_token_id) if i is not None), 0)
+    left = tokenizer.padding_side == "left"
 
-    for comb_term in all_combinations:
-        # Generate inputs
-        inputs = tokenizer(comb_term, return_tensors="pt")
+    pooled = []
+    for i in range(0, len(texts), batch_size):
+        token_ids = tokenizer(texts[i : i + batch_size], truncation=True)["input_ids"]
+        inputs = _pad_batch(token_ids, pad_token_id, left, model.device)
 
-        # Move inputs to the same device as the model
-        inputs = {k: v.to(model.device) for k, v in inputs.items()}
-
-        # Generate outputs
         with torch.no_grad():  # Deactivate autograd to reduce memory usage
             outputs = model(**inputs)
 
@@ -221,77 +322,266 @@ def generate_combination_embeddings(
         if embeddings is None:
             raise ValueError(f"Could not find key '{output_key}' in model outputs")
 
-        # Average along the sequence length dimension
-        embeddings = embeddings.mean(dim=1)
+        pooled.append(pool_embeddings(embeddings, inputs["attention_mask"], pooling=pooling))
+
+    return torch.cat(pooled) if pooled else torch.empty(0)
+
 
-        # Move to CPU and convert to NumPy
-        if not use_cuda:
-            embeddings = embeddings.cpu().numpy()
+def generate_subphrase_embeddings(
+    sentence: str,
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    mode: str = "contiguous",
+    output_key: str = "last_hidden_state",
+    use_cuda: bool = False,
+    batch_size: int = 32,
+    max_phrases: Optional[int] = None,
+    sample: bool = False,
+) -> List[Tuple[Embedding, str]]:
+    """
+    Generates embeddings for the unique sub-phrases of a sentence in padded batches.
+
+    Parameters:
+    - sentence (str): The sentence for which to generate the embeddings. Can contain multiple words separated by space.
+    - model (PreTrainedModel): The Hugging Face model to use.
+    - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
+    - mode (str, optional): "contiguous", "combinations" or "permutations". Defaults to "contiguous".
+    - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
+    - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - batch_size (int, optional): Number of sub-phrases per forward pass. Defaults to 32.
+    - max_phrases (Optional[int], optional): Maximum number of sub-phrases to embed. Defaults to None, meaning all.
+    - sample (bool, optional): Whether to sample `max_phrases` random sub-phrases instead of the first ones. Defaults to False.
 
-        # Append embeddings and term length to the list
-        embeddings_list.append((embeddings, comb_term))
+    Returns:
+    List[Tuple[Union[np.ndarray, torch.Tensor], str]]: A list of tuples, each containing the generated embeddings
+    and the term.
+    """
+    phrases = list(iter_subphrases(sentence, mode=mode, max_phrases=max_phrases, sample=sample))
+    embeddings = _pooled_embeddings(phrases, model, tokenizer, output_key=output_key, batch_size=batch_size)
 
-    return embeddings_list
+    # Move to CPU and convert to NumPy
+    if not use_cuda:
+        embeddings = embeddings.cpu().numpy()
 
+    return [(embeddings[i : i + 1], phrase) for i, phrase in enumerate(phrases)]
 
-def generate_permutation_embeddings(
+
+def generate_single_pass_contiguous_embeddings(
     sentence: str,
     model: PreTrainedModel,
     tokenizer: PreTrainedTokenizer,
     output_key: str = "last_hidden_state",
     use_cuda: bool = False,
-) -> List[Tuple[np.ndarray, str]]:
+    max_phrases: Optional[int] = None,
+) -> List[Tuple[Embedding, str]]:
     """
-    Generates embeddings for all permutations of words in a given sentence using a Hugging Face model.
+    Generates embeddings for all contiguous subsets of words in a given sentence from a single forward pass.
+
+    The full sentence is encoded once and each span embedding is the mean of the contextual token embeddings of its
+    words, computed in O(1) per span from prefix sums over the token axis. Special tokens are not pooled. Requires a
+    fast tokenizer for the token offsets.
 
     Parameters:
     - sentence (str): The sentence for which to generate the embeddings. Can contain multiple words separated by space.
     - model (PreTrainedModel): The Hugging Face model to use.
-    - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
+    - tokenizer (PreTrainedTokenizer): The fast tokenizer for the model.
     - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
     - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - max_phrases (Optional[int], optional): Maximum number of spans to return. Defaults to None, meaning all.
 
     Returns:
-    List[Tuple[np.ndarray, str]]: A list of tuples, each containing the generated embeddings and the term.
+    List[Tuple[Union[np.ndarray, torch.Tensor], str]]: A list of tuples, each containing the generated embeddings
+    and the term.
     """
-    words = sentence.split()
-    all_permutations = []
-    for r in range(1, len(words) + 1):
-        for subset in permutations(words, r):
-            all_permutations.append(" ".join(subset))
+    if not tokenizer.is_fast:
+        raise ValueError("Single pass contiguous embeddings require a fast tokenizer")
 
-    embeddings_list = []
+    words = [(m.group(), m.start(), m.end()) for m in re.finditer(r"\S+", sentence)]
 
-    for comb_term in all_permutations:
-        # Generate inputs
-        inputs = tokenizer(comb_term, return_tensors="pt")
+    # Encode the full sentence once
+    inputs = tokenizer(sentence, return_tensors="pt", return_offsets_mapping=True, truncation=True)
+    offsets = inputs.pop("offset_mapping")[0].tolist()
+    inputs = {k: v.to(model.device) for k, v in inputs.items()}
 
-        # Move inputs to the same device as the model
-        inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    with torch.no_grad():  # Deactivate autograd to reduce memory usage
+        outputs = model(**inputs)
 
-        # Generate outputs
-        with torch.no_grad():  # Deactivate autograd to reduce memory usage
-            outputs = model(**inputs)
+    # Extract embeddings
+    if isinstance(outputs, dict):
+        embeddings = outputs.get(output_key, None)
+    elif isinstance(outputs, tuple):
+        embeddings = outputs[0]
+    else:
+        raise ValueError("Unsupported model output type")
 
-        # Extract embeddings
-        if isinstance(outputs, dict):
-            embeddings = outputs.get(output_key, None)
-        elif isinstance(outputs, tuple):
-            embeddings = outputs[0]
-        else:
-            raise ValueError("Unsupported model output type")
+    if embeddings is None:
+        raise ValueError(f"Could not find key '{output_key}' in model outputs")
 
-        if embeddings is None:
-            raise ValueError(f"Could not find key '{output_key}' in model outputs")
+    # Map every word to its range of tokens, special tokens have empty offsets
+    token_start: List[int] = []
+    token_end: List[int] = []
+    for _, word_start, word_end in words:
+        tokens = [t for t, (start, end) in enumerate(offsets) if end > start and start < word_end and end > word_start]
+        if not tokens:
+            break  # The rest of the sentence was truncated
+        token_start.append(tokens[0])
+        token_end.append(tokens[-1] + 1)
+
+    # Every span [start_idx, end_idx) of words pools the tokens [token_start[start_idx], token_end[end_idx - 1])
+    spans = []
+    seen = set()
+    for end_idx in range(1, len(token_start) + 1):
+        for start_idx in range(0, end_idx):
+            term = " ".join(word for word, _, _ in words[start_idx:end_idx])
+            if term not in seen:
+                seen.add(term)
+                spans.append((token_start[start_idx], token_end[end_idx - 1], term))
+    if max_phrases is not None:
+        spans = spans[:max_phrases]
+    if not spans:
+        return []
+
+    hidden = embeddings[0].float()
+    prefix = torch.cat([torch.zeros_like(hidden[:1]), hidden.cumsum(dim=0)])
+    starts = torch.tensor([a for a, _, _ in spans], device=hidden.device)
+    ends = torch.tensor([b for _, b, _ in spans], device=hidden.device)
+    pooled = (prefix[ends] - prefix[starts]) / (ends - starts).unsqueeze(-1).to(hidden.dtype)
 
-        # Average along the sequence length dimension
-        embeddings = embeddings.mean(dim=1)
+    # Move to CPU and convert to NumPy
+    if not use_cuda:
+        pooled = pooled.cpu().numpy()
+
+    return [(pooled[i : i + 1], term) for i, (_, _, term) in enumerate(spans)]
 
-        # Move to CPU and convert to NumPy
-        if not use_cuda:
-            embeddings = embeddings.cpu().numpy()
 
-        # Append embeddings and term length to the list
-        embeddings_list.append((embeddings, comb_term))
+def generate_contiguous_embeddings(
+    sentence: str,
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    output_key: str = "last_hidden_state",
+    use_cuda: bool = False,
+    batch_size: int = 32,
+    max_phrases: Optional[int] = None,
+    sample: bool = False,
+    single_pass: bool = False,
+) -> List[Tuple[Embedding, str]]:
+    """
+    Generates embeddings for all contiguous subsets of words in a given sentence using a Hugging Face model.
 
-    return embeddings_list
+    Parameters:
+    - sentence (str): The sentence for which to generate the embeddings. Can contain multiple words separated by space.
+    - model (PreTrainedModel): The Hugging Face model to use.
+    - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
+    - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
+    - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - batch_size (int, optional): Number of sub-phrases per forward pass. Defaults to 32.
+    - max_phrases (Optional[int], optional): Maximum number of sub-phrases to embed. Defaults to None, meaning all.
+    - sample (bool, optional): Whether to sample `max_phrases` random sub-phrases instead of the first ones. Defaults to False.
+    - single_pass (bool, optional): Whether to derive all spans from one encoding of the full sentence instead of
+      encoding every span on its own. Defaults to False.
+
+    Returns:
+    List[Tuple[Union[np.ndarray, torch.Tensor], str]]: A list of tuples, each containing the generated embeddings
+    and the term.
+    """
+    if single_pass:
+        return generate_single_pass_contiguous_embeddings(
+            sentence=sentence,
+            model=model,
+            tokenizer=tokenizer,
+            output_key=output_key,
+            use_cuda=use_cuda,
+            max_phrases=max_phrases,
+        )
+
+    return generate_subphrase_embeddings(
+        sentence=sentence,
+        model=model,
+        tokenizer=tokenizer,
+        mode="contiguous",
+        output_key=output_key,
+        use_cuda=use_cuda,
+        batch_size=batch_size,
+        max_phrases=max_phrases,
+        sample=sample,
+    )
+
+
+def generate_combination_embeddings(
+    sentence: str,
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    output_key: str = "last_hidden_state",
+    use_cuda: bool = False,
+    batch_size: int = 32,
+    max_phrases: Optional[int] = None,
+    sample: bool = False,
+) -> List[Tuple[Embedding, str]]:
+    """
+    Generates embeddings for all combinations of words in a given sentence using a Hugging Face model.
+
+    Parameters:
+    - sentence (str): The sentence for which to generate the embeddings. Can contain multiple words separated by space.
+    - model (PreTrainedModel): The Hugging Face model to use.
+    - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
+    - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
+    - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - batch_size (int, optional): Number of sub-phrases per forward pass. Defaults to 32.
+    - max_phrases (Optional[int], optional): Maximum number of sub-phrases to embed. Defaults to None, meaning all.
+    - sample (bool, optional): Whether to sample `max_phrases` random sub-phrases instead of the first ones. Defaults to False.
+
+    Returns:
+    List[Tuple[Union[np.ndarray, torch.Tensor], str]]: A list of tuples, each containing the generated embeddings
+    and the term.
+    """
+    return generate_subphrase_embeddings(
+        sentence=sentence,
+        model=model,
+        tokenizer=tokenizer,
+        mode="combinations",
+        output_key=output_key,
+        use_cuda=use_cuda,
+        batch_size=batch_size,
+        max_phrases=max_phrases,
+        sample=sample,
+    )
+
+
+def generate_permutation_embeddings(
+    sentence: str,
+    model: PreTrainedModel,
+    tokenizer: PreTrainedTokenizer,
+    output_key: str = "last_hidden_state",
+    use_cuda: bool = False,
+    batch_size: int = 32,
+    max_phrases: Optional[int] = None,
+    sample: bool = False,
+) -> List[Tuple[Embedding, str]]:
+    """
+    Generates embeddings for all permutations of words in a given sentence using a Hugging Face model.
+
+    Parameters:
+    - sentence (str): The sentence for which to generate the embeddings. Can contain multiple words separated by space.
+    - model (PreTrainedModel): The Hugging Face model to use.
+    - tokenizer (PreTrainedTokenizer): The tokenizer for the model.
+    - output_key (str, optional): The key to use to extract embeddings from the model output. Defaults to 'last_hidden_state'.
+    - use_cuda (bool, optional): Whether to use CUDA for computation. Defaults to False.
+    - batch_size (int, optional): Number of sub-phrases per forward pass. Defaults to 32.
+    - max_phrases (Optional[int], optional): Maximum number of sub-phrases to embed. Defaults to None, meaning all.
+    - sample (bool, optional): Whether to sample `max_phrases` random sub-phrases instead of the first ones. Defaults to False.
+
+    Returns:
+    List[Tuple[Union[np.ndarray, torch.Tensor], str]]: A list of tuples, each containing the generated embeddings
+    and the term.
+    """
+    return generate_subphrase_embeddings(
+        sentence=sentence,
+        model=model,
+        tokenizer=tokenizer,
+        mode="permutations",
+        output_key=output_key,
+        use_cuda=use_cuda,
+        batch_size=batch_size,
+        max_phrases=max_phrases,
+        sample=sample,
+    )
@@ -0,0 +1,481 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+log = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+OUTPUT_FORMATS = {"npy": ".npy", "f16": ".f16", "f32": ".f32", "parquet": ".parquet"}
+
+
+def save_embeddings(
+    path: str,
+    ids: List[Any],
+    vectors: np.ndarray,
+    output_format: str = "npy",
+    shard_size: int = 100000,
+    prefix: str = "embeddings",
+    append: bool = True,
+) -> List[str]:
+    """
+    Saves embeddings as contiguous array shards and records them in the manifest of the folder.
+
+    Shards are written as `.npy` float32 arrays, raw little-endian `.f16`/`.f32` arrays that can be memory-mapped
+    directly, or parquet files with an `id` column and a fixed size list `embedding` column. Shards already listed in
+    the manifest are kept unless `append` is False, so several runs can write into the same folder.
+
+    Parameters:
+    - path (str): The folder to save to.
+    - ids (List[Any]): The ids of the embeddings.
+    - vectors (np.ndarray): The embeddings, one row per id.
+    - output_format (str, optional): One of "npy", "f16", "f32" or "parquet". Defaults to "npy".
+    - shard_size (int, optional): Maximum number of rows per shard. Defaults to 100000.
+    - prefix (str, optional): Prefix of the shard file names. Defaults to "embeddings".
+    - append (bool, optional): Whether to add to the embeddings already in the folder rather than replace them.
+      Defaults to True.
+
+    Returns:
+    List[str]: The file names of the written shards.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format. Choose from {', '.join(OUTPUT_FORMATS)}.")
+
+    vectors = np.atleast_2d(np.asarray(vectors))
+    dim = int(vectors.shape[1]) if vectors.size else 0
+    os.makedirs(path, exist_ok=True)
+
+    manifest_path = os.path.join(path, MANIFEST)
+    if os.path.exists(manifest_path) and not append:
+        with open(manifest_path, "r") as f:
+            previous = json.load(f)
+        for shard in previous["shards"]:
+            if os.path.exists(os.path.join(path, shard["file"])):
+                os.remove(os.path.join(path, shard["file"]))
+        os.remove(manifest_path)
+
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest["dim"] != dim:
+            raise ValueError(f"Manifest at {path} has dimension {manifest['dim']}, got embeddings of dimension {dim}")
+    else:
+        manifest = {"dim": dim, "shards": []}
+
+    files = []
+    for i in range(0, len(ids), shard_size):
+        shard_ids = list(ids[i : i + shard_size])
+        shard = vectors[i : i + shard_size]
+        filename = f"{prefix}-{len(manifest['shards'])}{OUTPUT_FORMATS[output_format]}"
+        filepath = os.path.join(path, filename)
+
+        if output_format == "npy":
+            np.save(filepath, shard.astype(np.float32))
+        elif output_format == "f16":
+            shard.astype("<f2").tofile(filepath)
+        elif output_format == "f32":
+            shard.astype("<f4").tofile(filepath)
+        else:
+            flat = pa.array(shard.astype(np.float32).reshape(-1))
+            table = pa.table({"id": shard_ids, "embedding": pa.FixedSizeListArray.from_arrays(flat, dim)})
+            pq.write_table(table, filepath)
+
+        manifest["shards"].append({"file": filename, "count": len(shard_ids), "ids": shard_ids})
+        files.append(filename)
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return files
+
+
+def load_embeddings(path: str, mmap: bool = True) -> Tuple[List[Any], np.ndarray]:
+    """
+    Loads embeddings saved as array shards with a manifest, e.g. by `EmbeddingsBulk.generate`.
+
+    The manifest is a JSON file with the dimension of the embeddings and a list of shards, each with the file name
+    of its array and the ids of its rows. `.npy` shards and raw `.f16`/`.f32` shards are memory-mapped, parquet shards
+    are read into memory.
+
+    Parameters:
+    - path (str): The folder containing the manifest and the shards.
+    - mmap (bool, optional): Whether to memory-map the shards instead of reading them into memory. Defaults to True.
+
+    Returns:
+    Tuple[List[Any], np.ndarray]: The ids and the embedding matrix, one row per id.
+    """
+    with open(os.path.join(path, MANIFEST), "r") as f:
+        manifest = json.load(f)
+
+    dim = manifest["dim"]
+    ids: List[Any] = []
+    shards = []
+    for shard in manifest["shards"]:
+        filename = os.path.join(path, shard["file"])
+        if filename.endswith(".npy"):
+            vectors = np.load(filename, mmap_mode="r" if mmap else None)
+        elif filename.endswith(".parquet"):
+            column = pq.read_table(filename, columns=["embedding"]).column("embedding").combine_chunks()
+            vectors = column.flatten().to_numpy().reshape(-1, dim)
+        else:
+            dtype = np.float16 if filename.endswith(".f16") else np.float32
+            vectors = np.memmap(filename, dtype=dtype, mode="r").reshape(-1, dim)
+            if not mmap:
+                vectors = np.array(vectors)
+        ids.extend(shard["ids"])
+        shards.append(vectors)
+
+    if not shards:
+        return ids, np.zeros((0, dim), dtype=np.float32)
+    # A single shard stays memory-mapped, several shards are concatenated
+    return ids, shards[0] if len(shards) == 1 else np.concatenate(shards)
+
+
+def _row_norms(vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """
+    Computes the L2 norm of each row in chunks, so that memory-mapped matrices are never fully loaded.
+
+    Parameters:
+    - vectors (np.ndarray): The vectors.
+    - chunk_size (int, optional): Number of rows per chunk. Defaults to 65536.
+
+    Returns:
+    np.ndarray: The norm of each row.
+    """
+    norms = [
+        np.linalg.norm(np.asarray(vectors[i : i + chunk_size], dtype=np.float32), axis=1)
+        for i in range(0, len(vectors), chunk_size)
+    ]
+    return np.concatenate(norms) if norms else np.zeros(0, dtype=np.float32)
+
+
+class VectorIndex:
+    """
+    An in-process vector index for k-nearest-neighbour search over embeddings.
+
+    Small collections are searched exhaustively with one matrix product per query batch. Large collections use an
+    inverted file (IVF) index: the vectors are clustered with k-means, and a query is only compared to the vectors of
+    its `nprobe` closest clusters. Vectors may be memory-mapped, they are only copied into memory on the first upsert.
+
+    Attributes:
+    - metric (str): Either "cosine" or "dot".
+    - index_type (str): One of "flat", "ivf" or "auto", which switches to IVF above `ivf_threshold` vectors.
+    - nlist (Optional[int]): Number of IVF clusters, defaults to the square root of the number of vectors.
+    - nprobe (int): Number of IVF clusters searched per query.
+    - ivf_threshold (int): Minimum number of vectors for "auto" to build an IVF index.
+    """
+
+    def __init__(
+        self,
+        metric: str = "cosine",
+        index_type: str = "auto",
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        ivf_threshold: int = 50000,
+    ) -> None:
+        """
+        Initializes an empty VectorIndex.
+
+        Parameters:
+        - metric (str, optional): Similarity metric, either "cosine" or "dot". Defaults to "cosine".
+        - index_type (str, optional): One of "flat", "ivf" or "auto". Defaults to "auto".
+        - nlist (Optional[int], optional): Number of IVF clusters. Defaults to the square root of the number of vectors.
+        - nprobe (int, optional): Number of IVF clusters searched per query. Defaults to 8.
+        - ivf_threshold (int, optional): Minimum number of vectors for "auto" to build an IVF index. Defaults to 50000.
+        """
+        if metric not in ("cosine", "dot"):
+            raise ValueError("Unsupported metric. Choose from 'cosine', 'dot'.")
+        if index_type not in ("flat", "ivf", "auto"):
+            raise ValueError("Unsupported index type. Choose from 'flat', 'ivf', 'auto'.")
+
+        self.metric = metric
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_threshold = ivf_threshold
+
+        self._lock = threading.RLock()
+        self._ids: List[Any] = []
+        self._positions: Dict[Any, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._norms: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, **kwargs: Any) -> "VectorIndex":
+        """
+        Creates an index from embeddings saved as array shards with a manifest.
+
+        Parameters:
+        - path (str): The folder containing the manifest and the shards.
+        - mmap (bool, optional): Whether to memory-map the shards. Defaults to True.
+        - **kwargs (Any): Arguments passed to the VectorIndex constructor.
+
+        Returns:
+        VectorIndex: The index, built over the loaded embeddings.
+        """
+        ids, vectors = load_embeddings(path, mmap=mmap)
+        index = cls(**kwargs)
+        with index._lock:
+            index._ids = list(ids)
+            index._positions = {id_: i for i, id_ in enumerate(index._ids)}
+            index._vectors = vectors
+            index._norms = _row_norms(vectors)
+            index.build()
+        log.info(f"Loaded {len(ids)} vectors of dimension {vectors.shape[1]} from {path}")
+        return index
+
+    def save(self, path: str) -> None:
+        """
+        Saves the vectors and ids of the index as `.npy` shards with a manifest, replacing the embeddings already in
+        the folder.
+
+        Parameters:
+        - path (str): The folder to save to.
+        """
+        with self._lock:
+            if self._vectors is not None:
+                save_embeddings(path, self._ids, self._vectors, output_format="npy", append=False)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._vectors is None else self._vectors.shape[1]
+
+    @property
+    def is_ivf(self) -> bool:
+        return self._centroids is not None
+
+    def upsert(self, ids: List[Any], vectors: np.ndarray) -> None:
+        """
+        Inserts new vectors and replaces the vectors of existing ids.
+
+        Parameters:
+        - ids (List[Any]): The ids of the vectors. An id given several times keeps its last vector.
+        - vectors (np.ndarray): The vectors, one row per id.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if len(ids) != vectors.shape[0]:
+            raise ValueError(f"Got {len(ids)} ids for {vectors.shape[0]} vectors")
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        # Validated and deduplicated before the index changes, so that a rejected call leaves it intact
+        last_rows: Dict[Any, int] = {}
+        for row, id_ in enumerate(ids):
+            try:
+                last_rows[id_] = row
+            except TypeError:
+                raise ValueError(f"Ids must be hashable, got {id_!r}")
+        if len(last_rows) < len(ids):
+            ids = list(last_rows)
+            vectors = vectors[list(last_rows.values())]
+
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+                self._norms = np.zeros(0, dtype=np.float32)
+
+            # Memory-mapped or half precision vectors are copied on the first write
+            if type(self._vectors) is not np.ndarray or self._vectors.dtype != np.float32:
+                self._vectors = np.array(self._vectors, dtype=np.float32)
+
+            norms = np.linalg.norm(vectors, axis=1)
+            new_ids: List[Any] = []
+            new_rows: List[int] = []
+            updated: List[int] = []
+            for row, id_ in enumerate(ids):
+                position = self._positions.get(id_)
+                if position is None:
+                    self._positions[id_] = len(self._ids) + len(new_ids)
+                    new_ids.append(id_)
+                    new_rows.append(row)
+                else:
+                    self._vectors[position] = vectors[row]
+                    self._norms[position] = norms[row]  # type: ignore
+                    updated.append(position)
+
+            start = len(self._ids)
+            if new_rows:
+                self._ids.extend(new_ids)
+                self._vectors = np.concatenate([self._vectors, vectors[new_rows]])
+                self._norms = np.concatenate([self._norms, norms[new_rows]])  # type: ignore
+
+            if self.is_ivf:
+                changed = np.concatenate([np.array(updated, dtype=np.int64), np.arange(start, len(self._ids))])
+                assignments = np.zeros(len(self._ids), dtype=np.int64)
+                assignments[:start] = self._assignments  # type: ignore
+                assignments[changed] = self._assign(self._vectors[changed])  # type: ignore
+                self._assignments = assignments
+            else:
+                self.build()
+
+    def build(self) -> None:
+        """
+        Builds the IVF clusters if the index type and the collection size call for it, or drops them otherwise.
+        """
+        with self._lock:
+            n = len(self._ids)
+            use_ivf = self.index_type == "ivf" or (self.index_type == "auto" and n >= self.ivf_threshold)
+            if not use_ivf or n == 0:
+                self._centroids = None
+                self._assignments = None
+                return
+
+            nlist = min(self.nlist or max(1, int(np.sqrt(n))), n)
+            self._centroids = self._kmeans(nlist)
+            self._assignments = self._assign(self._vectors)  # type: ignore
+            log.info(f"Built IVF index with {nlist} clusters over {n} vectors")
+
+    def search(self, queries: np.ndarray, k: int = 10) -> List[List[Tuple[Any, float]]]:
+        """
+        Finds the k most similar vectors of each query.
+
+        Parameters:
+        - queries (np.ndarray): The query vectors, one per row.
+        - k (int, optional): Number of neighbours per query. Defaults to 10.
+
+        Returns:
+        List[List[Tuple[Any, float]]]: For each query, the ids and scores of its neighbours, best first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            if not self._ids:
+                return [[] for _ in range(len(queries))]
+
+            if self.is_ivf:
+                return [self._search_ivf(query, k) for query in queries]
+
+            scores = self._scores(queries, self._vectors, self._norms)  # type: ignore
+            return [self._top_k(row, np.arange(len(self._ids)), k) for row in scores]
+
+    def _scores(
+        self, queries: np.ndarray, vectors: np.ndarray, norms: np.ndarray, chunk_size: int = 65536
+    ) -> np.ndarray:
+        """
+        Computes the similarity of each query to each vector, converting the vectors to float32 in chunks of rows so
+        that memory-mapped or half precision matrices are never fully copied.
+
+        Parameters:
+        - queries (np.ndarray): The query vectors.
+        - vectors (np.ndarray): The candidate vectors.
+        - norms (np.ndarray): The norms of the candidate vectors.
+        - chunk_size (int, optional): Number of vectors per chunk. Defaults to 65536.
+
+        Returns:
+        np.ndarray: The similarity matrix of shape (queries, vectors).
+        """
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        for i in range(0, len(vectors), chunk_size):
+            scores[:, i : i + chunk_size] = queries @ np.asarray(vectors[i : i + chunk_size], dtype=np.float32).T
+        if self.metric == "cosine":
+            query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            scores = scores / np.maximum(query_norms * norms[None, :], 1e-12)
+        return scores
+
+    def _top_k(self, scores: np.ndarray, rows: np.ndarray, k: int) -> List[Tuple[Any, float]]:
+        """
+        Selects the k best scores of one query.
+
+        Parameters:
+        - scores (np.ndarray): The scores of the candidate rows.
+        - rows (np.ndarray): The positions of the candidate rows in the index.
+        - k (int): Number of neighbours.
+
+        Returns:
+        List[Tuple[Any, float]]: The ids and scores of the neighbours, best first.
+        """
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self._ids[rows[i]], float(scores[i])) for i in best]
+
+    def _search_ivf(self, query: np.ndarray, k: int) -> List[Tuple[Any, float]]:
+        """
+        Searches the vectors of the clusters closest to a query.
+
+        Parameters:
+        - query (np.ndarray): The query vector.
+        - k (int): Number of neighbours.
+
+        Returns:
+        List[Tuple[Any, float]]: The ids and scores of the neighbours, best first.
+        """
+        centroid_scores = self._centroids @ query  # type: ignore
+        nprobe = min(self.nprobe, len(centroid_scores))
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        rows = np.flatnonzero(np.isin(self._assignments, probes))  # type: ignore
+        scores = self._scores(query[None, :], self._vectors[rows], self._norms[rows])[0]  # type: ignore
+        return self._top_k(scores, rows, k)
+
+    def _kmeans(self, nlist: int, iterations: int = 10, sample_size: int = 256) -> np.ndarray:
+        """
+        Clusters a sample of the normalized vectors with spherical k-means.
+
+        Parameters:
+        - nlist (int): Number of clusters.
+        - iterations (int, optional): Number of k-means iterations. Defaults to 10.
+        - sample_size (int, optional): Number of sampled vectors per cluster. Defaults to 256.
+
+        Returns:
+        np.ndarray: The normalized centroids.
+        """
+        rng = np.random.default_rng(42)
+        n = len(self._ids)
+        sample = rng.choice(n, size=min(n, nlist * sample_size), replace=False)
+        sample.sort()
+        vectors = np.asarray(self._vectors[sample], dtype=np.float32)  # type: ignore
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """
+        Assigns vectors to their closest IVF cluster.
+
+        Parameters:
+        - vectors (np.ndarray): The vectors to assign.
+        - chunk_size (int, optional): Number of vectors compared to the centroids at once. Defaults to 65536.
+
+        Returns:
+        np.ndarray: The cluster of each vector.
+        """
+        centroids = self._centroids.T  # type: ignore
+        assignments = [
+            np.argmax(np.asarray(vectors[i : i + chunk_size], dtype=np.float32) @ centroids, axis=1)
+            for i in range(0, len(vectors), chunk_size)
+        ]
+        return np.concatenate(assignments) if assignments else np.zeros(0, dtype=np.int64)
@@ -28,6 +28,7 @@ from pyarrow import feather
 from pyarrow import parquet as pq
 
 from geniusrise_text.embeddings.bulk import EmbeddingsBulk
+from geniusrise_text.embeddings.index import load_embeddings
 
 
 # Helper function to create synthetic data in different formats
@@ -129,3 +130,31 @@ def test_generate_huggingface_embeddings(embeddings_bulk_bolt, dataset_file):
         embeddings_bulk_bolt.generate(kind=kind, model_name="bert-base-uncased", use_cuda=True, device_map="cuda:0")
         files = glob.glob(f"{embeddings_bulk_bolt.output.output_folder}/embeddings-*.json")
         assert len(files) > 0
+
+
+@pytest.mark.parametrize("output_format", ["npy", "parquet"])
+def test_generate_embeddings_array_output(embeddings_bulk_bolt, output_format):
+    create_dataset_in_format(embeddings_bulk_bolt.input.input_folder, "jsonl")
+    embeddings_bulk_bolt.generate(
+        kind="sentence",
+        model_name="sentence-transformers/paraphrase-MiniLM-L6-v2",
+        use_cuda=False,
+        output_format=output_format,
+    )
+    ids, vectors = load_embeddings(embeddings_bulk_bolt.output.output_folder)
+    assert ids == list(range(10))
+    assert vectors.shape[0] == 10
+
+
+def test_generate_embeddings_appends_new_ids(embeddings_bulk_bolt):
+    create_dataset_in_format(embeddings_bulk_bolt.input.input_folder, "jsonl")
+    for _ in range(2):
+        embeddings_bulk_bolt.generate(
+            kind="sentence",
+            model_name="sentence-transformers/paraphrase-MiniLM-L6-v2",
+            use_cuda=False,
+            output_format="npy",
+        )
+
+    ids, _ = load_embeddings(embeddings_bulk_bolt.output.output_folder)
+    assert ids == list(range(20))
@@ -0,0 +1,82 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from geniusrise_text.embeddings.cache import EmbeddingCache, cache_namespace
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.stack([np.full(4, len(text), dtype=np.float32) for text in texts])
+
+
+def test_compute_embeds_only_misses():
+    cache = EmbeddingCache(max_size=100)
+    embed = CountingEmbedder()
+
+    first = cache.compute("model", ["a", "bb", "a"], embed)
+    second = cache.compute("model", ["bb", "ccc"], embed)
+
+    assert embed.calls == [["a", "bb"], ["ccc"]]
+    assert first.shape == (3, 4)
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(second[0], first[1])
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 4
+
+
+def test_namespaces_do_not_collide():
+    cache = EmbeddingCache(max_size=100)
+    embed = CountingEmbedder()
+
+    cache.compute(cache_namespace("bert", None, "mean"), ["a"], embed)
+    cache.compute(cache_namespace("bert", None, "cls"), ["a"], embed)
+
+    assert len(embed.calls) == 2
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = EmbeddingCache(max_size=2)
+    embed = CountingEmbedder()
+
+    cache.compute("model", ["a", "bb"], embed)
+    cache.compute("model", ["a"], embed)
+    cache.compute("model", ["ccc"], embed)
+    cache.compute("model", ["a", "bb"], embed)
+
+    assert embed.calls[-1] == ["bb"]
+    assert cache.stats()["memory_size"] == 2
+
+
+def test_disk_tier_persists_across_instances(tmpdir):
+    path = str(tmpdir / "embeddings.db")
+    embed = CountingEmbedder()
+
+    expected = EmbeddingCache(path=path).compute("model", ["a", "bb"], embed)
+    cache = EmbeddingCache(path=path)
+    loaded = cache.compute("model", ["a", "bb"], embed)
+
+    assert len(embed.calls) == 1
+    np.testing.assert_array_equal(loaded, expected)
+    assert loaded.dtype == np.float32
+    assert cache.stats()["disk_hits"] == 2
+    assert cache.stats()["hit_rate"] == 1.0
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import pytest
 from sentence_transformers import SentenceTransformer
 from transformers import AutoModel, AutoTokenizer
@@ -21,8 +22,10 @@ from geniusrise_text.embeddings.embeddings import (
     generate_combination_embeddings,
     generate_contiguous_embeddings,
     generate_embeddings,
+    generate_embeddings_batch,
     generate_permutation_embeddings,
     generate_sentence_transformer_embeddings,
+    iter_subphrases,
 )
 
 # List of models to test
@@ -92,3 +95,65 @@ def test_generate_permutation_embeddings(model_name):
     sentence = "This is a test sentence."
     embeddings_list = generate_permutation_embeddings(sentence=sentence, model=model, tokenizer=tokenizer)
     assert all(embeddings.shape == (1, model.config.hidden_size) for embeddings, _ in embeddings_list)
+
+
+def test_iter_subphrases_dedup_and_cap():
+    assert list(iter_subphrases("a b c")) == ["a", "a b", "b", "a b c", "b c", "c"]
+    assert len(list(iter_subphrases("a a b", mode="permutations"))) == 8
+    sentence = " ".join(f"w{i}" for i in range(12))
+    assert len(list(iter_subphrases(sentence, mode="permutations", max_phrases=50, sample=True, seed=0))) == 50
+
+
+@pytest.mark.parametrize("model_name", ["bert-base-uncased", "gpt2"])
+def test_batched_subphrase_embeddings_match_single(model_name):
+    model = AutoModel.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    sentence = "This is a test sentence."
+    embeddings_list = generate_contiguous_embeddings(sentence=sentence, model=model, tokenizer=tokenizer, batch_size=4)
+    assert len(embeddings_list) == 15
+
+    for embeddings, term in embeddings_list[:5]:
+        single = generate_embeddings(sentence=term, model=model, tokenizer=tokenizer)
+        np.testing.assert_allclose(embeddings, single, atol=1e-4)
+
+
+@pytest.mark.parametrize("model_name", ["bert-base-uncased", "gpt2"])
+def test_single_pass_contiguous_embeddings(model_name):
+    model = AutoModel.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    sentence = "This is a test sentence."
+    embeddings_list = generate_contiguous_embeddings(
+        sentence=sentence, model=model, tokenizer=tokenizer, single_pass=True
+    )
+    assert [term for _, term in embeddings_list] == list(iter_subphrases(sentence))
+    assert all(embeddings.shape == (1, model.config.hidden_size) for embeddings, _ in embeddings_list)
+
+
+@pytest.mark.parametrize("pooling", ["mean", "cls", "max", "last_token"])
+def test_generate_embeddings_batch_ignores_padding(pooling):
+    model = AutoModel.from_pretrained("bert-base-uncased")
+    tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
+    sentences = ["Short.", "This is a much longer test sentence with many more tokens."]
+
+    embeddings = generate_embeddings_batch(
+        sentences=sentences, model=model, tokenizer=tokenizer, pooling=pooling, normalize=True
+    )
+    assert embeddings.shape == (2, model.config.hidden_size)
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
+
+    single = generate_embeddings(
+        sentence=sentences[0], model=model, tokenizer=tokenizer, pooling=pooling, normalize=True
+    )
+    np.testing.assert_allclose(embeddings[:1], single, atol=1e-4)
+
+
+def test_generate_embeddings_batch_leaves_tokenizer_untouched():
+    model = AutoModel.from_pretrained("gpt2")
+    tokenizer = AutoTokenizer.from_pretrained("gpt2")
+    sentences = ["Short.", "This is a much longer test sentence with many more tokens."]
+
+    embeddings = generate_embeddings_batch(sentences=sentences, model=model, tokenizer=tokenizer, pooling="mean")
+    single = generate_embeddings(sentence=sentences[0], model=model, tokenizer=tokenizer, pooling="mean")
+
+    assert tokenizer.pad_token is None
+    np.testing.assert_allclose(embeddings[:1], single, atol=1e-4)
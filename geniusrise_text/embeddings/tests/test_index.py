@@ -0,0 +1,111 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from geniusrise_text.embeddings.index import VectorIndex, load_embeddings, save_embeddings
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(2000, 32)).astype(np.float32)
+
+
+@pytest.mark.parametrize("metric", ["cosine", "dot"])
+def test_flat_search_is_exact(vectors, metric):
+    index = VectorIndex(metric=metric, index_type="flat")
+    index.upsert(list(range(len(vectors))), vectors)
+
+    results = index.search(vectors[:5], k=3)
+    scores = vectors[:5] @ vectors.T
+    if metric == "cosine":
+        norms = np.linalg.norm(vectors, axis=1)
+        scores = scores / (norms[:5, None] * norms[None, :])
+
+    for neighbours, row in zip(results, scores):
+        assert [id_ for id_, _ in neighbours] == list(np.argsort(-row)[:3])
+
+
+def test_ivf_search_recall(vectors):
+    flat = VectorIndex(index_type="flat")
+    ivf = VectorIndex(index_type="ivf", nlist=16, nprobe=8)
+    flat.upsert(list(range(len(vectors))), vectors)
+    ivf.upsert(list(range(len(vectors))), vectors)
+    assert ivf.is_ivf
+
+    queries = vectors[:20] + 0.01
+    exact = [{id_ for id_, _ in n} for n in flat.search(queries, k=10)]
+    approximate = [{id_ for id_, _ in n} for n in ivf.search(queries, k=10)]
+    recall = np.mean([len(a & e) / len(e) for a, e in zip(approximate, exact)])
+    assert recall > 0.8
+
+
+def test_upsert_replaces_and_roundtrips(vectors, tmpdir):
+    index = VectorIndex(index_type="flat")
+    index.upsert(["a", "b"], vectors[:2])
+    index.upsert(["b", "c"], vectors[2:4])
+    assert len(index) == 3
+    assert index.search(vectors[2], k=1)[0][0][0] == "b"
+
+    index.save(str(tmpdir))
+    loaded = VectorIndex.load(str(tmpdir), index_type="flat")
+    assert len(loaded) == 3
+    assert loaded.search(vectors[3], k=1)[0][0][0] == "c"
+
+    loaded.upsert(["d"], vectors[4:5])
+    assert loaded.search(vectors[4], k=1)[0][0][0] == "d"
+
+    # Saving again replaces the manifest instead of appending to it
+    loaded.save(str(tmpdir))
+    ids, _ = load_embeddings(str(tmpdir))
+    assert sorted(ids) == ["a", "b", "c", "d"]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf"])
+def test_upsert_keeps_the_last_vector_of_repeated_ids(vectors, index_type):
+    index = VectorIndex(index_type=index_type, nlist=2)
+    index.upsert(["a", "a"], vectors[:2])
+    assert len(index) == 1
+    assert index.search(vectors[1], k=1)[0][0] == ("a", pytest.approx(1.0))
+
+    with pytest.raises(ValueError):
+        index.upsert(["b", ["unhashable"]], vectors[2:4])
+    assert len(index) == 1
+
+    index.upsert(["b", "a"], vectors[2:4])
+    assert len(index) == 2
+    assert [index.search(vectors[i], k=1)[0][0][0] for i in (2, 3)] == ["b", "a"]
+
+
+def test_scores_in_chunks_match_full_product(vectors):
+    index = VectorIndex(index_type="flat")
+    half = vectors.astype(np.float16)
+    norms = np.linalg.norm(half.astype(np.float32), axis=1)
+
+    chunked = index._scores(vectors[:3], half, norms, chunk_size=128)
+    full = index._scores(vectors[:3], half, norms, chunk_size=len(half))
+    np.testing.assert_allclose(chunked, full, atol=1e-5)
+
+
+@pytest.mark.parametrize("output_format", ["npy", "f16", "f32", "parquet"])
+def test_save_and_load_embedding_shards(vectors, tmpdir, output_format):
+    save_embeddings(str(tmpdir), list(range(1500)), vectors[:1500], output_format=output_format, shard_size=1000)
+    save_embeddings(str(tmpdir), list(range(1500, 2000)), vectors[1500:], output_format=output_format, prefix="more")
+
+    ids, loaded = load_embeddings(str(tmpdir))
+    assert ids == list(range(2000))
+    assert loaded.shape == vectors.shape
+    np.testing.assert_allclose(loaded, vectors, atol=1e-2 if output_format == "f16" else 1e-6)
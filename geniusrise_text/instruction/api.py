@@ -13,9 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, Iterator, Optional
+from typing import Any, Dict, Iterator, Optional, Union
 
 import cherrypy
 import llama_cpp
@@ -26,6 +26,8 @@ from vllm.entrypoints.openai.protocol import ChatCompletionRequest
 from vllm.entrypoints.openai.serving_chat import OpenAIServingChat
 
 from geniusrise_text.base import TextAPI
+from geniusrise_text.base.event_loop import EventLoopThread
+from geniusrise_text.base.sse import json_or_sse_handler, sse_response
 
 
 class InstructionAPI(TextAPI):
@@ -156,13 +158,15 @@ class InstructionAPI(TextAPI):
         self.log = setup_logger(self)
         self.hf_pipeline = None
         self.vllm_server: Optional[OpenAIServingChat] = None
-        self.event_loop: Any = None
+        self.vllm_loop: Optional[EventLoopThread] = None
+        self._vllm_lock = threading.Lock()
         self.executor = ThreadPoolExecutor(max_workers=4)
 
+    @cherrypy.expose
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_sse_handler)
     @cherrypy.tools.allow(methods=["POST"])
-    def complete(self, **kwargs: Any) -> Dict[str, Any]:
+    def complete(self, **kwargs: Any) -> Union[Dict[str, Any], Iterator[bytes]]:
         """
         Handles POST requests to generate text based on the given prompt and decoding strategy. It uses the pre-trained
         model specified in the setup to generate a completion for the input prompt.
@@ -171,7 +175,9 @@ class InstructionAPI(TextAPI):
             **kwargs (Any): Arbitrary keyword arguments containing the 'prompt' and other parameters for text generation.
 
         Returns:
-            Dict[str, Any]: A dictionary containing the original prompt and the generated completion.
+            Union[Dict[str, Any], Iterator[bytes]]: A dictionary containing the original prompt and the generated
+                completion. With `"stream": true`, server-sent events of `{"completion": ...}` text deltas instead,
+                ending with `data: [DONE]`.
 
         Example CURL Requests:
         ```bash
@@ -198,6 +204,14 @@ class InstructionAPI(TextAPI):
         if "prompt" in generation_params:
             del generation_params["prompt"]
 
+        if generation_params.pop("stream", False):
+            return sse_response(
+                {"completion": text}
+                for text in self.generate_stream(
+                    prompt=prompt, decoding_strategy=decoding_strategy, **generation_params
+                )
+            )
+
         return {
             "prompt": prompt,
             "args": data,
@@ -251,16 +265,35 @@ class InstructionAPI(TextAPI):
         return {"user_prompt": user_prompt, "system_prompt": system_prompt, "result": result}
 
     def initialize_vllm(self, chat_template: str, response_role: str = "assistant"):
-        self.vllm_server = OpenAIServingChat(
-            engine=self.model, served_model=self.model_name, response_role=response_role, chat_template=chat_template
-        )
-        self.event_loop = asyncio.new_event_loop()
+        """
+        Starts the event loop thread serving vLLM and creates the OpenAI chat server on it, so that the engine's
+        background loop and every request share one event loop.
+
+        Args:
+            chat_template (str): The chat template of the server.
+            response_role (str): The role of the generated messages. Defaults to "assistant".
+        """
+        with self._vllm_lock:
+            if self.vllm_server is not None:
+                return
+
+            async def create_server() -> OpenAIServingChat:
+                return OpenAIServingChat(
+                    engine=self.model,
+                    served_model=self.model_name,
+                    response_role=response_role,
+                    chat_template=chat_template,
+                )
+
+            self.vllm_loop = EventLoopThread(name="vllm")
+            self.vllm_server = self.vllm_loop.run(create_server())
 
     @cherrypy.expose(["completions"])
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_sse_handler)
     @cherrypy.tools.allow(methods=["POST"])
-    def chat_vllm(self, **kwargs: Any) -> Dict[str, Any]:
+    @cherrypy.config(**{"tools.response_cache.default_temperature": 0.7})
+    def chat_vllm(self, **kwargs: Any) -> Union[Dict[str, Any], Iterator[bytes]]:
         """
         Handles POST requests to generate chat completions using the VLLM (Versatile Language Learning Model) engine.
         This method accepts various parameters for customizing the chat completion request, including message content,
@@ -273,7 +306,7 @@ class InstructionAPI(TextAPI):
             n (int, optional): The number of completions to generate. Defaults to 1.
             max_tokens (int, optional): The maximum number of tokens to generate. Controls the length of the generated response.
             stop (Union[str, List[str]], optional): Sequence(s) where the generation should stop. Can be a single string or a list of strings.
-            stream (bool, optional): Whether to stream the response. Streaming may be useful for long completions.
+            stream (bool, optional): Whether to stream the response as server-sent events. Streaming may be useful for long completions.
             presence_penalty (float, optional): Adjusts the likelihood of tokens based on their presence in the conversation so far. Defaults to 0.0.
             frequency_penalty (float, optional): Adjusts the likelihood of tokens based on their frequency in the conversation so far. Defaults to 0.0.
             logit_bias (Dict[str, float], optional): Adjustments to the logits of specified tokens, identified by token IDs as keys and adjustment values as values.
@@ -293,7 +326,7 @@ class InstructionAPI(TextAPI):
             length_penalty (float, optional): Exponential penalty to the length for beam search. Only relevant if use_beam_search is True.
 
         Returns:
-        Dict[str, Any]: A dictionary with the chat completion response or an error message.
+        Union[Dict[str, Any], Iterator[bytes]]: A dictionary with the chat completion response or an error message.
 
         Example CURL Request:
         ```bash
@@ -334,7 +367,7 @@ class InstructionAPI(TextAPI):
             n=data.get("n", 1),
             max_tokens=data.get("max_tokens"),
             stop=data.get("stop", []),
-            # stream=data.get("stream", False),
+            stream=data.get("stream", False),
             presence_penalty=data.get("presence_penalty", 0.0),
             frequency_penalty=data.get("frequency_penalty", 0.0),
             logit_bias=data.get("logit_bias", {}),
@@ -367,7 +400,15 @@ class InstructionAPI(TextAPI):
                 )
                 return response
 
-            chat_completion = asyncio.run(async_call())
+            async def async_stream():
+                async for event in await async_call():
+                    yield event
+
+            if chat_request.stream:
+                # The OpenAI server streams pre-formatted server-sent events and ends them itself
+                return sse_response(self.vllm_loop.iterate(async_stream()), done=False)  # type: ignore
+
+            chat_completion = self.vllm_loop.run(async_call())  # type: ignore
 
             return chat_completion.model_dump() if chat_completion else {"error": "Failed to generate chat completion"}
         except Exception as e:
@@ -376,9 +417,10 @@ class InstructionAPI(TextAPI):
 
     @cherrypy.expose(["completion"])
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_sse_handler)
     @cherrypy.tools.allow(methods=["POST"])
-    def chat_llama_cpp(self, **kwargs: Any) -> Dict[str, Any]:
+    @cherrypy.config(**{"tools.response_cache.default_temperature": 0.2})
+    def chat_llama_cpp(self, **kwargs: Any) -> Union[Dict[str, Any], Iterator[bytes]]:
         """
         Handles POST requests to generate chat completions using the llama.cpp engine. This method accepts various
         parameters for customizing the chat completion request, including messages, sampling settings, and more.
@@ -394,7 +436,7 @@ class InstructionAPI(TextAPI):
             top_k (int): The top-k sampling parameter, limiting the token selection pool.
             min_p (float): The minimum probability threshold for sampling.
             typical_p (float): The typical-p parameter for locally typical sampling.
-            stream (bool): Flag to stream the results.
+            stream (bool): Flag to stream the results as server-sent events of completion chunks.
             stop (Optional[Union[str, List[str]]]): Tokens or sequences where generation should stop.
             seed (Optional[int]): Seed for random number generation to ensure reproducibility.
             response_format (Optional[Dict]): Specifies the format of the generated response.
@@ -414,7 +456,8 @@ class InstructionAPI(TextAPI):
             top_logprobs (Optional[int]): Number of top log probabilities to include.
 
         Returns:
-            Dict[str, Any]: A dictionary containing the chat completion response or an error message.
+            Union[Dict[str, Any], Iterator[bytes]]: A dictionary containing the chat completion response or an error
+                message, or server-sent events with `"stream": true`.
 
         Example CURL Request:
         ```bash
@@ -457,7 +500,7 @@ class InstructionAPI(TextAPI):
                     top_k=data.get("top_k", 40),
                     min_p=data.get("min_p", 0.05),
                     typical_p=data.get("typical_p", 1.0),
-                    # stream=data.get("stream", False),
+                    stream=data.get("stream", False),
                     stop=data.get("stop", []),
                     seed=data.get("seed"),
                     response_format=data.get("response_format"),
@@ -492,7 +535,7 @@ class InstructionAPI(TextAPI):
                     presence_penalty=data.get("presence_penalty", 0.0),
                     repeat_penalty=data.get("repeat_penalty", 1.1),
                     top_k=data.get("top_k", 40),
-                    # stream=data.get("stream", False),
+                    stream=data.get("stream", False),
                     seed=data.get("seed", None),
                     tfs_z=data.get("tfs_z", 1.0),
                     mirostat_mode=data.get("mirostat_mode", 0),
@@ -510,4 +553,4 @@ class InstructionAPI(TextAPI):
             return {"error": str(e)}
 
         # Return the generated chat completion or stream of completions
-        return response if not isinstance(response, Iterator) else list(response)
+        return response if not isinstance(response, Iterator) else sse_response(response)
@@ -299,6 +299,15 @@ class InstructionBulk(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         decoding_strategy: str = "generate",
+        batch_size: int = 8,
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
+        prefix_cache_mb: int = 0,
+        prefix_cache_min_tokens: int = 32,
+        prefix_cache_prefixes: Optional[List[str]] = None,
+        adapters: Optional[Dict[str, str]] = None,
+        adapter: Optional[str] = None,
+        adapter_column: Optional[str] = None,
         notification_email: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
@@ -320,6 +329,20 @@ class InstructionBulk(TextBulk):
             awq_enabled (bool, optional): Whether to enable AWQ optimization. Defaults to False.
             flash_attention (bool, optional): Whether to use flash attention optimization. Defaults to False.
             decoding_strategy (str, optional): Strategy for decoding the completion. Defaults to "generate".
+            batch_size (int, optional): Number of prompts generated together in one decoding call. Defaults to 8.
+            streaming (bool, optional): Whether to stream the dataset in chunks instead of loading it into memory. Defaults to False.
+            streaming_chunk_size (int, optional): Number of rows per streamed chunk. Defaults to 4096.
+            prefix_cache_mb (int, optional): Memory budget in megabytes for reusing the keys and values of prompt prefixes
+                shared across instructions, 0 disables it. Defaults to 0.
+            prefix_cache_min_tokens (int, optional): Minimum number of leading tokens shared by the prompts of a batch to
+                cache their prefix. Defaults to 32.
+            prefix_cache_prefixes (List[str], optional): Prefixes, e.g. a system prompt or few-shot preamble, cached
+                before generation starts. Defaults to None.
+            adapters (Dict[str, str], optional): Paths of LoRA adapters by name, loaded on top of the model so that they
+                share its weights. Defaults to None.
+            adapter (str, optional): The adapter used for rows without one, None for the base model. Defaults to None.
+            adapter_column (str, optional): Column holding the adapter of every row. Rows are grouped by adapter, so
+                that every adapter is activated once per chunk of rows. Defaults to None.
             **kwargs: Configuration and additional arguments for text generation such as model class, tokenizer class,
                       precision, device map, and other generation-related parameters.
 
@@ -350,6 +373,9 @@ class InstructionBulk(TextBulk):
         self.torchscript = torchscript
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
+        self.batch_size = batch_size
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
         self.notification_email = notification_email
         self.compile = compile
 
@@ -377,30 +403,49 @@ class InstructionBulk(TextBulk):
             compile=self.compile,
             **self.model_args,
         )
+        if adapters:
+            self.load_adapters(adapters)
+        if prefix_cache_mb > 0:
+            self.enable_prefix_cache(
+                max_memory_mb=prefix_cache_mb,
+                min_prefix_tokens=prefix_cache_min_tokens,
+                prefixes=prefix_cache_prefixes,
+            )
 
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        _dataset = self.load_dataset(dataset_path)
-        if _dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
-        dataset = _dataset["instruction"]
-
-        prompts = []
-        completions = []
-
-        for _, prompt in enumerate(dataset):
-            completion = self.generate(
-                prompt=prompt,
-                decoding_strategy=decoding_strategy,
-                **generation_args,
-            )
-            completions.append(completion)
-            prompts.append(prompt)
-
-        self._save_completions(completions, prompts, output_path)
+        # Load dataset, either fully or lazily in chunks of rows
+        columns = ["instruction"] + ([adapter_column] if adapter_column else [])
+        if streaming:
+            chunks = self.stream_dataset(dataset_path, columns=columns, chunk_size=streaming_chunk_size)
+        else:
+            _dataset = self.load_dataset(dataset_path)
+            if _dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([{column: _dataset[column] for column in columns}])
+
+        for chunk in chunks:
+            dataset = chunk["instruction"]
+            row_adapters = [
+                row_adapter if isinstance(row_adapter, str) and row_adapter else adapter
+                for row_adapter in (chunk[adapter_column] if adapter_column else [None] * len(dataset))
+            ]
+
+            completions: List[str] = [""] * len(dataset)
+            for batch_adapter, indices in self.group_by_adapter(row_adapters, batch_size):
+                batch = [dataset[i] for i in indices]
+                with self.using_adapter(batch_adapter):
+                    batch_completions = self.generate_batch(
+                        prompts=batch,
+                        decoding_strategy=decoding_strategy,
+                        **generation_args,
+                    )
+                for i, completion in zip(indices, batch_completions):
+                    completions[i] = completion
+
+            self._save_completions(completions, list(dataset), output_path)
         self.done()
 
     def perform_vllm(
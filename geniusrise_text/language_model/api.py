@@ -13,9 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, Iterator, Optional
+from typing import Any, Dict, Iterator, Optional, Union
 
 import cherrypy
 import llama_cpp
@@ -25,6 +25,8 @@ from vllm.entrypoints.openai.protocol import CompletionRequest
 from vllm.entrypoints.openai.serving_completion import OpenAIServingCompletion
 
 from geniusrise_text.base import TextAPI
+from geniusrise_text.base.event_loop import EventLoopThread
+from geniusrise_text.base.sse import json_or_sse_handler, sse_response
 
 
 class LanguageModelAPI(TextAPI):
@@ -144,14 +146,15 @@ class LanguageModelAPI(TextAPI):
         super().__init__(input=input, output=output, state=state)
         self.log = setup_logger(self)
         self.vllm_server: Optional[OpenAIServingCompletion] = None
-        self.event_loop: Any = None
+        self.vllm_loop: Optional[EventLoopThread] = None
+        self._vllm_lock = threading.Lock()
         self.executor = ThreadPoolExecutor(max_workers=4)
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_sse_handler)
     @cherrypy.tools.allow(methods=["POST"])
-    def complete(self, **kwargs: Any) -> Dict[str, Any]:
+    def complete(self, **kwargs: Any) -> Union[Dict[str, Any], Iterator[bytes]]:
         r"""
         Handles POST requests to generate text based on a given prompt and model-specific parameters. This method
         is exposed as a web endpoint through CherryPy and returns a JSON response containing the original prompt,
@@ -162,7 +165,9 @@ class LanguageModelAPI(TextAPI):
             for the text generation model.
 
         Returns:
-            Dict[str, Any]: A dictionary with the original prompt, generated text, and other model-specific information.
+            Union[Dict[str, Any], Iterator[bytes]]: A dictionary with the original prompt, generated text, and other
+                model-specific information. With `"stream": true`, server-sent events of `{"completion": ...}` text
+                deltas instead, ending with `data: [DONE]`.
 
         Example CURL Request:
         ```bash
@@ -186,6 +191,12 @@ class LanguageModelAPI(TextAPI):
         if "prompt" in data:
             del data["prompt"]
 
+        if data.pop("stream", False):
+            return sse_response(
+                {"completion": text}
+                for text in self.generate_stream(prompt=prompt, decoding_strategy=decoding_strategy, **data)
+            )
+
         return {
             "prompt": prompt,
             "args": data,
@@ -193,14 +204,26 @@ class LanguageModelAPI(TextAPI):
         }
 
     def initialize_vllm(self):
-        self.vllm_server = OpenAIServingCompletion(engine=self.model, served_model=self.model_name)
-        self.event_loop = asyncio.new_event_loop()
+        """
+        Starts the event loop thread serving vLLM and creates the OpenAI completion server on it, so that the engine's
+        background loop and every request share one event loop.
+        """
+        with self._vllm_lock:
+            if self.vllm_server is not None:
+                return
+
+            async def create_server() -> OpenAIServingCompletion:
+                return OpenAIServingCompletion(engine=self.model, served_model=self.model_name)
+
+            self.vllm_loop = EventLoopThread(name="vllm")
+            self.vllm_server = self.vllm_loop.run(create_server())
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_sse_handler)
     @cherrypy.tools.allow(methods=["POST"])
-    def complete_vllm(self, **kwargs: Any) -> Dict[str, Any]:
+    @cherrypy.config(**{"tools.response_cache.default_temperature": 0.7})
+    def complete_vllm(self, **kwargs: Any) -> Union[Dict[str, Any], Iterator[bytes]]:
         """
         Handles POST requests to generate chat completions using the VLLM (Versatile Language Learning Model) engine.
         This method accepts various parameters for customizing the chat completion request, including message content,
@@ -214,7 +237,7 @@ class LanguageModelAPI(TextAPI):
             - n (int, optional): The number of completions to generate. Defaults to 1.
             - max_tokens (int, optional): The maximum number of tokens to generate.
             - stop (Union[str, List[str]], optional): Stop sequence to end generation.
-            - stream (bool, optional): Whether to stream the response. Defaults to False.
+            - stream (bool, optional): Whether to stream the response as server-sent events. Defaults to False.
             - presence_penalty (float, optional): The presence penalty. Defaults to 0.0.
             - frequency_penalty (float, optional): The frequency penalty. Defaults to 0.0.
             - logit_bias (Dict[str, float], optional): Adjustments to the logits of specified tokens.
@@ -222,7 +245,7 @@ class LanguageModelAPI(TextAPI):
             - (Additional model-specific parameters)
 
         Returns:
-        Dict[str, Any]: A dictionary with the chat completion response or an error message.
+        Union[Dict[str, Any], Iterator[bytes]]: A dictionary with the chat completion response or an error message.
 
         Example CURL Request:
         ```bash
@@ -291,7 +314,15 @@ class LanguageModelAPI(TextAPI):
                 response = await self.vllm_server.create_completion(request=chat_request, raw_request=DummyObject())
                 return response
 
-            chat_completion = asyncio.run(async_call())
+            async def async_stream():
+                async for event in await async_call():
+                    yield event
+
+            if chat_request.stream:
+                # The OpenAI server streams pre-formatted server-sent events and ends them itself
+                return sse_response(self.vllm_loop.iterate(async_stream()), done=False)  # type: ignore
+
+            chat_completion = self.vllm_loop.run(async_call())  # type: ignore
 
             return chat_completion.model_dump() if chat_completion else {"error": "Failed to generate lm completion"}
         except Exception as e:
@@ -300,9 +331,10 @@ class LanguageModelAPI(TextAPI):
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
-    @cherrypy.tools.json_out()
+    @cherrypy.tools.json_out(handler=json_or_sse_handler)
     @cherrypy.tools.allow(methods=["POST"])
-    def complete_llama_cpp(self, **kwargs: Any) -> Dict[str, Any]:
+    @cherrypy.config(**{"tools.response_cache.default_temperature": 0.8})
+    def complete_llama_cpp(self, **kwargs: Any) -> Union[Dict[str, Any], Iterator[bytes]]:
         """
         Handles POST requests to generate chat completions using the llama.cpp engine. This method accepts various
         parameters for customizing the chat completion request, including messages, sampling settings, and more.
@@ -322,7 +354,7 @@ class LanguageModelAPI(TextAPI):
             presence_penalty: The penalty to apply to tokens based on their presence in the prompt.
             repeat_penalty: The penalty to apply to repeated tokens.
             top_k: The top-k value to use for sampling. Top-K sampling described in academic paper "The Curious Case of Neural Text Degeneration" https://arxiv.org/abs/1904.09751
-            stream: Whether to stream the results.
+            stream: Whether to stream the results as server-sent events of completion chunks.
             seed: The seed to use for sampling.
             tfs_z: The tail-free sampling parameter. Tail Free Sampling described in https://www.trentonbricken.com/Tail-Free-Sampling/.
             mirostat_mode: The mirostat sampling mode.
@@ -335,7 +367,8 @@ class LanguageModelAPI(TextAPI):
             logit_bias: A logit bias to use.
 
         Returns:
-            Dict[str, Any]: A dictionary containing the chat completion response or an error message.
+            Union[Dict[str, Any], Iterator[bytes]]: A dictionary containing the chat completion response or an error
+                message, or server-sent events with `"stream": true`.
 
         Example CURL Request:
         ```bash
@@ -377,7 +410,7 @@ class LanguageModelAPI(TextAPI):
                 presence_penalty=data.get("presence_penalty", 0.0),
                 repeat_penalty=data.get("repeat_penalty", 1.1),
                 top_k=data.get("top_k", 40),
-                # stream=data.get("stream", False),
+                stream=data.get("stream", False),
                 seed=data.get("seed", None),
                 tfs_z=data.get("tfs_z", 1.0),
                 mirostat_mode=data.get("mirostat_mode", 0),
@@ -394,4 +427,4 @@ class LanguageModelAPI(TextAPI):
             return {"error": str(e)}
 
         # Return the generated chat completion or stream of completions
-        return response if not isinstance(response, Iterator) else list(response)
+        return response if not isinstance(response, Iterator) else sse_response(response)
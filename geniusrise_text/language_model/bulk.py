@@ -305,6 +305,12 @@ class LanguageModelBulk(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         decoding_strategy: str = "generate",
+        batch_size: int = 8,
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
+        adapters: Optional[Dict[str, str]] = None,
+        adapter: Optional[str] = None,
+        adapter_column: Optional[str] = None,
         notification_email: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
@@ -326,6 +332,14 @@ class LanguageModelBulk(TextBulk):
             awq_enabled (bool, optional): Whether to enable AWQ optimization. Defaults to False.
             flash_attention (bool, optional): Whether to use flash attention optimization. Defaults to False.
             decoding_strategy (str, optional): Strategy for decoding the completion. Defaults to "generate".
+            batch_size (int, optional): Number of prompts generated together in one decoding call. Defaults to 8.
+            streaming (bool, optional): Whether to stream the dataset in chunks instead of loading it into memory. Defaults to False.
+            streaming_chunk_size (int, optional): Number of rows per streamed chunk. Defaults to 4096.
+            adapters (Dict[str, str], optional): Paths of LoRA adapters by name, loaded on top of the model so that they
+                share its weights. Defaults to None.
+            adapter (str, optional): The adapter used for rows without one, None for the base model. Defaults to None.
+            adapter_column (str, optional): Column holding the adapter of every row. Rows are grouped by adapter, so
+                that every adapter is activated once per chunk of rows. Defaults to None.
             **kwargs: Additional keyword arguments for text generation.
         """
         if ":" in model_name:
@@ -352,6 +366,9 @@ class LanguageModelBulk(TextBulk):
         self.torchscript = torchscript
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
+        self.batch_size = batch_size
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
         self.notification_email = notification_email
         self.compile = compile
 
@@ -379,29 +396,43 @@ class LanguageModelBulk(TextBulk):
             compile=self.compile,
             **self.model_args,
         )
+        if adapters:
+            self.load_adapters(adapters)
 
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        _dataset = self.load_dataset(dataset_path)
-        if _dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
-        dataset = _dataset["text"]
-
-        prompts = []
-        completions = []
-        for _, prompt in enumerate(dataset):
-            completion = self.generate(
-                prompt=prompt,
-                decoding_strategy=decoding_strategy,
-                **generation_args,
-            )
-            completions.append(completion)
-            prompts.append(prompt)
-
-        self._save_completions(completions, prompts, output_path)
+        # Load dataset, either fully or lazily in chunks of rows
+        columns = ["text"] + ([adapter_column] if adapter_column else [])
+        if streaming:
+            chunks = self.stream_dataset(dataset_path, columns=columns, chunk_size=streaming_chunk_size)
+        else:
+            _dataset = self.load_dataset(dataset_path)
+            if _dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([{column: _dataset[column] for column in columns}])
+
+        for chunk in chunks:
+            dataset = chunk["text"]
+            row_adapters = [
+                row_adapter if isinstance(row_adapter, str) and row_adapter else adapter
+                for row_adapter in (chunk[adapter_column] if adapter_column else [None] * len(dataset))
+            ]
+
+            completions: List[str] = [""] * len(dataset)
+            for batch_adapter, indices in self.group_by_adapter(row_adapters, batch_size):
+                batch = [dataset[i] for i in indices]
+                with self.using_adapter(batch_adapter):
+                    batch_completions = self.generate_batch(
+                        prompts=batch,
+                        decoding_strategy=decoding_strategy,
+                        **generation_args,
+                    )
+                for i, completion in zip(indices, batch_completions):
+                    completions[i] = completion
+
+            self._save_completions(completions, list(dataset), output_path)
         self.done()
 
     def complete_vllm(
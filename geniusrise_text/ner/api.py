@@ -13,15 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, Dict
+from functools import partial
+from typing import Any, Dict, List
 
 import cherrypy
-import torch
 from geniusrise import BatchInput, BatchOutput, State
 from geniusrise.logging import setup_logger
 from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
 
 from geniusrise_text.base import TextAPI
+from geniusrise_text.ner.spans import AGGREGATION_STRATEGIES, decode_windows, predict_entities
 
 
 class NamedEntityRecognitionAPI(TextAPI):
@@ -97,6 +98,12 @@ class NamedEntityRecognitionAPI(TextAPI):
             Dict[str, Any]: A dictionary containing the original input text and a list of recognized entities
                             with their respective types.
 
+        Entities are returned in the schema of the Hugging Face "ner" pipeline, with their character offsets in the
+        text. `aggregation_strategy` is "simple" (default) to merge the tokens of an entity into one span with their
+        average score, or "none" for one entry per token. Texts longer than the model's maximum length are truncated
+        unless `long_document` is true, in which case they are read as overlapping windows sharing `window_stride`
+        tokens (default 64) and the entities of the windows are merged.
+
         Example CURL Requests:
         ```bash
         curl -X POST localhost:3000/api/v1/recognize_entities \
@@ -116,22 +123,66 @@ class NamedEntityRecognitionAPI(TextAPI):
 
         if "text" in generation_args:
             del generation_args["text"]
+        aggregation_strategy = generation_args.pop("aggregation_strategy", "simple")
+        if aggregation_strategy not in AGGREGATION_STRATEGIES:
+            raise cherrypy.HTTPError(400, f"aggregation_strategy must be one of {', '.join(AGGREGATION_STRATEGIES)}")
+        long_document = bool(generation_args.pop("long_document", False))
+        stride = generation_args.pop("window_stride", 64)
+
+        if long_document:
+            stride = self.window_stride(stride)
+            recognize = partial(
+                self._recognize_long_entities_batch, aggregation_strategy=aggregation_strategy, stride=stride
+            )
+            if generation_args:
+                entities = recognize([text], **generation_args)[0]
+            else:
+                entities = self.batched(f"recognize_entities:long:{aggregation_strategy}:{stride}", text, recognize)
+        elif generation_args:
+            # Requests with extra model arguments cannot share a forward pass with other requests
+            entities = self._recognize_entities_batch([text], aggregation_strategy, **generation_args)[0]
+        else:
+            entities = self.batched(
+                f"recognize_entities:{aggregation_strategy}",
+                text,
+                partial(self._recognize_entities_batch, aggregation_strategy=aggregation_strategy),
+            )
 
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True)
+        return {"input": text, "entities": entities}
 
-        if next(self.model.parameters()).is_cuda:
-            inputs = {k: v.cuda() for k, v in inputs.items()}
+    def _recognize_entities_batch(
+        self, texts: List[str], aggregation_strategy: str = "simple", **generation_args: Any
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Recognizes entities in a batch of texts in a single padded forward pass, see `predict_entities`.
 
-        with torch.no_grad():
-            outputs = self.model(**inputs, **generation_args)
-            predictions = outputs.logits.argmax(dim=-1).squeeze().tolist()
+        Args:
+            texts (List[str]): The input texts.
+            aggregation_strategy (str): "simple" to merge tokens into entity spans, "none" for one entity per token.
+            **generation_args (Any): Additional arguments passed to the model's forward pass.
 
-        entities = [
-            {"token": self.tokenizer.convert_ids_to_tokens(i), "class": self.model.config.id2label[x]}
-            for (x, i) in zip(predictions, inputs["input_ids"].squeeze().tolist())
-        ]
+        Returns:
+            List[List[Dict[str, Any]]]: For each text, its entities with their character offsets, padding excluded.
+        """
+        return predict_entities(self.model, self.tokenizer, texts, aggregation_strategy, **generation_args)
 
-        return {"input": text, "entities": entities}
+    def _recognize_long_entities_batch(
+        self, texts: List[str], aggregation_strategy: str = "simple", stride: int = 64, **generation_args: Any
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Recognizes entities in a batch of texts of any length, see `TextBulk.chunk_documents` and `decode_windows`.
+
+        Args:
+            texts (List[str]): The input texts.
+            aggregation_strategy (str): "simple" to merge tokens into entity spans, "none" for one entity per token.
+            stride (int): Number of tokens shared by consecutive windows of a text.
+            **generation_args (Any): Additional arguments passed to the model's forward pass.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each text, its entities with their character offsets.
+        """
+        logits, windows = self.chunk_documents(texts, stride=stride, **generation_args)
+        return decode_windows(logits, windows, texts, self.model.config.id2label, aggregation_strategy)
 
     def initialize_pipeline(self):
         """
@@ -19,7 +19,7 @@ import os
 import sqlite3
 import uuid
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 import pandas as pd
 import yaml  # type: ignore
@@ -29,6 +29,7 @@ from pyarrow import feather
 from pyarrow import parquet as pq
 
 from geniusrise_text.base import TextBulk
+from geniusrise_text.ner.spans import AGGREGATION_STRATEGIES, decode_windows, predict_entities
 
 
 class NamedEntityRecognitionBulk(TextBulk):
@@ -214,6 +215,13 @@ class NamedEntityRecognitionBulk(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         batch_size: int = 32,
+        sort_by_length: bool = False,
+        max_tokens_per_batch: Optional[int] = None,
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
+        aggregation_strategy: str = "simple",
+        long_documents: bool = False,
+        window_stride: int = 64,
         notification_email: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
@@ -236,6 +244,16 @@ class NamedEntityRecognitionBulk(TextBulk):
             awq_enabled (bool): Whether to enable AWQ optimization, defaults to False.
             flash_attention (bool): Whether to use flash attention optimization, defaults to False.
             batch_size (int): Number of documents to process simultaneously, defaults to 32.
+            sort_by_length (bool): Whether to batch rows of similar token length together to minimize padding, defaults to False.
+            max_tokens_per_batch (Optional[int]): Budget of padded tokens per batch, used instead of batch_size if set, defaults to None.
+            streaming (bool): Whether to stream the dataset in chunks instead of loading it into memory, defaults to False.
+            streaming_chunk_size (int): Number of rows per streamed chunk, defaults to 4096.
+            aggregation_strategy (str): "simple" to merge the tokens of an entity into one span with character offsets,
+                "none" for one entry per token, defaults to "simple". Requires a fast tokenizer.
+            long_documents (bool): Whether to split texts longer than max_length into overlapping windows instead of
+                truncating them, windows of many texts being batched together and their entities merged, defaults to
+                False.
+            window_stride (int): Number of tokens shared by consecutive windows of a text, defaults to 64.
             **kwargs: Arbitrary keyword arguments for additional configuration.
 
         Returns:
@@ -266,9 +284,20 @@ class NamedEntityRecognitionBulk(TextBulk):
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
         self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
+        self.aggregation_strategy = aggregation_strategy
+        self.max_length = max_length
+        self.long_documents = long_documents
+        self.window_stride = window_stride
         self.notification_email = notification_email
         self.compile = compile
 
+        if aggregation_strategy not in AGGREGATION_STRATEGIES:
+            raise ValueError(f"Unsupported aggregation strategy. Choose from {', '.join(AGGREGATION_STRATEGIES)}.")
+
         model_args = {k.replace("model_", ""): v for k, v in kwargs.items() if "model_" in k}
         self.model_args = model_args
 
@@ -297,38 +326,73 @@ class NamedEntityRecognitionBulk(TextBulk):
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        dataset = self.load_dataset(dataset_path)
-        if dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
-        if dataset:
-            dataset = dataset["text"]
+        # Load dataset, either fully or lazily in chunks of rows
+        chunks: Iterator[List[Any]]
+        if streaming:
+            chunks = (
+                chunk["text"]
+                for chunk in self.stream_dataset(dataset_path, columns=["text"], chunk_size=streaming_chunk_size)
+            )
+        else:
+            _dataset = self.load_dataset(dataset_path)
+            if _dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([_dataset["text"]])
+
+        offset = 0
+        for dataset in chunks:
+            self._recognize_entities_chunk(dataset, output_path, offset)
+            offset += len(dataset)
+        self.done()
 
-        # Process data in batches
-        for i in range(0, len(dataset), batch_size):
-            batch = dataset[i : i + batch_size]
-            inputs = self.tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
+    def _recognize_entities_chunk(self, dataset: List[str], output_path: str, offset: int = 0) -> None:
+        """
+        Recognizes entities in a chunk of the dataset in batches and saves the predictions in the original order.
 
-            if next(self.model.parameters()).is_cuda:
-                inputs = {k: v.cuda() for k, v in inputs.items()}
+        Args:
+            dataset (List[str]): The texts of the chunk.
+            output_path (str): The path to save the prediction results.
+            offset (int): The index of the first row of the chunk in the whole dataset, used for naming the output files.
 
-            predictions = self.model(**inputs, **generation_args)
-            predictions = predictions[0] if isinstance(predictions, tuple) else predictions.logits
-            predictions = predictions.argmax(dim=-1).squeeze().tolist()
+        Returns:
+            None: The method saves the predictions to files and does not return any value.
+        """
 
-            self._save_predictions(inputs["input_ids"].tolist(), predictions, batch, output_path, i)
-        self.done()
+        def predict(indices: List[int]) -> List[List[Dict[str, Any]]]:
+            batch = [dataset[j] for j in indices]
+            if self.long_documents:
+                logits, windows = self.chunk_documents(
+                    batch,
+                    max_length=self.max_length,
+                    stride=self.window_stride,
+                    batch_size=self.batch_size,
+                    **self.generation_args,
+                )
+                return decode_windows(logits, windows, batch, self.model.config.id2label, self.aggregation_strategy)
+
+            return predict_entities(
+                self.model, self.tokenizer, batch, self.aggregation_strategy, **self.generation_args
+            )
+
+        # Process data in batches, optionally bucketed by length, and save them in the original order
+        batches = self.batch_indices(
+            dataset,
+            batch_size=self.batch_size,
+            sort_by_length=self.sort_by_length,
+            max_tokens_per_batch=self.max_tokens_per_batch,
+        )
+        for i, results in self.ordered_results(batches, predict, chunk_size=self.batch_size):
+            self._save_predictions(results, dataset[i : i + len(results)], output_path, offset + i)
 
     def _save_predictions(
-        self, inputs: list, predictions: list, input_batch: List[str], output_path: str, batch_idx: int
+        self, entities: List[List[Dict[str, Any]]], input_batch: List[str], output_path: str, batch_idx: int
     ) -> None:
         """
         Saves the NER predictions to the specified output path.
 
         Args:
-            inputs (list): List of input tokens.
-            predictions (list): List of prediction tensors from the NER model.
+            entities (List[List[Dict[str, Any]]]): The entities of every text, see `predict_entities`.
             input_batch (List[str]): The input text batch.
             output_path (str): The path to save the prediction results.
             batch_idx (int): The index of the current batch, used for naming the output files.
@@ -336,23 +400,7 @@ class NamedEntityRecognitionBulk(TextBulk):
         Returns:
             None: The method saves the predictions to files and does not return any value.
         """
-        # Convert tensor of label ids to list of label strings
-        label_predictions = [
-            [
-                {
-                    "label": self.model.config.id2label[label_id],
-                    "position": i,
-                    "token": self.tokenizer.convert_ids_to_tokens(inp[i]),
-                }
-                for i, label_id in enumerate(pred)
-            ]
-            for pred, inp in zip(predictions, inputs)
-        ]
-
-        # Prepare data for saving
-        data_to_save = [
-            {"input": input_text, "labels": label} for input_text, label in zip(input_batch, label_predictions)
-        ]
+        data_to_save = [{"input": input_text, "entities": e} for input_text, e in zip(input_batch, entities)]
         with open(os.path.join(output_path, f"predictions-{batch_idx}-{str(uuid.uuid4())}.jsonl"), "w") as f:
             for item in data_to_save:
                 f.write(json.dumps(item) + "\n")
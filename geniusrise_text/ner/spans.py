@@ -0,0 +1,230 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+
+from geniusrise_text.base.chunking import stitch_windows
+
+AGGREGATION_STRATEGIES = ("simple", "none")
+
+# Tagging scheme prefixes, L/E and U/S being the BILOU and BIOES names of the same tags
+_BEGIN, _INSIDE, _LAST, _UNIT = 0, 1, 2, 3
+_PREFIXES = {"B": _BEGIN, "I": _INSIDE, "L": _LAST, "E": _LAST, "U": _UNIT, "S": _UNIT}
+
+
+def parse_labels(id2label: Dict[Any, str]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Splits the labels of a token classification model into their tagging prefix and entity type.
+
+    Labels without a known prefix, e.g. "PER", are treated as inside tags of their own type, and "O" has no type.
+
+    Args:
+        id2label (Dict[Any, str]): The labels by id, as in the model config.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, List[str]]: The prefix and type index of every label id, -1 for "O", and the
+            names of the types.
+    """
+    num_labels = max(int(i) for i in id2label) + 1
+    prefixes = np.full(num_labels, _INSIDE, dtype=np.int64)
+    types = np.full(num_labels, -1, dtype=np.int64)
+    names: List[str] = []
+
+    for i, label in id2label.items():
+        if label.upper() == "O":
+            continue
+        prefix, separator, name = label.partition("-")
+        if not separator or prefix.upper() not in _PREFIXES:
+            prefix, name = "I", label
+        if name not in names:
+            names.append(name)
+        prefixes[int(i)] = _PREFIXES[prefix.upper()]
+        types[int(i)] = names.index(name)
+    return prefixes, types, names
+
+
+def decode_entities(
+    logits: np.ndarray,
+    offsets: np.ndarray,
+    mask: np.ndarray,
+    texts: List[str],
+    id2label: Dict[Any, str],
+    aggregation_strategy: str = "simple",
+) -> List[List[Dict[str, Any]]]:
+    """
+    Decodes the token classification logits of a batch into entities with character offsets.
+
+    Special and padding tokens, which have empty offsets or are masked out, are dropped. With the "simple" strategy,
+    consecutive tokens of an entity are merged into one span following the BIO or BILOU tags: a span starts at a B or U
+    tag, at a change of entity type or after an L or U tag, except that a sub-word token directly following a token of
+    the same type always continues its word. The score of a span is the average probability of its tokens. All of this
+    is computed over the whole batch at once, only the output dictionaries are built per entity.
+
+    Args:
+        logits (np.ndarray): Logits of shape (texts, tokens, labels).
+        offsets (np.ndarray): Character offsets of every token in its text, of shape (texts, tokens, 2).
+        mask (np.ndarray): Attention mask of shape (texts, tokens).
+        texts (List[str]): The texts.
+        id2label (Dict[Any, str]): The labels by id, as in the model config.
+        aggregation_strategy (str): "simple" to merge tokens into entity spans, "none" for one entity per token.
+
+    Returns:
+        List[List[Dict[str, Any]]]: For each text, its entities in the schema of the Hugging Face "ner" pipeline:
+            `entity_group`, `score`, `word`, `start` and `end` with "simple", `entity`, `score`, `index`, `word`,
+            `start` and `end` with "none". The word is the text of the span.
+    """
+    if aggregation_strategy not in AGGREGATION_STRATEGIES:
+        raise ValueError(f"Unsupported aggregation strategy. Choose from {', '.join(AGGREGATION_STRATEGIES)}.")
+
+    prefixes, types, names = parse_labels(id2label)
+    logits = logits.astype(np.float32)
+    probabilities = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    probabilities /= probabilities.sum(axis=-1, keepdims=True)
+    labels = probabilities.argmax(axis=-1)
+    scores = np.take_along_axis(probabilities, labels[..., None], axis=-1)[..., 0]
+
+    offsets = offsets.astype(np.int64)
+    valid = mask.astype(bool) & (offsets[..., 1] > offsets[..., 0])
+    token_types = np.where(valid, types[labels], -1)
+    inside = token_types >= 0
+    results: List[List[Dict[str, Any]]] = [[] for _ in texts]
+
+    if aggregation_strategy == "none":
+        for row, index in zip(*np.nonzero(inside)):
+            start, end = offsets[row, index]
+            results[row].append(
+                {
+                    "entity": id2label[labels[row, index].item()],
+                    "score": float(scores[row, index]),
+                    "index": int(index),
+                    "word": texts[row][start:end],
+                    "start": int(start),
+                    "end": int(end),
+                }
+            )
+        return results
+
+    # Compare every token with the previous token of its text
+    token_prefixes = prefixes[labels]
+    previous_types = np.pad(token_types[:, :-1], ((0, 0), (1, 0)), constant_values=-1)
+    previous_prefixes = np.pad(token_prefixes[:, :-1], ((0, 0), (1, 0)), constant_values=_UNIT)
+    previous_ends = np.pad(offsets[:, :-1, 1], ((0, 0), (1, 0)), constant_values=-1)
+
+    same_type = previous_types == token_types
+    subword = same_type & (offsets[..., 0] == previous_ends)
+    boundary = np.isin(token_prefixes, (_BEGIN, _UNIT)) | np.isin(previous_prefixes, (_LAST, _UNIT))
+    starts = inside & ~subword & (~same_type | boundary)
+
+    members = np.flatnonzero(inside.ravel())
+    if len(members) == 0:
+        return results
+    entity_of = np.cumsum(starts.ravel())[members] - 1
+    firsts = np.flatnonzero(starts.ravel())
+    lasts = members[np.append(np.flatnonzero(np.diff(entity_of)), len(members) - 1)]
+    entity_scores = np.bincount(entity_of, weights=scores.ravel()[members]) / np.bincount(entity_of)
+
+    num_tokens = logits.shape[1]
+    flat_offsets = offsets.reshape(-1, 2)
+    for first, last, score in zip(firsts, lasts, entity_scores):
+        row = first // num_tokens
+        start, end = flat_offsets[first, 0], flat_offsets[last, 1]
+        results[row].append(
+            {
+                "entity_group": names[token_types.ravel()[first]],
+                "score": float(score),
+                "word": texts[row][start:end],
+                "start": int(start),
+                "end": int(end),
+            }
+        )
+    return results
+
+
+def predict_entities(
+    model: Any,
+    tokenizer: Any,
+    texts: List[str],
+    aggregation_strategy: str = "simple",
+    **model_args: Any,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Recognizes the entities of a batch of texts in a single padded forward pass, see `decode_entities`.
+
+    Args:
+        model (Any): A token classification model, e.g. `AutoModelForTokenClassification`.
+        tokenizer (Any): Its tokenizer, which has to be a fast tokenizer to map tokens back to the texts.
+        texts (List[str]): The texts.
+        aggregation_strategy (str): "simple" to merge tokens into entity spans, "none" for one entity per token.
+        **model_args (Any): Additional arguments passed to the model's forward pass.
+
+    Returns:
+        List[List[Dict[str, Any]]]: For each text, its entities.
+
+    Raises:
+        ValueError: If the tokenizer is not a fast tokenizer.
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError("Entity offsets require a fast tokenizer")
+    if not texts:
+        return []
+
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, return_offsets_mapping=True)
+    offsets = inputs.pop("offset_mapping").numpy()
+    mask = inputs["attention_mask"].numpy()
+
+    device = next(model.parameters()).device
+    with torch.no_grad():
+        outputs = model(**{k: v.to(device) for k, v in inputs.items()}, **model_args)
+    logits = outputs[0] if isinstance(outputs, tuple) else outputs.logits
+
+    return decode_entities(
+        logits.float().cpu().numpy(), offsets, mask, texts, model.config.id2label, aggregation_strategy
+    )
+
+
+def decode_windows(
+    logits: np.ndarray,
+    windows: Any,
+    texts: List[str],
+    id2label: Dict[Any, str],
+    aggregation_strategy: str = "simple",
+) -> List[List[Dict[str, Any]]]:
+    """
+    Decodes the entities of texts split into overlapping windows, see `TextBulk.chunk_documents`.
+
+    The windows of every text are stitched back into one token sequence before decoding, every token of an overlap
+    being read from the window where it has the most context, so that entities in overlaps are found once.
+
+    Args:
+        logits (np.ndarray): Logits of shape (windows, tokens, labels).
+        windows (Any): The windows, with their `offset_mapping`, `attention_mask` and `overflow_to_sample_mapping`.
+        texts (List[str]): The texts.
+        id2label (Dict[Any, str]): The labels by id, as in the model config.
+        aggregation_strategy (str): "simple" to merge tokens into entity spans, "none" for one entity per token.
+
+    Returns:
+        List[List[Dict[str, Any]]]: For each text, its entities, see `decode_entities`.
+    """
+    logits, offsets, mask = stitch_windows(
+        logits,
+        np.asarray(windows["offset_mapping"]),
+        np.asarray(windows["attention_mask"]),
+        np.asarray(windows["overflow_to_sample_mapping"]),
+        len(texts),
+    )
+    return decode_entities(logits, offsets, mask, texts, id2label, aggregation_strategy)
@@ -0,0 +1,83 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
+
+from geniusrise_text.ner.spans import decode_entities, predict_entities
+
+ID2LABEL = {0: "O", 1: "B-PER", 2: "I-PER", 3: "B-LOC", 4: "I-LOC"}
+TEXTS = ["John Smithson lives in New York", "Paris"]
+
+# [CLS] John Smith ##son lives in New York [SEP], and [CLS] Paris [SEP] followed by padding
+OFFSETS = np.array(
+    [
+        [(0, 0), (0, 4), (5, 10), (10, 13), (14, 19), (20, 22), (23, 26), (27, 31), (0, 0)],
+        [(0, 0), (0, 5), (0, 0), (0, 0), (0, 0), (0, 0), (0, 0), (0, 0), (0, 0)],
+    ]
+)
+MASK = np.array([[1] * 9, [1, 1, 1, 0, 0, 0, 0, 0, 0]])
+
+
+def one_hot_logits(labels):
+    logits = np.full(labels.shape + (len(ID2LABEL),), -5.0)
+    np.put_along_axis(logits, labels[..., None], 5.0, axis=-1)
+    return logits
+
+
+def test_decode_entities_merges_bio_spans_and_drops_padding():
+    # "##son" is tagged B-PER but continues its word, padding is tagged B-LOC but masked out
+    labels = np.array([[0, 1, 2, 1, 0, 0, 3, 4, 0], [0, 3, 0, 3, 3, 3, 3, 3, 3]])
+    entities = decode_entities(one_hot_logits(labels), OFFSETS, MASK, TEXTS, ID2LABEL)
+
+    assert [(e["entity_group"], e["word"], e["start"], e["end"]) for e in entities[0]] == [
+        ("PER", "John Smithson", 0, 13),
+        ("LOC", "New York", 23, 31),
+    ]
+    assert [e["word"] for e in entities[1]] == ["Paris"]
+
+    tokens = decode_entities(one_hot_logits(labels), OFFSETS, MASK, TEXTS, ID2LABEL, aggregation_strategy="none")
+    assert [(e["entity"], e["index"], e["word"]) for e in tokens[1]] == [("B-LOC", 1, "Paris")]
+    assert len(tokens[0]) == 5
+
+
+def test_decode_entities_bilou():
+    id2label = {0: "O", 1: "U-PER", 2: "B-PER", 3: "L-PER"}
+    offsets = np.array([[(0, 3), (4, 7)]])
+    mask = np.ones((1, 2))
+
+    units = np.full((1, 2, 4), -5.0)
+    units[0, :, 1] = 5.0
+    assert [e["word"] for e in decode_entities(units, offsets, mask, ["Ann Bob"], id2label)[0]] == ["Ann", "Bob"]
+
+    span = np.full((1, 2, 4), -5.0)
+    span[0, 0, 2], span[0, 1, 3] = 5.0, 5.0
+    assert [e["word"] for e in decode_entities(span, offsets, mask, ["Ann Bob"], id2label)[0]] == ["Ann Bob"]
+
+
+@pytest.mark.parametrize("model_name", ["dslim/bert-base-NER"])
+def test_predict_entities_matches_pipeline(model_name):
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForTokenClassification.from_pretrained(model_name).eval()
+    texts = ["John Doe works at OpenAI in San Francisco.", "Alice visited the Eiffel Tower in Paris."]
+
+    entities = predict_entities(model, tokenizer, texts)
+    expected = pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")(texts)
+
+    for found, reference in zip(entities, expected):
+        assert [(e["entity_group"], e["start"], e["end"]) for e in found] == [
+            (e["entity_group"], e["start"], e["end"]) for e in reference
+        ]
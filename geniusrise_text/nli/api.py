@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 import cherrypy
 import numpy as np
@@ -23,6 +23,9 @@ from geniusrise.logging import setup_logger
 from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
 
 from geniusrise_text.base import TextAPI
+from geniusrise_text.base.registry import ServingAttribute
+from geniusrise_text.nli.hierarchy import detect_intent_hierarchical
+from geniusrise_text.nli.hypotheses import HypothesisCache
 
 
 class NLIAPI(TextAPI):
@@ -70,6 +73,8 @@ class NLIAPI(TextAPI):
 
     model: Any
     tokenizer: Any
+    # Every model of the registry keeps its own hypotheses, tokenized with its tokenizer
+    hypothesis_cache: Any = ServingAttribute()
 
     def __init__(
         self,
@@ -90,6 +95,26 @@ class NLIAPI(TextAPI):
         super().__init__(input=input, output=output, state=state)
         self.log = setup_logger(self)
         self.hf_pipeline = None
+        self.hypothesis_cache = None
+
+    def load_models(self, *args: Any, **kwargs: Any) -> Tuple[Any, Any]:
+        """
+        Loads the model and tokenizer, then tokenizes the hypotheses of the bundled intent taxonomies once so that
+        requests naming a taxonomy skip hypothesis tokenization entirely.
+
+        Args:
+            *args (Any): Positional arguments passed to `TextBulk.load_models`.
+            **kwargs (Any): Keyword arguments passed to `TextBulk.load_models`.
+
+        Returns:
+            Tuple[Any, Any]: The loaded model and tokenizer.
+        """
+        model, tokenizer = super().load_models(*args, **kwargs)
+        # Models of the registry are loaded outside of their requests, their cache is created on first use
+        if self.models is None:
+            self.hypothesis_cache = HypothesisCache(tokenizer)
+            self.log.info(f"Loaded hypothesis banks for {len(self.hypothesis_cache.taxonomies)} intent taxonomies.")
+        return model, tokenizer
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
@@ -121,10 +146,31 @@ class NLIAPI(TextAPI):
         premise = data.get("premise", "")
         hypothesis = data.get("hypothesis", "The statement is true")
 
+        label_scores = self.batched("entailment", (premise, hypothesis), self._entailment_batch)
+
+        return {
+            "premise": premise,
+            "hypothesis": hypothesis,
+            "label_scores": label_scores,
+        }
+
+    def _entailment_batch(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, float]]:
+        """
+        Scores a batch of premise/hypothesis pairs in a single padded forward pass.
+
+        Args:
+            pairs (List[Tuple[str, str]]): The (premise, hypothesis) pairs.
+
+        Returns:
+            List[Dict[str, float]]: For each pair, the scores of every NLI label.
+        """
+        premises = [premise for premise, _ in pairs]
+        hypotheses = [hypothesis for _, hypothesis in pairs]
+
         inputs = self.tokenizer(
-            premise,
-            hypothesis,
-            padding="max_length",
+            premises,
+            hypotheses,
+            padding=True,
             truncation=True,
             return_tensors="pt",
         )
@@ -141,13 +187,7 @@ class NLIAPI(TextAPI):
             scores = softmax.numpy().tolist()  # Convert scores to list
 
         id_to_label = dict(enumerate(self.model.config.id2label.values()))  # type: ignore
-        label_scores = {id_to_label[label_id]: score for label_id, score in enumerate(scores[0])}
-
-        return {
-            "premise": premise,
-            "hypothesis": hypothesis,
-            "label_scores": label_scores,
-        }
+        return [{id_to_label[label_id]: score for label_id, score in enumerate(row)} for row in scores]
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
@@ -177,31 +217,10 @@ class NLIAPI(TextAPI):
         text = data.get("text", "")
         candidate_labels = data.get("candidate_labels", [])
 
-        label_scores = {}
-        for label in candidate_labels:
-            # Construct hypothesis for each label
-            hypothesis = f"This example is {label}."
-
-            # Tokenize the text and hypothesis
-            inputs = self.tokenizer(text, hypothesis, return_tensors="pt", padding=True, truncation=True)
-
-            # Move inputs to GPU if CUDA is enabled
-            if self.use_cuda:
-                inputs = {k: v.cuda() for k, v in inputs.items()}
-
-            # Perform inference
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                logits = outputs.logits
-                softmax = torch.nn.functional.softmax(logits, dim=-1)
-                scores = softmax.cpu().numpy().tolist()
-
-            # Consider 'entailment' score as the label score
-            entailment_idx = self.model.config.label2id.get("entailment", 0)
-            contradiction_idx = self.model.config.label2id.get("contradiction", 0)
-            label_scores[label] = np.exp(scores[0][entailment_idx]) / np.exp(
-                scores[0][entailment_idx] + scores[0][contradiction_idx]
-            )
+        # Score all candidate labels against the text in one batched pass
+        hypotheses = [f"This example is {label}." for label in candidate_labels]
+        hypothesis_scores = self._get_entailment_scores(text, hypotheses)
+        label_scores = {label: hypothesis_scores[h] for label, h in zip(candidate_labels, hypotheses)}
 
         sum_scores = sum(label_scores.values())
         label_scores = {k: v / sum_scores for k, v in label_scores.items()}
@@ -319,6 +338,7 @@ class NLIAPI(TextAPI):
         Args:
             text (str): The input text.
             intents (List[str]): A list of possible intents.
+            taxonomy (str, optional): Name of a bundled intent taxonomy (e.g. "banking") to use instead of `intents`.
 
         Returns:
             Dict[str, Any]: A dictionary containing the input text and detected intent with its score.
@@ -336,25 +356,127 @@ class NLIAPI(TextAPI):
         data = cherrypy.request.json
         text = data.get("text", "")
         intents = data.get("intents", [])
+        taxonomy = data.get("taxonomy")
+
+        if taxonomy:
+            cache = self._hypothesis_cache()
+            if taxonomy not in cache.taxonomies:
+                raise cherrypy.HTTPError(400, f"Unknown intent taxonomy {taxonomy}")
+            intents = [x for sub_intents in cache.taxonomies[taxonomy].values() for x in sub_intents]
 
         # Zero-shot classification for intent detection
         scores = self._get_entailment_scores(text, intents)
         return {"text": text, "intents": intents, "scores": scores}
 
-    def _get_entailment_scores(self, premise: str, hypotheses: List[str]) -> Dict[str, float]:
+    @cherrypy.expose
+    @cherrypy.tools.json_in()
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["POST"])
+    def detect_intent_hierarchical(self, **kwargs: Any) -> Dict[str, Any]:
+        r"""
+        Detects the intent of the input text from a two-level taxonomy of categories and sub-intents. The top-level
+        categories are scored first and only the sub-intents of the `top_k` best categories are scored afterwards.
+
+        Args:
+            text (str): The input text.
+            taxonomy (str, optional): Name of a bundled intent taxonomy, e.g. "banking".
+            intents (Dict[str, List[str]], optional): A custom taxonomy of category to sub-intents, used if no taxonomy is named.
+            top_k (int, optional): Number of categories to descend into. Defaults to 2.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the input text, the detected category and intent, and the scores.
+
+        Example CURL Request:
+        ```bash
+        /usr/bin/curl -X POST localhost:3000/api/v1/detect_intent_hierarchical \
+            -H "Content-Type: application/json" \
+            -d '{
+                "text": "I lost my credit card yesterday, please block it",
+                "taxonomy": "banking",
+                "top_k": 2
+            }' | jq
+        ```
+        """
+        data = cherrypy.request.json
+        text = data.get("text", "")
+        taxonomy = data.get("taxonomy")
+        intents = data.get("intents", {})
+        top_k = self._bounded_int(data, "top_k", 2, 1)
+
+        if taxonomy:
+            cache = self._hypothesis_cache()
+            if taxonomy not in cache.taxonomies:
+                raise cherrypy.HTTPError(400, f"Unknown intent taxonomy {taxonomy}")
+            intents = cache.taxonomies[taxonomy]
+
+        def score(hypotheses: List[str]) -> Dict[str, float]:
+            return self._get_entailment_scores(text, hypotheses)
+
+        result = detect_intent_hierarchical(score, intents, top_k)
+        return {"text": text, **result}
+
+    def _hypothesis_cache(self) -> HypothesisCache:
+        """
+        Returns the hypothesis cache of the model serving the request, creating it on the first request to a model of
+        the registry or if the models were loaded elsewhere.
+
+        Returns:
+            HypothesisCache: The hypothesis cache.
+        """
+        if self.hypothesis_cache is None or self.hypothesis_cache.tokenizer is not self.tokenizer:
+            self.hypothesis_cache = HypothesisCache(self.tokenizer)
+        return self.hypothesis_cache
+
+    def _encode_pairs(self, premise: str, hypotheses: List[str]) -> Dict[str, torch.Tensor]:
+        """
+        Builds padded model inputs for one premise paired with many hypotheses. The premise is tokenized once and the
+        hypotheses come from the hypothesis cache, so no hypothesis is re-tokenized across requests.
+
+        Args:
+            premise (str): The premise text.
+            hypotheses (List[str]): The hypothesis texts.
+
+        Returns:
+            Dict[str, torch.Tensor]: The padded inputs, one row per hypothesis.
+        """
+        premise_ids = self.tokenizer(premise, add_special_tokens=False, truncation=True)["input_ids"]
+        hypothesis_ids = self._hypothesis_cache().encode(hypotheses)
+        num_special_tokens = self.tokenizer.num_special_tokens_to_add(pair=True)
+
+        features = []
+        for ids in hypothesis_ids:
+            # Truncate the premise so that the pair fits the model
+            budget = max(self.tokenizer.model_max_length - num_special_tokens - len(ids), 0)
+            truncated = premise_ids[:budget]
+            feature = {"input_ids": self.tokenizer.build_inputs_with_special_tokens(truncated, ids)}
+            if "token_type_ids" in self.tokenizer.model_input_names:
+                feature["token_type_ids"] = self.tokenizer.create_token_type_ids_from_sequences(truncated, ids)
+            features.append(feature)
+
+        return self.tokenizer.pad(features, padding=True, return_tensors="pt")
+
+    def _get_entailment_scores(self, premise: str, hypotheses: List[str], max_batch_size: int = 64) -> Dict[str, float]:
         """
         Helper method to get entailment scores for multiple hypotheses.
 
+        The premise is tokenized once, hypotheses are taken from the hypothesis cache and all pairs are scored with one
+        forward pass per chunk of `max_batch_size` pairs.
+
         Args:
             premise (str): The input premise text.
             hypotheses (List[str]): A list of hypothesis texts.
+            max_batch_size (int, optional): Maximum number of pairs per forward pass. Defaults to 64.
 
         Returns:
             Dict[str, float]: A dictionary mapping each hypothesis to its entailment score.
         """
-        label_scores = {}
-        for hypothesis in hypotheses:
-            inputs = self.tokenizer(premise, hypothesis, return_tensors="pt", padding=True, truncation=True)
+        entailment_idx = self.model.config.label2id.get("entailment", 0)
+        contradiction_idx = self.model.config.label2id.get("contradiction", 0)
+
+        label_scores: Dict[str, float] = {}
+        for i in range(0, len(hypotheses), max_batch_size):
+            batch = hypotheses[i : i + max_batch_size]
+            inputs = self._encode_pairs(premise, batch)
             if self.use_cuda:
                 inputs = {k: v.cuda() for k, v in inputs.items()}
 
@@ -362,13 +484,12 @@ class NLIAPI(TextAPI):
                 outputs = self.model(**inputs)
                 logits = outputs.logits
                 softmax = torch.nn.functional.softmax(logits, dim=-1)
-                scores = softmax.cpu().numpy().tolist()
+                scores = softmax.cpu().numpy()
 
-            entailment_idx = self.model.config.label2id.get("entailment", 0)
-            contradiction_idx = self.model.config.label2id.get("contradiction", 0)
-            label_scores[hypothesis] = np.exp(scores[0][entailment_idx]) / np.exp(
-                scores[0][entailment_idx] + scores[0][contradiction_idx]
-            )
+            entailment = scores[:, entailment_idx]
+            contradiction = scores[:, contradiction_idx]
+            batch_scores = np.exp(entailment) / np.exp(entailment + contradiction)
+            label_scores.update(zip(batch, batch_scores.tolist()))
 
         return label_scores
 
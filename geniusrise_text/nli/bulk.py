@@ -19,8 +19,9 @@ import os
 import sqlite3
 import uuid
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 import pyarrow.parquet as pq
 import torch
@@ -30,6 +31,8 @@ from geniusrise import BatchInput, BatchOutput, State
 from pyarrow import feather
 
 from geniusrise_text.base import TextBulk
+from geniusrise_text.nli.hierarchy import hierarchical_result, leaf_hypotheses, select_categories
+from geniusrise_text.nli.intents import taxonomies
 
 
 class NLIBulk(TextBulk):
@@ -237,6 +240,12 @@ class NLIBulk(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         batch_size: int = 32,
+        sort_by_length: bool = False,
+        max_tokens_per_batch: Optional[int] = None,
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
+        intent_taxonomy: Optional[str] = None,
+        intent_top_k: int = 2,
         notification_email: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
@@ -259,6 +268,12 @@ class NLIBulk(TextBulk):
             awq_enabled (bool, optional): Whether to enable AWQ optimization. Defaults to False.
             flash_attention (bool, optional): Whether to use flash attention optimization. Defaults to False.
             batch_size (int, optional): Number of premise-hypothesis pairs to process simultaneously. Defaults to 32.
+            sort_by_length (bool, optional): Whether to batch rows of similar token length together to minimize padding. Defaults to False.
+            max_tokens_per_batch (Optional[int], optional): Budget of padded tokens per batch, used instead of batch_size if set. Defaults to None.
+            streaming (bool, optional): Whether to stream the dataset in chunks instead of loading it into memory. Defaults to False.
+            streaming_chunk_size (int, optional): Number of rows per streamed chunk. Defaults to 4096.
+            intent_taxonomy (Optional[str], optional): Bundled intent taxonomy (e.g. "banking") to detect the intent of every premise with, hierarchically. Defaults to None.
+            intent_top_k (int, optional): Number of taxonomy categories to descend into in intent mode. Defaults to 2.
             **kwargs: Arbitrary keyword arguments for model and generation configurations.
         ```
         """
@@ -287,6 +302,12 @@ class NLIBulk(TextBulk):
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
         self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
+        self.intent_taxonomy = intent_taxonomy
+        self.intent_top_k = intent_top_k
         self.notification_email = notification_email
         self.compile = compile
 
@@ -296,6 +317,9 @@ class NLIBulk(TextBulk):
         generation_args = {k.replace("generation_", ""): v for k, v in kwargs.items() if "generation_" in k}
         self.generation_args = generation_args
 
+        if intent_taxonomy and intent_taxonomy not in taxonomies:
+            raise ValueError(f"Unknown intent taxonomy {intent_taxonomy}")
+
         self.model, self.tokenizer = self.load_models(
             model_name=self.model_name,
             tokenizer_name=self.tokenizer_name,
@@ -318,19 +342,59 @@ class NLIBulk(TextBulk):
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        dataset = self.load_dataset(dataset_path)
-        if dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
+        # Load dataset, either fully or lazily in chunks of rows
+        if streaming:
+            columns = ["premise"] if intent_taxonomy else ["premise", "hypothesis"]
+            chunks = self.stream_dataset(dataset_path, columns=columns, chunk_size=streaming_chunk_size)
+        else:
+            dataset = self.load_dataset(dataset_path)
+            if dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([dataset])
 
-        predictions = []
-        for i in range(0, len(dataset), batch_size):
-            batch = dataset[i : i + batch_size]
+        # Save results
+        self.log.info(f"Saving results to {output_path}")
+        os.makedirs(output_path, exist_ok=True)
+        output_file = os.path.join(output_path, f"nli_results_{uuid.uuid4().hex}.jsonl")
+        with open(output_file, "w") as f:
+            for chunk in chunks:
+                if intent_taxonomy:
+                    for premise, detected in zip(chunk["premise"], self._detect_intents_chunk(chunk["premise"])):
+                        f.write(json.dumps({"premise": premise, **detected}) + "\n")
+                    continue
+
+                premises = chunk["premise"]
+                hypotheses = chunk["hypothesis"]
+                predictions = self._infer_chunk(premises, hypotheses)
+
+                for premise, hypothesis, pred in zip(premises, hypotheses, predictions):
+                    result = {
+                        "premise": premise,
+                        "hypothesis": hypothesis,
+                        "prediction": pred,
+                    }
+                    f.write(json.dumps(result) + "\n")
+
+        self.done()
+        self.log.info("Inference completed.")
+
+    def _infer_chunk(self, premises: List[str], hypotheses: List[str]) -> List[Dict[str, float]]:
+        """
+        Performs NLI inference on a chunk of premise-hypothesis pairs in batches.
 
+        Args:
+            premises (List[str]): The premises of the chunk.
+            hypotheses (List[str]): The hypotheses of the chunk.
+
+        Returns:
+            List[Dict[str, float]]: The label scores of every pair, in the original order.
+        """
+
+        def infer_batch(indices: List[int]) -> List[Dict[str, float]]:
             inputs = self.tokenizer(
-                batch["premise"],
-                batch["hypothesis"],
+                [premises[j] for j in indices],
+                [hypotheses[j] for j in indices],
                 padding=True,
                 return_tensors="pt",
             )
@@ -345,24 +409,66 @@ class NLIBulk(TextBulk):
                 softmax = torch.nn.functional.softmax(logits, dim=-1)
                 scores = softmax.numpy().tolist()
 
-                for score in scores:
-                    label_scores = {
-                        self.model.config.id2label[label_id]: score for label_id, score in enumerate(scores[0])
-                    }
-                    predictions.append(label_scores)
+            return [
+                {self.model.config.id2label[label_id]: score for label_id, score in enumerate(row)} for row in scores
+            ]
+
+        # Process data in batches, optionally bucketed by length, and restore the original order
+        batches = self.batch_indices(
+            premises,
+            batch_size=self.batch_size,
+            sort_by_length=self.sort_by_length,
+            max_tokens_per_batch=self.max_tokens_per_batch,
+            text_pairs=hypotheses,
+        )
+        predictions = []
+        for _, results in self.ordered_results(batches, infer_batch, chunk_size=self.batch_size):
+            predictions.extend(results)
+        return predictions
 
-        # Save results
-        self.log.info(f"Saving results to {output_path}")
-        os.makedirs(output_path, exist_ok=True)
-        output_file = os.path.join(output_path, f"nli_results_{uuid.uuid4().hex}.jsonl")
-        with open(output_file, "w") as f:
-            for data, pred in zip(dataset, predictions):
-                result = {
-                    "premise": data["premise"],
-                    "hypothesis": data["hypothesis"],
-                    "prediction": pred,
-                }
-                f.write(json.dumps(result) + "\n")
+    def _detect_intents_chunk(self, premises: List[str]) -> List[Dict[str, Any]]:
+        """
+        Detects the intent of every premise of a chunk hierarchically. All premises are first scored against the
+        top-level categories of the taxonomy, then each premise only against the sub-intents of its top-k categories.
 
-        self.done()
-        self.log.info("Inference completed.")
+        Args:
+            premises (List[str]): The premises of the chunk.
+
+        Returns:
+            List[Dict[str, Any]]: The detected category and intent of every premise, with their scores.
+        """
+        if self.intent_taxonomy is None:
+            raise ValueError('Detecting intents requires an intent taxonomy, e.g. intent_taxonomy="banking"')
+        taxonomy = taxonomies[self.intent_taxonomy]
+
+        pairs = [(i, category) for i in range(len(premises)) for category in taxonomy]
+        category_scores = self._entailment_scores(premises, pairs)
+        selected = [select_categories(scores, self.intent_top_k) for scores in category_scores]
+
+        pairs = [(i, intent) for i, cats in enumerate(selected) for intent in leaf_hypotheses(taxonomy, cats)]
+        intent_scores = self._entailment_scores(premises, pairs)
+
+        return [
+            hierarchical_result(taxonomy, c_scores, categories, i_scores)
+            for c_scores, categories, i_scores in zip(category_scores, selected, intent_scores)
+        ]
+
+    def _entailment_scores(self, premises: List[str], pairs: List[Tuple[int, str]]) -> List[Dict[str, float]]:
+        """
+        Scores (premise index, hypothesis) pairs and groups the entailment scores by premise.
+
+        Args:
+            premises (List[str]): The premises.
+            pairs (List[Tuple[int, str]]): The index of the premise and the hypothesis of every pair.
+
+        Returns:
+            List[Dict[str, float]]: For every premise, the entailment score of each of its hypotheses.
+        """
+        predictions = self._infer_chunk([premises[i] for i, _ in pairs], [h for _, h in pairs])
+        entailment = self.model.config.id2label[self.model.config.label2id.get("entailment", 0)]
+        contradiction = self.model.config.id2label[self.model.config.label2id.get("contradiction", 0)]
+
+        scores: List[Dict[str, float]] = [{} for _ in premises]
+        for (i, hypothesis), pred in zip(pairs, predictions):
+            scores[i][hypothesis] = float(np.exp(pred[entailment]) / np.exp(pred[entailment] + pred[contradiction]))
+        return scores
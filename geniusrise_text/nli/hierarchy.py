@@ -0,0 +1,96 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Callable, Dict, List
+
+Taxonomy = Dict[str, List[str]]
+ScoreFunction = Callable[[List[str]], Dict[str, float]]
+
+
+def select_categories(category_scores: Dict[str, float], top_k: int) -> List[str]:
+    """
+    Selects the top-k scoring categories of a taxonomy.
+
+    Args:
+        category_scores (Dict[str, float]): The entailment score of each category.
+        top_k (int): Number of categories to keep.
+
+    Returns:
+        List[str]: The selected categories, best first.
+    """
+    return sorted(category_scores, key=lambda c: category_scores[c], reverse=True)[: max(1, top_k)]
+
+
+def leaf_hypotheses(taxonomy: Taxonomy, categories: List[str]) -> List[str]:
+    """
+    Returns the unique sub-intents of the given categories.
+
+    Args:
+        taxonomy (Dict[str, List[str]]): The two-level taxonomy of category to sub-intents.
+        categories (List[str]): The categories to descend into.
+
+    Returns:
+        List[str]: The sub-intents, in taxonomy order.
+    """
+    return list(dict.fromkeys(x for c in categories for x in taxonomy[c]))
+
+
+def hierarchical_result(
+    taxonomy: Taxonomy,
+    category_scores: Dict[str, float],
+    selected: List[str],
+    intent_scores: Dict[str, float],
+) -> Dict[str, Any]:
+    """
+    Assembles the result of a hierarchical intent detection.
+
+    Args:
+        taxonomy (Dict[str, List[str]]): The two-level taxonomy of category to sub-intents.
+        category_scores (Dict[str, float]): The entailment score of each category.
+        selected (List[str]): The categories that were descended into.
+        intent_scores (Dict[str, float]): The entailment score of each sub-intent of the selected categories.
+
+    Returns:
+        Dict[str, Any]: The best category and intent with their scores, and the number of hypotheses scored.
+    """
+    intent = max(intent_scores, key=lambda x: intent_scores[x]) if intent_scores else None
+    category = next((c for c in selected if intent in taxonomy[c]), None)
+    return {
+        "category": category,
+        "intent": intent,
+        "category_scores": category_scores,
+        "selected_categories": selected,
+        "intent_scores": intent_scores,
+        "num_hypotheses": len(category_scores) + len(intent_scores),
+    }
+
+
+def detect_intent_hierarchical(score: ScoreFunction, taxonomy: Taxonomy, top_k: int = 2) -> Dict[str, Any]:
+    """
+    Detects the intent of a text by first scoring the top-level categories of a taxonomy and then only the sub-intents
+    of the top-k categories, instead of every leaf of the taxonomy.
+
+    Args:
+        score (Callable[[List[str]], Dict[str, float]]): Scores hypotheses against the text, e.g. entailment scores.
+        taxonomy (Dict[str, List[str]]): The two-level taxonomy of category to sub-intents.
+        top_k (int): Number of categories to descend into.
+
+    Returns:
+        Dict[str, Any]: The best category and intent with their scores, and the number of hypotheses scored.
+    """
+    category_scores = score(list(taxonomy.keys()))
+    selected = select_categories(category_scores, top_k)
+    intent_scores = score(leaf_hypotheses(taxonomy, selected))
+    return hierarchical_result(taxonomy, category_scores, selected, intent_scores)
@@ -0,0 +1,127 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from geniusrise_text.nli.intents import taxonomies
+
+
+class HypothesisCache:
+    """
+    A cache of tokenized NLI hypotheses for one tokenizer.
+
+    Hypotheses of the bundled intent taxonomies are tokenized once when the cache is created and kept in a pinned
+    bank, any other hypothesis is tokenized on first use and kept in a bounded LRU cache. Token ids are stored
+    without special tokens so they can be paired with any premise.
+
+    Attributes:
+        tokenizer (Any): The tokenizer used to encode hypotheses.
+        max_size (int): Maximum number of hypotheses kept in the LRU cache, pinned banks are not counted.
+        taxonomies (Dict[str, Dict[str, List[str]]]): The intent taxonomies available by name.
+        hits (int): Number of hypotheses served from the cache.
+        misses (int): Number of hypotheses that had to be tokenized.
+    """
+
+    def __init__(self, tokenizer: Any, max_size: int = 4096, preload_taxonomies: bool = True) -> None:
+        """
+        Initializes the HypothesisCache.
+
+        Args:
+            tokenizer (Any): The tokenizer used to encode hypotheses.
+            max_size (int): Maximum number of hypotheses kept in the LRU cache.
+            preload_taxonomies (bool): Whether to tokenize the bundled intent taxonomies upfront.
+        """
+        self.tokenizer = tokenizer
+        self.key = getattr(tokenizer, "name_or_path", None) or str(id(tokenizer))
+        self.max_size = max_size
+        self.taxonomies: Dict[str, Dict[str, List[str]]] = dict(taxonomies)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._bank: Dict[Tuple[str, str], List[int]] = {}
+        self._lru: "OrderedDict[Tuple[str, str], List[int]]" = OrderedDict()
+
+        if preload_taxonomies:
+            for name in self.taxonomies:
+                self.preload(self.hypotheses(name))
+
+    def hypotheses(self, taxonomy: str) -> List[str]:
+        """
+        Returns the hypotheses of a taxonomy: its categories followed by all of its sub-intents.
+
+        Args:
+            taxonomy (str): Name of the taxonomy, e.g. "banking".
+
+        Returns:
+            List[str]: The unique hypotheses of the taxonomy.
+
+        Raises:
+            KeyError: If the taxonomy does not exist.
+        """
+        intents = self.taxonomies[taxonomy]
+        return list(dict.fromkeys(list(intents.keys()) + [x for sub_intents in intents.values() for x in sub_intents]))
+
+    def preload(self, hypotheses: List[str]) -> None:
+        """
+        Tokenizes hypotheses in one call and pins them in the bank.
+
+        Args:
+            hypotheses (List[str]): The hypotheses to pin.
+        """
+        missing = [h for h in hypotheses if (self.key, h) not in self._bank]
+        if not missing:
+            return
+        input_ids = self.tokenizer(missing, add_special_tokens=False)["input_ids"]
+        with self._lock:
+            self._bank.update({(self.key, h): ids for h, ids in zip(missing, input_ids)})
+
+    def encode(self, hypotheses: List[str]) -> List[List[int]]:
+        """
+        Returns the token ids of each hypothesis, tokenizing only the ones not cached yet.
+
+        Args:
+            hypotheses (List[str]): The hypotheses to encode.
+
+        Returns:
+            List[List[int]]: The token ids of each hypothesis, without special tokens.
+        """
+        encoded: Dict[str, List[int]] = {}
+        with self._lock:
+            for h in hypotheses:
+                key = (self.key, h)
+                if key in self._bank:
+                    encoded[h] = self._bank[key]
+                elif key in self._lru:
+                    self._lru.move_to_end(key)
+                    encoded[h] = self._lru[key]
+
+        missing = [h for h in dict.fromkeys(hypotheses) if h not in encoded]
+        if missing:
+            input_ids = self.tokenizer(missing, add_special_tokens=False)["input_ids"]
+            with self._lock:
+                for h, ids in zip(missing, input_ids):
+                    encoded[h] = ids
+                    self._lru[(self.key, h)] = ids
+                while len(self._lru) > self.max_size:
+                    self._lru.popitem(last=False)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(hypotheses) - len(missing)
+
+        return [encoded[h] for h in hypotheses]
@@ -51,3 +51,44 @@ from .translation import intents as translation_intent
 from .travel import intents as travel_intent
 from .wedding import intents as wedding_intent
 from .wellness import intents as wellness_intent
+
+taxonomies = {
+    "artisan_marketplace": artisan_marketplace_intent,
+    "automotive": automotive_intent,
+    "banking": banking_intent,
+    "business_directory": business_directory_intent,
+    "childcare": childcare_intent,
+    "cultural": cultural_intent,
+    "customer_support": customer_support_intent,
+    "diet": diet_intent,
+    "ecommerce": ecommerce_intent,
+    "education": education_intent,
+    "employee_helpdesk": employee_helpdesk_intent,
+    "environment": environment_intent,
+    "esoteric": esoteric_intent,
+    "events": events_intent,
+    "fitness": fitness_intent,
+    "food_ordering": food_ordering_intent,
+    "freelancing": freelancing_intent,
+    "gardening": gardening_intent,
+    "government": government_intent,
+    "healthcare": healthcare_intent,
+    "hobby": hobby_intent,
+    "library": library_intent,
+    "news": news_intent,
+    "non_profit": non_profit_intent,
+    "performing_arts": performing_arts_intent,
+    "personal_finance": personal_finance_intent,
+    "pet_care": pet_care_intent,
+    "public_safety": public_safety_intent,
+    "real_estate": real_estate_intent,
+    "religion": religion_intent,
+    "senior_care": senior_care_intent,
+    "social_services": social_services_intent,
+    "sports_centers": sports_centers_intent,
+    "tourist_guide": tourist_guide_intent,
+    "translation": translation_intent,
+    "travel": travel_intent,
+    "wedding": wedding_intent,
+    "wellness": wellness_intent,
+}
@@ -0,0 +1,34 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from geniusrise_text.nli.hierarchy import detect_intent_hierarchical
+from geniusrise_text.nli.intents import banking_intent
+
+
+def test_detect_intent_hierarchical_prunes_categories():
+    scored = []
+
+    def score(hypotheses):
+        scored.extend(hypotheses)
+        return {h: 1.0 if h in ("Credit and Debit Cards", "Report lost or stolen card") else 0.1 for h in hypotheses}
+
+    result = detect_intent_hierarchical(score, banking_intent, top_k=1)
+
+    assert result["selected_categories"] == ["Credit and Debit Cards"]
+    assert result["category"] == "Credit and Debit Cards"
+    assert result["intent"] == "Report lost or stolen card"
+    assert set(result["intent_scores"]) == set(banking_intent["Credit and Debit Cards"])
+    assert result["num_hypotheses"] == len(scored)
+    assert len(scored) < sum(len(v) for v in banking_intent.values())
@@ -0,0 +1,49 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from transformers import AutoTokenizer
+
+from geniusrise_text.nli.hypotheses import HypothesisCache
+from geniusrise_text.nli.intents import banking_intent
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    return AutoTokenizer.from_pretrained("MoritzLaurer/mDeBERTa-v3-base-xnli-multilingual-nli-2mil7")
+
+
+def test_taxonomy_hypotheses_are_pinned(tokenizer):
+    cache = HypothesisCache(tokenizer, max_size=2)
+
+    hypotheses = cache.hypotheses("banking")
+    assert hypotheses[: len(banking_intent)] == list(banking_intent.keys())
+
+    encoded = cache.encode(hypotheses)
+    assert cache.misses == 0
+    assert cache.hits == len(hypotheses)
+    assert encoded[0] == tokenizer(hypotheses[0], add_special_tokens=False)["input_ids"]
+
+
+def test_lru_eviction(tokenizer):
+    cache = HypothesisCache(tokenizer, max_size=2, preload_taxonomies=False)
+
+    cache.encode(["a cat", "a dog"])
+    cache.encode(["a cat", "a bird"])
+    assert cache.misses == 3
+    assert cache.hits == 1
+
+    cache.encode(["a dog"])
+    assert cache.misses == 4
@@ -13,16 +13,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import cherrypy
+import numpy as np
 import pandas as pd
-import torch
 from geniusrise import BatchInput, BatchOutput, State
 from geniusrise.logging import setup_logger
+from sentence_transformers import SentenceTransformer
 from transformers import AutoModelForQuestionAnswering, AutoModelForTableQuestionAnswering, AutoTokenizer, pipeline
 
 from geniusrise_text.base import TextAPI
+from geniusrise_text.embeddings.embeddings import generate_sentence_transformer_embeddings
+from geniusrise_text.qa.retriever import Retriever, load_documents
+from geniusrise_text.qa.spans import extract_answers, softmax
+
+# Upper bounds of the span extraction settings of a request
+MAX_N_BEST = 20
+MAX_TOP_K = 100
+MAX_WINDOW_LENGTH = 4096
 
 
 class QAAPI(TextAPI):
@@ -142,6 +151,8 @@ class QAAPI(TextAPI):
         super().__init__(input=input, output=output, state=state)
         self.log = setup_logger(self)
         self.hf_pipeline = None
+        self.retriever: Optional[Retriever] = None
+        self.retriever_args: Dict[str, Any] = {}
 
     @cherrypy.expose
     @cherrypy.tools.json_in()
@@ -158,6 +169,13 @@ class QAAPI(TextAPI):
         Returns:
             Dict[str, Any]: A dictionary containing the question, context/table, and answer(s).
 
+        Contexts of any length are answered, split into overlapping windows of `max_length` tokens sharing
+        `doc_stride` tokens. Text-based QA also accepts `n_best` (number of answers, default 1) and
+        `max_answer_length` (in tokens, default 30).
+
+        Without `data`, the answer is searched in the documents indexed with `index_documents`: the `top_k` (default
+        5) most relevant passages are retrieved and read together, and every answer carries its `document_id`.
+
         Example CURL Request for Text-based QA:
         ```bash
         curl -X POST localhost:3000/api/v1/answer \
@@ -165,6 +183,13 @@ class QAAPI(TextAPI):
             -d '{"question": "What is the capital of France?", "data": "France is a country in Europe. Its capital is Paris."}'
         ```
 
+        Example CURL Request over the indexed documents:
+        ```bash
+        curl -X POST localhost:3000/api/v1/answer \
+            -H "Content-Type: application/json" \
+            -d '{"question": "How do I reset my password?", "top_k": 5}'
+        ```
+
         Example CURL Requests:
         ```bash
         /usr/bin/curl -X POST localhost:3000/api/v1/answer \
@@ -217,12 +242,57 @@ class QAAPI(TextAPI):
             }
         else:
             context = data.get("data")
+            n_best, max_length, doc_stride, max_answer_length = self._answer_settings(data)
+            if context is None:
+                if self.retriever is None:
+                    raise cherrypy.HTTPError(400, "Either data or documents indexed with index_documents are required")
+                top_k = self._bounded_int(data, "top_k", 5, 1, MAX_TOP_K)
+                answer = self.answer_from_documents(
+                    question,
+                    top_k=top_k,
+                    n_best=n_best,
+                    max_length=max_length,
+                    doc_stride=doc_stride,
+                    max_answer_length=max_answer_length,
+                )
+                return {"question": question, "answer": answer}
             return {
                 "data": context,
                 "question": question,
-                "answer": self.answer_text_question(context, question),
+                "answer": self.answer_text_question(
+                    context,
+                    question,
+                    n_best=n_best,
+                    max_length=max_length,
+                    doc_stride=doc_stride,
+                    max_answer_length=max_answer_length,
+                ),
             }
 
+    def _answer_settings(self, data: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        """
+        Reads the span extraction settings of a request, clamping the window length to the model's.
+
+        Every distinct combination of settings is batched separately, so they are bounded to keep the number of
+        batches bounded.
+
+        Args:
+            data (Dict[str, Any]): The request body.
+
+        Returns:
+            Tuple[int, int, int, int]: `n_best`, `max_length`, `doc_stride` and `max_answer_length`.
+
+        Raises:
+            cherrypy.HTTPError: 400 if a setting is invalid.
+        """
+        model_max_length = min(self.tokenizer.model_max_length, MAX_WINDOW_LENGTH)  # type: ignore
+        n_best = self._bounded_int(data, "n_best", 1, 1, MAX_N_BEST)
+        max_length = min(self._bounded_int(data, "max_length", 384, 16, MAX_WINDOW_LENGTH), model_max_length)
+        # Consecutive windows have to advance past their overlap, question tokens included
+        doc_stride = self._bounded_int(data, "doc_stride", min(128, max_length // 2 - 1), 1, max_length // 2 - 1)
+        max_answer_length = self._bounded_int(data, "max_answer_length", 30, 1, max_length)
+        return n_best, max_length, doc_stride, max_answer_length
+
     def answer_table_question(self, data: Dict[str, Any], question: str, model_type: str) -> dict:
         """
         Answers a question based on the provided table.
@@ -328,28 +398,222 @@ class QAAPI(TextAPI):
             coordinates = [coordinates]
         return [table.iat[coord] for coord in coordinates]
 
-    def answer_text_question(self, context: str, question: str) -> dict:
-        inputs = self.tokenizer.encode_plus(question, context, add_special_tokens=True, return_tensors="pt")
-        input_ids = inputs["input_ids"].tolist()[0]
+    def answer_text_question(
+        self,
+        context: str,
+        question: str,
+        n_best: int = 1,
+        max_length: int = 384,
+        doc_stride: int = 128,
+        max_answer_length: int = 30,
+    ) -> dict:
+        """
+        Answers a question about a text of any length, see `extract_answers`.
 
-        if next(self.model.parameters()).is_cuda:
-            inputs = {k: v.cuda() for k, v in inputs.items()}
+        Concurrent questions asked with the same settings are micro-batched into one forward pass.
 
-        outputs = self.model(**inputs)
-        answer_start_scores, answer_end_scores = outputs.start_logits, outputs.end_logits
+        Args:
+            context (str): The text.
+            question (str): The question to be answered.
+            n_best (int): Number of answers to return.
+            max_length (int): Maximum number of tokens of a window over the text, question included.
+            doc_stride (int): Number of tokens shared by consecutive windows.
+            max_answer_length (int): Maximum number of tokens of an answer.
+
+        Returns:
+            dict: The answers best first, their spans in the text with their scores, and "NONE" as aggregation.
+        """
 
-        answer_start = int(torch.argmax(answer_start_scores))
-        answer_end = int(torch.argmax(answer_end_scores) + 1)
+        def answer_batch(items: List[Any]) -> List[Any]:
+            questions, contexts = zip(*items)
+            return extract_answers(
+                self.model,
+                self.tokenizer,
+                list(questions),
+                list(contexts),
+                n_best=n_best,
+                max_length=max_length,
+                doc_stride=doc_stride,
+                max_answer_length=max_answer_length,
+            )
+
+        endpoint = f"answer:{n_best},{max_length},{doc_stride},{max_answer_length}"
+        spans = self.batched(endpoint, (question, context), answer_batch)
 
-        answer = self.tokenizer.convert_tokens_to_string(
-            self.tokenizer.convert_ids_to_tokens(input_ids[answer_start:answer_end])
+        return {
+            "answers": [span["answer"] for span in spans],
+            "aggregation": "NONE",
+            "spans": spans,
+        }
+
+    def answer_from_documents(
+        self,
+        question: str,
+        top_k: int = 5,
+        n_best: int = 1,
+        max_length: int = 384,
+        doc_stride: int = 128,
+        max_answer_length: int = 30,
+    ) -> dict:
+        """
+        Answers a question from the indexed documents, reading the most relevant passages in one batch.
+
+        The answers of all passages are ranked by their span logits, which unlike softmax scores are comparable
+        across passages, and the scores of the best answers are normalized together.
+
+        Args:
+            question (str): The question to be answered.
+            top_k (int): Number of passages retrieved and read.
+            n_best (int): Number of answers to return.
+            max_length (int): Maximum number of tokens of a window over a passage, question included.
+            doc_stride (int): Number of tokens shared by consecutive windows.
+            max_answer_length (int): Maximum number of tokens of an answer.
+
+        Returns:
+            dict: The answers best first, their spans in their documents with their scores and the passages read.
+        """
+        passages = self.retriever.search([question], k=top_k)[0]  # type: ignore
+        results = extract_answers(
+            self.model,
+            self.tokenizer,
+            [question] * len(passages),
+            [passage["text"] for passage in passages],
+            max_length=max_length,
+            doc_stride=doc_stride,
+            n_best=n_best,
+            max_answer_length=max_answer_length,
+            normalize=False,
         )
 
+        # Overlapping passages of a document find the same answer at the same offsets
+        candidates: Dict[Any, Dict[str, Any]] = {}
+        for passage, spans in zip(passages, results):
+            for span in spans:
+                start, end = passage["start"] + span["start"], passage["start"] + span["end"]
+                key = (passage["document_id"], start, end)
+                if key not in candidates or candidates[key]["score"] < span["score"]:
+                    candidates[key] = {**span, "document_id": passage["document_id"], "start": start, "end": end}
+
+        spans = sorted(candidates.values(), key=lambda span: -span["score"])[:n_best]
+        for span, p in zip(spans, softmax(np.array([span["score"] for span in spans], dtype=np.float64))):
+            span["score"] = float(p)
+
         return {
-            "answers": [answer],
+            "answers": [span["answer"] for span in spans],
             "aggregation": "NONE",
+            "spans": spans,
+            "passages": [{k: passage[k] for k in ("document_id", "start", "score")} for passage in passages],
         }
 
+    def add_documents(self, documents: List[Any]) -> Dict[str, Any]:
+        """
+        Indexes documents for `answer_from_documents`, creating the retriever on first use.
+
+        Args:
+            documents (List[Any]): The documents, as texts or as `{"id": ..., "text": ...}`.
+
+        Returns:
+            Dict[str, Any]: The number of passages indexed and the size of the index.
+        """
+        if self.retriever is None:
+            self.retriever = self._create_retriever(**self.retriever_args)
+        passages = self.retriever.add(documents)
+        # Answers retrieved from the previous documents are out of date
+        if self.response_cache is not None:
+            self.response_cache.clear()
+        return {"indexed": passages, **self.retriever.stats()}
+
+    @cherrypy.expose
+    @cherrypy.tools.json_in()
+    @cherrypy.tools.json_out()
+    @cherrypy.tools.allow(methods=["POST"])
+    @cherrypy.config(**{"tools.response_cache.on": False, "tools.model_route.on": False})
+    def index_documents(self) -> Dict[str, Any]:
+        """
+        Adds documents to the collection questions without `data` are answered from.
+
+        Returns:
+            Dict[str, Any]: A dictionary containing the number of passages indexed and the size of the index.
+
+        Example CURL Request:
+        ```bash
+        curl -X POST localhost:3000/api/v1/index_documents \
+            -H "Content-Type: application/json" \
+            -d '{"documents": [{"id": "reset-password", "text": "To reset your password, open Settings ..."}]}' | jq
+        ```
+        """
+        data = cherrypy.request.json
+        documents = data.get("documents")
+        if not isinstance(documents, list):
+            raise cherrypy.HTTPError(400, "documents must be a list of texts or of objects with an id and a text")
+        try:
+            return self.add_documents(documents)
+        except ValueError as e:
+            raise cherrypy.HTTPError(400, str(e))
+
+    def _create_retriever(
+        self,
+        embedding_model: Optional[str] = None,
+        passage_words: int = 200,
+        passage_overlap: int = 50,
+        use_cuda: bool = False,
+    ) -> Retriever:
+        """
+        Creates the retriever, fusing BM25 with sentence transformer embeddings if an embedding model is given.
+
+        Args:
+            embedding_model (Optional[str]): Name of the sentence transformer model, None for BM25 only.
+            passage_words (int): Maximum number of words of a passage.
+            passage_overlap (int): Number of words shared by consecutive passages of a document.
+            use_cuda (bool): Whether to embed on the GPU.
+
+        Returns:
+            Retriever: The empty retriever.
+        """
+        embed: Optional[Callable[[List[str]], Any]] = None
+        if embedding_model:
+            model = SentenceTransformer(embedding_model, device="cuda" if use_cuda else "cpu")
+            embed = lambda texts: generate_sentence_transformer_embeddings(  # noqa: E731
+                texts, model=model, use_cuda=use_cuda
+            )
+
+        return Retriever(embed=embed, passage_words=passage_words, passage_overlap=passage_overlap)
+
+    def listen(  # type: ignore
+        self,
+        *args: Any,
+        documents_path: Optional[str] = None,
+        retriever_embedding_model: Optional[str] = None,
+        passage_words: int = 200,
+        passage_overlap: int = 50,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Starts the API server, first indexing a document collection to answer questions without `data` from.
+
+        Args:
+            *args (Any): Arguments of `TextAPI.listen`.
+            documents_path (Optional[str]): JSON or JSONL file of `{"id": ..., "text": ...}` records, or folder of
+                text files, indexed at startup. More documents can be added with `index_documents`.
+            retriever_embedding_model (Optional[str]): Sentence transformer model whose embeddings are fused with
+                BM25 for retrieval, None for BM25 only.
+            passage_words (int): Maximum number of words of an indexed passage.
+            passage_overlap (int): Number of words shared by consecutive passages of a document.
+            **kwargs (Any): Keyword arguments of `TextAPI.listen`.
+        """
+        self.retriever_args = {
+            "embedding_model": retriever_embedding_model,
+            "passage_words": passage_words,
+            "passage_overlap": passage_overlap,
+            "use_cuda": kwargs.get("use_cuda", False),
+        }
+        if documents_path:
+            self.retriever = self._create_retriever(**self.retriever_args)
+            self.retriever.add(load_documents(documents_path))
+            self.log.info(f"Indexed documents from {documents_path}: {self.retriever.stats()}")
+
+        super().listen(*args, **kwargs)
+
     def initialize_pipeline(self):
         """
         Lazy initialization of the QA Hugging Face pipeline.
@@ -19,7 +19,8 @@ import os
 import sqlite3
 import uuid
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
 
 import pandas as pd
 import torch
@@ -30,6 +31,7 @@ from pyarrow import feather
 from pyarrow import parquet as pq
 
 from geniusrise_text.base import TextBulk
+from geniusrise_text.qa.spans import extract_answers
 
 
 class QABulk(TextBulk):
@@ -143,6 +145,8 @@ class QABulk(TextBulk):
             **kwargs (Any): Additional keyword arguments for extended functionality.
         """
         super().__init__(input, output, state, **kwargs)
+        self.table_cache_size = 128
+        self._tables: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
 
     def load_dataset(self, dataset_path: str, max_length: int = 512, **kwargs) -> Optional[Dataset]:
         r"""
@@ -291,6 +295,13 @@ class QABulk(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         batch_size: int = 32,
+        max_length: int = 512,
+        doc_stride: int = 128,
+        n_best: int = 1,
+        max_answer_length: int = 30,
+        table_cache_size: int = 128,
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
         notification_email: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
@@ -312,6 +323,17 @@ class QABulk(TextBulk):
             awq_enabled (bool, optional): Whether to enable AWQ optimization. Defaults to False.
             flash_attention (bool, optional): Whether to use flash attention optimization. Defaults to False.
             batch_size (int, optional): Number of questions to process simultaneously. Defaults to 32.
+            max_length (int, optional): Maximum number of tokens of a window over a context, question included.
+                Defaults to 512.
+            doc_stride (int, optional): Number of tokens shared by consecutive windows over contexts longer than
+                `max_length` tokens. Defaults to 128.
+            n_best (int, optional): Number of answers returned per text-based question. Defaults to 1.
+            max_answer_length (int, optional): Maximum number of tokens of an answer. Defaults to 30.
+            table_cache_size (int, optional): Number of parsed tables kept for datasets asking several questions about
+                the same table. Defaults to 128.
+            streaming (bool, optional): Whether to stream the dataset in chunks instead of loading it into memory,
+                writing one results file per chunk. Defaults to False.
+            streaming_chunk_size (int, optional): Number of rows per streamed chunk. Defaults to 4096.
             **kwargs: Arbitrary keyword arguments for model and generation configurations.
 
         Processing:
@@ -343,6 +365,10 @@ class QABulk(TextBulk):
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
         self.batch_size = batch_size
+        self.max_length = max_length
+        self.table_cache_size = table_cache_size
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
         self.notification_email = notification_email
         self.compile = compile
 
@@ -371,11 +397,16 @@ class QABulk(TextBulk):
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        dataset = self.load_dataset(dataset_path)
-        if dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
+        # Load dataset, either fully or lazily in chunks of rows
+        chunks: Iterator[Dict[str, List[Any]]]
+        if streaming:
+            chunks = self.stream_dataset(dataset_path, columns=["data", "question"], chunk_size=streaming_chunk_size)
+        else:
+            dataset = self.load_dataset(dataset_path, max_length=max_length)
+            if dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([{"data": dataset["data"], "question": dataset["question"]}])
 
         model_type = "traditional"
         if "tapas" in self.model_name.lower():
@@ -383,119 +414,197 @@ class QABulk(TextBulk):
         elif "tapex" in self.model_name.lower():
             model_type = "tapex"
 
-        output_data = []
-        for batch in range(0, len(dataset), self.batch_size):
-            batch_data = dataset[batch : batch + self.batch_size]
+        for chunk in chunks:
+            output_data = self._answer_chunk(
+                chunk["data"],
+                chunk["question"],
+                model_type,
+                doc_stride=doc_stride,
+                n_best=n_best,
+                max_answer_length=max_answer_length,
+            )
+
+            # Save the results
+            output_file = os.path.join(output_path, f"qa_results-{str(uuid.uuid4())}.json")
+            with open(output_file, "w") as file:
+                json.dump(output_data, file)
+            self.log.info(f"Results saved to {output_file}")
+        self.done()
+
+    def _answer_chunk(
+        self,
+        chunk_data: List[Any],
+        chunk_questions: List[str],
+        model_type: str,
+        doc_stride: int = 128,
+        n_best: int = 1,
+        max_answer_length: int = 30,
+    ) -> List[Dict[str, Any]]:
+        """
+        Answers the questions of a chunk of the dataset in batches.
+
+        Args:
+            chunk_data (List[Any]): The context or table of every question.
+            chunk_questions (List[str]): The questions.
+            model_type (str): "traditional", "tapas" or "tapex".
+            doc_stride (int): Number of tokens shared by consecutive windows over long contexts.
+            n_best (int): Number of answers returned per text-based question.
+            max_answer_length (int): Maximum number of tokens of an answer.
+
+        Returns:
+            List[Dict[str, Any]]: The results, in the order of the questions.
+        """
+        output_data: List[Dict[str, Any]] = []
+        for batch in range(0, len(chunk_questions), self.batch_size):
+            batch_data = {
+                "data": chunk_data[batch : batch + self.batch_size],
+                "question": chunk_questions[batch : batch + self.batch_size],
+            }
 
             if model_type == "traditional":
                 questions = batch_data["question"]
                 contexts = batch_data["data"]
 
-                inputs = self.tokenizer(
+                # Long contexts are split into overlapping windows, which run through the model in bounded batches
+                batch_answers = extract_answers(
+                    self.model,
+                    self.tokenizer,
                     questions,
                     contexts,
-                    add_special_tokens=True,
-                    return_tensors="pt",
-                    truncation="only_second",
                     max_length=self.max_length,
+                    doc_stride=doc_stride,
+                    n_best=n_best,
+                    max_answer_length=max_answer_length,
                 )
 
-                # Move inputs to GPU if CUDA is available
-                if self.use_cuda and torch.cuda.is_available():
-                    inputs = {k: v.to("cuda") for k, v in inputs.items()}
-
-                outputs = self.model(**inputs)
-
-                answer_start_scores, answer_end_scores = outputs.start_logits, outputs.end_logits
-                answer_start = torch.argmax(answer_start_scores, dim=1)
-                answer_end = torch.argmax(answer_end_scores, dim=1) + 1
-
-                for i in range(outputs.start_logits.shape[0]):
-                    answer = self.tokenizer.convert_tokens_to_string(
-                        self.tokenizer.convert_ids_to_tokens(
-                            inputs["input_ids"][i][int(answer_start[i]) : int(answer_end[i])]
-                        )
-                    )
+                for question, context, spans in zip(questions, contexts, batch_answers):
                     output_data.append(
                         {
-                            "data": contexts[i],
-                            "question": questions[i],
-                            "answer": answer,
+                            "data": context,
+                            "question": question,
+                            "answer": spans[0]["answer"] if spans else "",
+                            "spans": spans,
                         }
                     )
             elif model_type == "tapas":
                 questions = batch_data["question"]
-                tables = [pd.DataFrame.from_dict(json.loads(x)) for x in batch_data["data"]]
-
-                for table, question in zip(tables, questions):
-                    inputs = self.tokenizer(table=table, queries=[question], padding="max_length", return_tensors="pt")
-
-                    if next(self.model.parameters()).is_cuda:
-                        inputs = {k: v.cuda() for k, v in inputs.items()}
-                    outputs = self.model(**inputs)
-
-                    # Decode the predicted tokens
-                    if hasattr(outputs, "logits_aggregation") and outputs.logits_aggregation is not None:
-                        (
-                            predicted_answer_coordinates,
-                            predicted_aggregation_indices,
-                        ) = self.tokenizer.convert_logits_to_predictions(
-                            {k: v.cpu() for k, v in inputs.items()},
-                            outputs.logits.detach().cpu(),
-                            outputs.logits_aggregation.detach().cpu(),
-                        )
-                    else:
-                        predicted_answer_coordinates = self.tokenizer.convert_logits_to_predictions(
-                            {k: v.cpu() for k, v in inputs.items()},
-                            outputs.logits.detach().cpu(),
-                        )
-                        predicted_aggregation_indices = None
-
-                    cell_answers = [
-                        self._convert_coordinates_to_answer(table, x) for x in predicted_answer_coordinates[0]
-                    ]
-                    if type(cell_answers[0]) is list:
-                        cell_answers = [y for x in cell_answers for y in x]  # type: ignore
-
-                    if predicted_aggregation_indices:
-                        aggregation_answer = self._convert_aggregation_to_answer(predicted_aggregation_indices[0])
-                    else:
-                        aggregation_answer = "NONE"
-                    output_data.append(
-                        {
-                            "data": table.to_dict("records"),
-                            "question": question,
-                            "answers": cell_answers,
-                            "aggregation": aggregation_answer,
-                        }
-                    )
+                tables = [self._parse_table(x) for x in batch_data["data"]]
+
+                for table, question, answer in zip(tables, questions, self._answer_tapas_batch(tables, questions)):
+                    output_data.append({"data": table.to_dict("records"), "question": question, **answer})
 
             elif model_type == "tapex":
                 questions = batch_data["question"]
-                tables = [pd.DataFrame.from_dict(json.loads(x)) for x in batch_data["data"]]
-
-                for table, question in zip(tables, questions):
-                    encoding = self.tokenizer(table, question, return_tensors="pt")
-                    if next(self.model.parameters()).is_cuda:
-                        encoding = {k: v.cuda() for k, v in encoding.items()}
+                tables = [self._parse_table(x) for x in batch_data["data"]]
 
+                encoding = self.tokenizer(
+                    table=tables, query=questions, padding=True, truncation=True, return_tensors="pt"
+                )
+                encoding = {k: v.to(self.model.device) for k, v in encoding.items()}
+                with torch.no_grad():
                     outputs = self.model.generate(**encoding)
-                    answers = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+                answers = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+                for table, question, answer in zip(tables, questions, answers):
                     output_data.append(
                         {
                             "data": table.to_dict("records"),
                             "question": question,
-                            "answers": answers,
+                            "answers": [answer],
                             "aggregation": "NONE",
                         }
                     )
+        return output_data
 
-        # Save the results
-        output_file = os.path.join(output_path, f"qa_results-{str(uuid.uuid4())}.json")
-        with open(output_file, "w") as file:
-            json.dump(output_data, file)
-        self.done()
-        self.log.info(f"Results saved to {output_file}")
+    def _parse_table(self, data: Any) -> pd.DataFrame:
+        """
+        Parses a table, reusing the tables parsed last for datasets asking several questions about the same table.
+
+        Args:
+            data (Any): The table as a JSON string or as a dictionary of columns or list of rows.
+
+        Returns:
+            pd.DataFrame: The table. Equal tables are the same object while they stay in the cache.
+        """
+        key = data if isinstance(data, str) else json.dumps(data, sort_keys=True)
+        table = self._tables.get(key)
+        if table is None:
+            table = pd.DataFrame.from_dict(json.loads(data) if isinstance(data, str) else data)
+            self._tables[key] = table
+            while len(self._tables) > self.table_cache_size:
+                self._tables.popitem(last=False)
+        self._tables.move_to_end(key)
+        return table
+
+    def _answer_tapas_batch(self, tables: List[pd.DataFrame], questions: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answers a batch of questions about tables with TAPAS in a single forward pass.
+
+        The TAPAS tokenizer encodes one table at a time, so the questions about each table are encoded together and
+        the encodings of all tables are padded to the longest one.
+
+        Args:
+            tables (List[pd.DataFrame]): The table of every question.
+            questions (List[str]): The questions.
+
+        Returns:
+            List[Dict[str, Any]]: The answer cells and aggregation of every question.
+        """
+        groups: Dict[int, List[int]] = {}
+        for i, table in enumerate(tables):
+            groups.setdefault(id(table), []).append(i)
+
+        order: List[int] = []
+        encodings = []
+        for indices in groups.values():
+            encodings.append(
+                self.tokenizer(
+                    table=tables[indices[0]],
+                    queries=[questions[i] for i in indices],
+                    padding=True,
+                    truncation=True,
+                    return_tensors="pt",
+                )
+            )
+            order.extend(indices)
+
+        width = max(encoding["input_ids"].shape[1] for encoding in encodings)
+        inputs = {}
+        for name in encodings[0].keys():
+            value = self.tokenizer.pad_token_id if name == "input_ids" else 0
+            inputs[name] = torch.cat(
+                [
+                    torch.nn.functional.pad(
+                        e[name], [0, 0] * (e[name].dim() - 2) + [0, width - e[name].shape[1]], value=value
+                    )
+                    for e in encodings
+                ]
+            )
+
+        with torch.no_grad():
+            outputs = self.model(**{k: v.to(self.model.device) for k, v in inputs.items()})
+
+        if getattr(outputs, "logits_aggregation", None) is not None:
+            coordinates, aggregations = self.tokenizer.convert_logits_to_predictions(
+                inputs, outputs.logits.detach().cpu(), outputs.logits_aggregation.detach().cpu()
+            )
+        else:
+            coordinates = self.tokenizer.convert_logits_to_predictions(inputs, outputs.logits.detach().cpu())
+            aggregations = None
+
+        answers: List[Dict[str, Any]] = [{}] * len(tables)
+        for position, i in enumerate(order):
+            cell_answers = [self._convert_coordinates_to_answer(tables[i], x) for x in coordinates[position]]
+            if cell_answers and type(cell_answers[0]) is list:
+                cell_answers = [y for x in cell_answers for y in x]  # type: ignore
+
+            answers[i] = {
+                "answers": cell_answers,
+                "aggregation": (
+                    self._convert_aggregation_to_answer(aggregations[position]) if aggregations else "NONE"
+                ),
+            }
+        return answers
 
     def _convert_aggregation_to_answer(self, aggregation_index: int) -> str:
         """
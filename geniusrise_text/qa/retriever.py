@@ -0,0 +1,380 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import glob
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+import torch
+
+from geniusrise_text.embeddings.index import VectorIndex
+
+log = logging.getLogger(__name__)
+
+Document = Union[str, Dict[str, Any]]
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_WORD = re.compile(r"\S+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase word tokens for lexical search.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        List[str]: The tokens.
+    """
+    return _TOKEN.findall(text.lower())
+
+
+def split_passages(text: str, max_words: int = 200, overlap: int = 50) -> List[Tuple[int, str]]:
+    """
+    Splits a document into passages of at most `max_words` words, consecutive passages sharing `overlap` words.
+
+    Args:
+        text (str): The document.
+        max_words (int): Maximum number of words of a passage.
+        overlap (int): Number of words shared by consecutive passages.
+
+    Returns:
+        List[Tuple[int, str]]: The character offset of every passage in the document and its text.
+    """
+    words = list(_WORD.finditer(text))
+    if not words:
+        return []
+
+    step = max(1, max_words - overlap)
+    passages = []
+    for first in range(0, len(words), step):
+        last = min(first + max_words, len(words)) - 1
+        start, end = words[first].start(), words[last].end()
+        passages.append((start, text[start:end]))
+        if last == len(words) - 1:
+            break
+    return passages
+
+
+def load_documents(path: str) -> List[Dict[str, Any]]:
+    """
+    Loads a document collection from a JSON or JSONL file of `{"id": ..., "text": ...}` records, or from a folder
+    of text files named by their document id.
+
+    Args:
+        path (str): The file or folder.
+
+    Returns:
+        List[Dict[str, Any]]: The documents.
+    """
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "**", "*.txt"), recursive=True))
+        documents = []
+        for file in files:
+            with open(file) as f:
+                documents.append({"id": os.path.relpath(file, path), "text": f.read()})
+        return documents
+
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+class BM25Index:
+    """
+    An in-process BM25 inverted index.
+
+    Every term maps to the texts containing it and its frequency in them. A query only touches the postings of its own
+    terms, which are scored into one array over all texts at once.
+
+    Attributes:
+        k1 (float): Term frequency saturation.
+        b (float): Length normalization.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        """
+        Initializes an empty BM25Index.
+
+        Args:
+            k1 (float): Term frequency saturation.
+            b (float): Length normalization.
+        """
+        self.k1 = k1
+        self.b = b
+
+        self._postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lengths: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, texts: List[str]) -> None:
+        """
+        Indexes texts, numbered after the texts already indexed.
+
+        Args:
+            texts (List[str]): The texts.
+        """
+        for text in texts:
+            position = len(self._lengths)
+            tokens = tokenize(text)
+            self._lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                rows, frequencies = self._postings.setdefault(term, ([], []))
+                rows.append(position)
+                frequencies.append(frequency)
+                self._arrays.pop(term, None)
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Scores all indexed texts against a query.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            np.ndarray: The BM25 score of every text, 0 for texts sharing no term with the query.
+        """
+        n = len(self._lengths)
+        scores = np.zeros(n, dtype=np.float32)
+        if n == 0:
+            return scores
+
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * lengths / max(float(lengths.mean()), 1e-9))
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            rows, frequencies = self._term_arrays(term)
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[rows])
+        return scores
+
+    def _term_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the postings of a term as arrays, converting them once per change.
+        """
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            rows, frequencies = self._postings[term]
+            arrays = (np.asarray(rows, dtype=np.int64), np.asarray(frequencies, dtype=np.float32))
+            self._arrays[term] = arrays
+        return arrays
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the positions of the k best positive scores, best first.
+    """
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _to_matrix(embeddings: Any) -> np.ndarray:
+    """
+    Converts embeddings returned as an array, a tensor or a list of tensors to a float32 matrix.
+    """
+    if isinstance(embeddings, torch.Tensor):
+        return embeddings.detach().float().cpu().numpy()
+    if isinstance(embeddings, list):
+        embeddings = [e.detach().float().cpu().numpy() if isinstance(e, torch.Tensor) else e for e in embeddings]
+    return np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+
+
+class Retriever:
+    """
+    Retrieves the passages of a document collection most relevant to a question.
+
+    Documents are split into overlapping passages, indexed once for BM25 and, given an embedding function, in a
+    vector index. With both, the two rankings are fused by reciprocal rank fusion, which needs no calibration between
+    BM25 and cosine scores: a passage scores the sum of 1 / (`rrf_k` + rank) over the rankings it appears in.
+
+    Attributes:
+        embed (Optional[Callable[[List[str]], Any]]): Embeds texts for dense retrieval, None for BM25 only.
+        passage_words (int): Maximum number of words of a passage.
+        passage_overlap (int): Number of words shared by consecutive passages of a document.
+        rrf_k (int): Rank offset of reciprocal rank fusion.
+        candidates (int): Number of passages taken from each ranking before fusion.
+    """
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[List[str]], Any]] = None,
+        passage_words: int = 200,
+        passage_overlap: int = 50,
+        k1: float = 1.5,
+        b: float = 0.75,
+        rrf_k: int = 60,
+        candidates: int = 100,
+    ) -> None:
+        """
+        Initializes an empty Retriever.
+
+        Args:
+            embed (Optional[Callable[[List[str]], Any]]): Embeds texts for dense retrieval, None for BM25 only.
+            passage_words (int): Maximum number of words of a passage.
+            passage_overlap (int): Number of words shared by consecutive passages of a document.
+            k1 (float): BM25 term frequency saturation.
+            b (float): BM25 length normalization.
+            rrf_k (int): Rank offset of reciprocal rank fusion.
+            candidates (int): Number of passages taken from each ranking before fusion.
+        """
+        self.embed = embed
+        self.passage_words = passage_words
+        self.passage_overlap = passage_overlap
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+        self._lock = threading.RLock()
+        self._bm25 = BM25Index(k1=k1, b=b)
+        self._vectors = VectorIndex(metric="cosine", index_type="auto") if embed is not None else None
+        self._passages: List[Dict[str, Any]] = []
+        self._documents: Set[Any] = set()
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+    def add(self, documents: Sequence[Document]) -> int:
+        """
+        Indexes documents.
+
+        All documents and ids are checked before anything is indexed, so a rejected batch leaves the index unchanged.
+
+        Args:
+            documents (Sequence[Union[str, Dict[str, Any]]]): The documents, as texts or as `{"id": ..., "text": ...}`.
+                Documents without an id are numbered after the documents before them, skipping the ids taken by
+                indexed documents or by another document of the batch.
+
+        Returns:
+            int: Number of passages indexed.
+
+        Raises:
+            ValueError: If a document is neither a text nor an object with a text, if its id is not hashable, or if
+                its id is already indexed or appears twice in the batch.
+        """
+        # The shape of every document is checked first, so that a malformed batch is rejected as a whole
+        given: Set[Any] = set()
+        for document in documents:
+            if isinstance(document, str):
+                continue
+            if not isinstance(document, dict):
+                raise ValueError(f"Documents must be texts or objects with a text, got {type(document).__name__}")
+            if not isinstance(document.get("text"), str):
+                raise ValueError(f"Document {document.get('id', '')!r} has no text")
+            if "id" in document:
+                try:
+                    given.add(document["id"])
+                except TypeError:
+                    raise ValueError(f"Document ids must be hashable, got {document['id']!r}")
+
+        with self._lock:
+            taken = set(self._documents)
+            next_id = 0
+            ids: List[Any] = []
+            for document in documents:
+                if isinstance(document, dict) and "id" in document:
+                    document_id = document["id"]
+                    if document_id in self._documents:
+                        raise ValueError(f"Document {document_id} is already indexed")
+                    if document_id in taken:
+                        raise ValueError(f"Document {document_id} appears twice in the batch")
+                else:
+                    next_id = max(next_id, len(taken))
+                    while next_id in taken or next_id in given:
+                        next_id += 1
+                    document_id = next_id
+                taken.add(document_id)
+                ids.append(document_id)
+
+            passages: List[Dict[str, Any]] = []
+            for document_id, document in zip(ids, documents):
+                text = document if isinstance(document, str) else document["text"]
+                for start, passage in split_passages(text, self.passage_words, self.passage_overlap):
+                    passages.append({"document_id": document_id, "start": start, "text": passage})
+
+            texts = [passage["text"] for passage in passages]
+            if self._vectors is not None and texts:
+                positions = list(range(len(self._passages), len(self._passages) + len(texts)))
+                self._vectors.upsert(positions, _to_matrix(self.embed(texts)))  # type: ignore
+            self._bm25.add(texts)
+            self._passages.extend(passages)
+            self._documents.update(ids)
+
+        log.info(f"Indexed {len(documents)} documents as {len(passages)} passages")
+        return len(passages)
+
+    def search(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Finds the k passages most relevant to each query.
+
+        Args:
+            queries (List[str]): The queries.
+            k (int): Number of passages per query.
+
+        Returns:
+            List[List[Dict[str, Any]]]: For each query, the passages best first, with their document id, character
+                offset in the document, text and retrieval score.
+        """
+        with self._lock:
+            if not self._passages or not queries:
+                return [[] for _ in queries]
+
+            if self._vectors is None:
+                results = []
+                for query in queries:
+                    scores = self._bm25.scores(query)
+                    results.append([dict(self._passages[i], score=float(scores[i])) for i in _top(scores, k)])
+                return results
+
+            n = max(k, self.candidates)
+            lexical = [_top(self._bm25.scores(query), n) for query in queries]
+
+            dense = self._vectors.search(_to_matrix(self.embed(queries)), k=n)  # type: ignore
+            results = []
+            for rows, neighbours in zip(lexical, dense):
+                fused: Dict[int, float] = {}
+                for ranking in (rows.tolist(), [position for position, _ in neighbours]):
+                    for rank, position in enumerate(ranking):
+                        fused[position] = fused.get(position, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                best = sorted(fused, key=lambda position: -fused[position])[:k]
+                results.append([dict(self._passages[i], score=fused[i]) for i in best])
+            return results
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the size of the index.
+
+        Returns:
+            Dict[str, Any]: The number of documents and passages and whether embeddings are fused.
+        """
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "passages": len(self._passages),
+                "dense": self._vectors is not None,
+            }
@@ -0,0 +1,191 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import torch
+
+
+def softmax(scores: np.ndarray) -> np.ndarray:
+    """
+    Normalizes scores into probabilities.
+
+    Args:
+        scores (np.ndarray): The scores.
+
+    Returns:
+        np.ndarray: Their softmax, empty for no scores.
+    """
+    probabilities = np.exp(scores - np.max(scores, initial=-np.inf))
+    return probabilities / (probabilities.sum() or 1.0)
+
+
+def top_spans(
+    start_logits: np.ndarray,
+    end_logits: np.ndarray,
+    mask: np.ndarray,
+    n_best: int = 1,
+    max_answer_length: int = 30,
+) -> List[Tuple[int, int, int, float]]:
+    """
+    Finds the best scoring answer spans over the windows of a context.
+
+    A span is scored by the sum of the start logit of its first token and the end logit of its last token. Only spans
+    lying within the context, starting before they end and no longer than `max_answer_length` tokens are considered.
+    All windows and span lengths are scored at once over a (windows, tokens, lengths) view of the end logits.
+
+    Args:
+        start_logits (np.ndarray): Start logits of shape (windows, tokens).
+        end_logits (np.ndarray): End logits of shape (windows, tokens).
+        mask (np.ndarray): Boolean mask of shape (windows, tokens), True for the tokens of the context.
+        n_best (int): Number of spans to return.
+        max_answer_length (int): Maximum number of tokens of a span.
+
+    Returns:
+        List[Tuple[int, int, int, float]]: The window, first token, last token and score of the best spans, best first.
+    """
+    num_windows, num_tokens = start_logits.shape
+    k = max(1, min(max_answer_length, num_tokens))
+    mask = mask.astype(bool)
+
+    # ends[w, i, l] is the end logit of the span of length l + 1 starting at token i of window w
+    padded_ends = np.pad(end_logits.astype(np.float32), ((0, 0), (0, k - 1)), constant_values=-np.inf)
+    padded_mask = np.pad(mask, ((0, 0), (0, k - 1)), constant_values=False)
+    ends = np.lib.stride_tricks.sliding_window_view(padded_ends, k, axis=1)
+    end_mask = np.lib.stride_tricks.sliding_window_view(padded_mask, k, axis=1)
+
+    scores = np.where(mask[:, :, None] & end_mask, start_logits[:, :, None].astype(np.float32) + ends, -np.inf)
+    flat = scores.reshape(-1)
+    num_valid = int(np.isfinite(flat).sum())
+    if num_valid == 0:
+        return []
+
+    n = min(n_best, num_valid)
+    best = np.argpartition(-flat, n - 1)[:n]
+    best = best[np.argsort(-flat[best], kind="stable")]
+    windows, starts, lengths = np.unravel_index(best, scores.shape)
+    return [
+        (int(w), int(s), int(s + length), float(flat[i])) for w, s, length, i in zip(windows, starts, lengths, best)
+    ]
+
+
+def extract_answers(
+    model: Any,
+    tokenizer: Any,
+    questions: List[str],
+    contexts: List[str],
+    max_length: int = 384,
+    doc_stride: int = 128,
+    n_best: int = 1,
+    max_answer_length: int = 30,
+    normalize: bool = True,
+    batch_size: int = 32,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Answers questions about contexts of any length with an extractive QA model.
+
+    Contexts longer than `max_length` tokens are split into overlapping windows, `doc_stride` tokens of every window
+    overlapping the next one, so that no answer is cut off. The windows of all questions run through the model in
+    batches of `batch_size` windows, and the best spans of every question are searched across all of its windows.
+
+    Args:
+        model (Any): A model for extractive question answering, e.g. `AutoModelForQuestionAnswering`.
+        tokenizer (Any): Its tokenizer, which has to be a fast tokenizer to map tokens back to the context.
+        questions (List[str]): The questions.
+        contexts (List[str]): The context of every question.
+        max_length (int): Maximum number of tokens of a window, question included.
+        doc_stride (int): Number of tokens shared by consecutive windows.
+        n_best (int): Number of answers returned per question.
+        max_answer_length (int): Maximum number of tokens of an answer.
+        normalize (bool): Whether to return scores as a softmax over the answers of a question, otherwise they are
+            the raw span logits, which are comparable across contexts.
+        batch_size (int): Maximum number of windows per forward pass, bounding memory for long contexts.
+
+    Returns:
+        List[List[Dict[str, Any]]]: For every question, the best answers with their text, score and character offsets
+            in the context, best first.
+
+    Raises:
+        ValueError: If the tokenizer is not a fast tokenizer.
+    """
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError("Long context question answering requires a fast tokenizer")
+    if not questions:
+        return []
+
+    # The context goes on the side that gets truncated
+    question_first = tokenizer.padding_side == "right"
+    context_index = 1 if question_first else 0
+    max_length = min(max_length, tokenizer.model_max_length)
+
+    encodings = tokenizer(
+        questions if question_first else contexts,
+        contexts if question_first else questions,
+        truncation="only_second" if question_first else "only_first",
+        max_length=max_length,
+        stride=doc_stride,
+        padding=True,
+        return_overflowing_tokens=True,
+        return_offsets_mapping=True,
+    )
+
+    device = next(model.parameters()).device
+    names = [name for name in tokenizer.model_input_names if name in encodings]
+    num_windows = len(encodings["input_ids"])
+    start_batches, end_batches = [], []
+    for first in range(0, num_windows, batch_size):
+        inputs = {name: torch.tensor(encodings[name][first : first + batch_size], device=device) for name in names}
+        with torch.no_grad():
+            outputs = model(**inputs)
+        start_batches.append(outputs.start_logits.float().cpu().numpy())
+        end_batches.append(outputs.end_logits.float().cpu().numpy())
+    start_logits = np.concatenate(start_batches)
+    end_logits = np.concatenate(end_batches)
+
+    num_tokens = start_logits.shape[1]
+    mask = np.zeros((num_windows, num_tokens), dtype=bool)
+    for w in range(num_windows):
+        sequence_ids = encodings.sequence_ids(w)
+        mask[w, : len(sequence_ids)] = [s == context_index for s in sequence_ids]
+
+    samples = np.asarray(encodings["overflow_to_sample_mapping"])
+    results: List[List[Dict[str, Any]]] = []
+    for i, context in enumerate(contexts):
+        windows = np.flatnonzero(samples == i)
+        # Overlapping windows find the same span, so keep enough candidates to return n_best distinct ones
+        candidates = top_spans(
+            start_logits[windows], end_logits[windows], mask[windows], n_best * len(windows), max_answer_length
+        )
+
+        answers: Dict[Tuple[int, int], float] = {}
+        for w, start, end, score in candidates:
+            offsets = encodings["offset_mapping"][windows[w]]
+            span = (offsets[start][0], offsets[end][1])
+            if span not in answers:
+                answers[span] = score
+            if len(answers) == n_best:
+                break
+
+        scores = np.array(list(answers.values()), dtype=np.float64)
+        if normalize:
+            scores = softmax(scores)
+        results.append(
+            [
+                {"answer": context[start:end], "score": float(p), "start": int(start), "end": int(end)}
+                for (start, end), p in zip(answers, scores)
+            ]
+        )
+    return results
@@ -0,0 +1,87 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from geniusrise_text.qa.retriever import Retriever, split_passages
+
+DOCUMENTS = [
+    {"id": "password", "text": "To reset your password open the settings page and click reset password."},
+    {"id": "billing", "text": "Invoices are emailed monthly. Billing questions go to the finance team."},
+    "Shipping takes five days for orders in Europe.",
+]
+
+
+def test_split_passages_overlap_and_offsets():
+    text = " ".join(f"w{i}" for i in range(25))
+    passages = split_passages(text, max_words=10, overlap=3)
+
+    assert [len(passage.split()) for _, passage in passages] == [10, 10, 10, 4]
+    assert all(text[start : start + len(passage)] == passage for start, passage in passages)
+    assert passages[1][1].startswith("w7 ") and passages[-1][1].endswith("w24")
+
+
+def test_bm25_retrieves_the_relevant_document():
+    retriever = Retriever(passage_words=8, passage_overlap=2)
+    retriever.add(DOCUMENTS)
+
+    results = retriever.search(["how do I reset my password", "when are invoices sent", "unrelated"], k=2)
+    assert results[0][0]["document_id"] == "password"
+    assert results[1][0]["document_id"] == "billing"
+    assert results[2] == []
+
+    with pytest.raises(ValueError):
+        retriever.add([{"id": "password", "text": "Duplicate"}])
+
+
+def test_embeddings_are_fused_with_bm25():
+    topics = ["passw", "invoi", "shipp"]
+
+    def embed(texts):
+        return np.array([[text.lower().count(topic) + 0.01 for topic in topics] for text in texts])
+
+    retriever = Retriever(embed=embed, passage_words=8, passage_overlap=2)
+    retriever.add(DOCUMENTS)
+
+    results = retriever.search(["password help", "shipping"], k=3)
+    assert results[0][0]["document_id"] == "password"
+    assert results[1][0]["document_id"] == 2
+    assert retriever.stats() == {"documents": 3, "passages": 5, "dense": True}
+
+
+def test_rejected_batches_leave_the_index_unchanged():
+    retriever = Retriever(passage_words=8, passage_overlap=2)
+    retriever.add([{"id": "password", "text": DOCUMENTS[0]["text"]}])
+
+    for batch in (
+        [{"id": "billing", "text": "Invoices"}, {"id": "password", "text": "Duplicate"}],
+        [{"id": "billing", "text": "Invoices"}, {"id": "billing", "text": "Duplicate"}],
+        [{"id": "billing", "text": "Invoices"}, {"id": "shipping"}],
+        [{"id": "billing", "text": "Invoices"}, {"id": "shipping", "text": 42}],
+        ["Invoices", 42],
+        ["Invoices", {"id": ["unhashable"], "text": "Duplicate"}],
+    ):
+        with pytest.raises(ValueError):
+            retriever.add(batch)
+        assert retriever.stats() == {"documents": 1, "passages": 2, "dense": False}
+
+
+def test_texts_are_numbered_around_given_ids():
+    retriever = Retriever()
+    retriever.add([{"id": 2, "text": "Alpha"}, "Beta", "Gamma", {"id": 4, "text": "Delta"}, "Epsilon"])
+    retriever.add(["Zeta"])
+
+    assert [passage["document_id"] for passage in retriever._passages] == [2, 1, 3, 4, 5, 6]
@@ -0,0 +1,100 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+from transformers import AutoModelForQuestionAnswering, AutoTokenizer
+
+from geniusrise_text.qa.spans import extract_answers, top_spans
+
+
+def test_top_spans_respects_order_length_and_mask():
+    start = np.array([[0.0, 5.0, 1.0, 0.0, 7.0]])
+    end = np.array([[8.0, 0.0, 4.0, 3.0, 0.0]])
+    mask = np.array([[False, True, True, True, True]])
+
+    # The best unconstrained start and end (4 and 0) would be an invalid span
+    assert top_spans(start, end, mask, n_best=1)[0][:3] == (0, 1, 2)
+    assert top_spans(start, end, mask, n_best=1, max_answer_length=1)[0][:3] == (0, 4, 4)
+
+    spans = top_spans(start, end, mask, n_best=3)
+    assert [span[3] for span in spans] == sorted((span[3] for span in spans), reverse=True)
+    assert all(s <= e and mask[0, s] and mask[0, e] for _, s, e, _ in spans)
+
+
+def test_top_spans_searches_all_windows():
+    start = np.zeros((3, 4))
+    end = np.zeros((3, 4))
+    start[2, 1], end[2, 2] = 4.0, 4.0
+    mask = np.ones((3, 4), dtype=bool)
+
+    assert top_spans(start, end, mask)[0] == (2, 1, 2, 8.0)
+    assert top_spans(start, end, np.zeros((3, 4), dtype=bool)) == []
+
+
+@pytest.fixture(scope="module")
+def qa_model():
+    model_name = "distilbert-base-cased-distilled-squad"
+    return AutoModelForQuestionAnswering.from_pretrained(model_name), AutoTokenizer.from_pretrained(model_name)
+
+
+def test_answers_beyond_the_first_window(qa_model):
+    model, tokenizer = qa_model
+    filler = "The committee discussed the budget, the schedule and the venue at length. " * 60
+    context = filler + "The festival will take place in Lisbon. " + filler
+    question = "Where will the festival take place?"
+
+    answers = extract_answers(model, tokenizer, [question], [context], max_length=256, doc_stride=64, n_best=3)[0]
+
+    assert answers[0]["answer"] == "Lisbon"
+    assert context[answers[0]["start"] : answers[0]["end"]] == "Lisbon"
+    assert len({(a["start"], a["end"]) for a in answers}) == len(answers) == 3
+    assert abs(sum(a["score"] for a in answers) - 1.0) < 1e-6
+
+
+def test_batched_answers_match_single_answers(qa_model):
+    model, tokenizer = qa_model
+    questions = ["What is the capital of France?", "Who founded the company?"]
+    contexts = [
+        "France is a country in Europe. Its capital is Paris.",
+        "The company was founded by Ada Lovelace in 1843. " * 30,
+    ]
+
+    batched = extract_answers(model, tokenizer, questions, contexts, max_length=128, doc_stride=32)
+    single = [
+        extract_answers(model, tokenizer, [q], [c], max_length=128, doc_stride=32)[0]
+        for q, c in zip(questions, contexts)
+    ]
+
+    assert [a[0]["answer"] for a in batched] == [a[0]["answer"] for a in single] == ["Paris", "Ada Lovelace"]
+
+
+def test_windows_run_in_bounded_batches(qa_model):
+    model, tokenizer = qa_model
+    question = "Who founded the company?"
+    context = "The company was founded by Ada Lovelace in 1843. " * 30
+
+    calls = []
+    handle = model.register_forward_pre_hook(
+        lambda module, args, kwargs: calls.append(kwargs["input_ids"].shape[0]), with_kwargs=True
+    )
+    try:
+        chunked = extract_answers(model, tokenizer, [question], [context], max_length=64, doc_stride=16, batch_size=2)
+    finally:
+        handle.remove()
+    whole = extract_answers(model, tokenizer, [question], [context], max_length=64, doc_stride=16)
+
+    assert len(calls) > 1 and max(calls) <= 2
+    assert [a["answer"] for a in chunked[0]] == [a["answer"] for a in whole[0]]
@@ -0,0 +1,59 @@
+# 🧠 Geniusrise
+# Copyright (C) 2023  geniusrise.ai
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import tempfile
+
+import pytest
+from geniusrise.core import BatchInput, BatchOutput, InMemoryState
+from transformers import AutoModelForTableQuestionAnswering, AutoTokenizer
+
+from geniusrise_text.qa.bulk import QABulk
+
+TABLES = [
+    {"Actors": ["Brad Pitt", "Leonardo Di Caprio", "George Clooney"], "Number of movies": ["87", "53", "69"]},
+    {"City": ["Paris", "Berlin"], "Population": ["2161000", "3645000"]},
+]
+
+
+@pytest.fixture
+def qa_bulk():
+    input = BatchInput(tempfile.mkdtemp(), "geniusrise-test", "test-🤗-input")
+    output = BatchOutput(tempfile.mkdtemp(), "geniusrise-test", "test-🤗-output")
+    return QABulk(input=input, output=output, state=InMemoryState())
+
+
+def test_parse_table_reuses_parsed_tables(qa_bulk):
+    qa_bulk.table_cache_size = 1
+    first = qa_bulk._parse_table(json.dumps(TABLES[0]))
+
+    assert qa_bulk._parse_table(json.dumps(TABLES[0])) is first
+    qa_bulk._parse_table(json.dumps(TABLES[1]))
+    assert qa_bulk._parse_table(json.dumps(TABLES[0])) is not first
+
+
+def test_tapas_batch_matches_single_questions(qa_bulk):
+    qa_bulk.model_name = "google/tapas-base-finetuned-wtq"
+    qa_bulk.tokenizer = AutoTokenizer.from_pretrained(qa_bulk.model_name)
+    qa_bulk.model = AutoModelForTableQuestionAnswering.from_pretrained(qa_bulk.model_name).eval()
+
+    tables = [qa_bulk._parse_table(json.dumps(t)) for t in [TABLES[0], TABLES[1], TABLES[0]]]
+    questions = ["How many movies has George Clooney played in?", "Which city is the largest?", "Who are the actors?"]
+
+    batched = qa_bulk._answer_tapas_batch(tables, questions)
+    single = [qa_bulk._answer_tapas_batch([t], [q])[0] for t, q in zip(tables, questions)]
+
+    assert batched == single
+    assert batched[0]["answers"] == ["69"]
@@ -19,7 +19,7 @@ import os
 import sqlite3
 import uuid
 import xml.etree.ElementTree as ET
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 import pandas as pd
 import yaml  # type: ignore
@@ -255,6 +255,10 @@ class TranslationBulk(TextBulk):
         awq_enabled: bool = False,
         flash_attention: bool = False,
         batch_size: int = 32,
+        sort_by_length: bool = False,
+        max_tokens_per_batch: Optional[int] = None,
+        streaming: bool = False,
+        streaming_chunk_size: int = 4096,
         notification_email: Optional[str] = None,
         **kwargs: Any,
     ) -> None:
@@ -279,6 +283,10 @@ class TranslationBulk(TextBulk):
             awq_enabled (bool): Whether to enable AWQ optimization (default False).
             flash_attention (bool): Whether to use flash attention optimization (default False).
             batch_size (int): Number of translations to process simultaneously (default 32).
+            sort_by_length (bool): Whether to batch rows of similar token length together to minimize padding (default False).
+            max_tokens_per_batch (Optional[int]): Budget of padded tokens per batch, used instead of batch_size if set (default None).
+            streaming (bool): Whether to stream the dataset in chunks instead of loading it into memory (default False).
+            streaming_chunk_size (int): Number of rows per streamed chunk (default 4096).
             **kwargs: Arbitrary keyword arguments for model and generation configurations.
         """
 
@@ -307,6 +315,10 @@ class TranslationBulk(TextBulk):
         self.awq_enabled = awq_enabled
         self.flash_attention = flash_attention
         self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.streaming = streaming
+        self.streaming_chunk_size = streaming_chunk_size
         self.notification_email = notification_email
         self.compile = compile
 
@@ -338,26 +350,55 @@ class TranslationBulk(TextBulk):
         dataset_path = self.input.input_folder
         output_path = self.output.output_folder
 
-        # Load dataset
-        _dataset = self.load_dataset(dataset_path, origin=origin, target=target, max_length=max_length)
-        if _dataset is None:
-            self.log.error("Failed to load dataset.")
-            return
-        dataset = _dataset[self.origin]
+        # Load dataset, either fully or lazily in chunks of rows
+        chunks: Iterator[List[Any]]
+        if streaming:
+            chunks = (
+                chunk[origin]
+                for chunk in self.stream_dataset(dataset_path, columns=[origin], chunk_size=streaming_chunk_size)
+            )
+        else:
+            _dataset = self.load_dataset(dataset_path, origin=origin, target=target, max_length=max_length)
+            if _dataset is None:
+                self.log.error("Failed to load dataset.")
+                return
+            chunks = iter([_dataset[self.origin]])
+
+        offset = 0
+        for dataset in chunks:
+            self._translate_chunk(dataset, output_path, offset)
+            offset += len(dataset)
+        self.done()
+
+    def _translate_chunk(self, dataset: List[str], output_path: str, offset: int = 0) -> None:
+        """
+        Translates a chunk of the dataset in batches and saves the translations in the original order.
 
-        # Process data in batches
-        for i in range(0, len(dataset), batch_size):
-            batch = dataset[i : i + batch_size]
+        Args:
+            dataset (List[str]): The texts of the chunk.
+            output_path (str): Path to save the translated texts.
+            offset (int): Index of the first row of the chunk in the whole dataset (for naming files).
+        """
+
+        def translate_batch(indices: List[int]) -> List[str]:
+            batch = [dataset[j] for j in indices]
             inputs = self.tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
 
             if next(self.model.parameters()).is_cuda:
                 inputs = {k: v.cuda() for k, v in inputs.items()}
 
             outputs = self.model.generate(**inputs, **self.generation_args)
-            translations = [self.tokenizer.decode(t, skip_special_tokens=True) for t in outputs]
-
-            self._save_translations(translations, batch, output_path, i)
-        self.done()
+            return [self.tokenizer.decode(t, skip_special_tokens=True) for t in outputs]
+
+        # Process data in batches, optionally bucketed by length, and save them in the original order
+        batches = self.batch_indices(
+            dataset,
+            batch_size=self.batch_size,
+            sort_by_length=self.sort_by_length,
+            max_tokens_per_batch=self.max_tokens_per_batch,
+        )
+        for i, translations in self.ordered_results(batches, translate_batch, chunk_size=self.batch_size):
+            self._save_translations(translations, dataset[i : i + len(translations)], output_path, offset + i)
 
     def _save_translations(
         self, translations: List[str], input_batch: List[str], output_path: str, batch_idx: int